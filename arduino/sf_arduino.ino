@@ -19,8 +19,14 @@ bool relayState = false;
 int soilMoisture = 0;
 
 // 타이머 변수 (AWS 전송용)
+// 1분마다 토양수분을 읽고, 마지막으로 보낸 값에서 SOIL_DELTA 넘게 바뀌면 바로 보냅니다.
+// 바뀌지 않으면 heartbeatInterval 마다 한 번만 보냅니다 (config/smartfarm.json 의 reporting.soil 과 같게)
 unsigned long lastDataSend = 0;
-const unsigned long sendInterval = 600000;  // 10분마다 AWS 전송
+unsigned long lastSample = 0;
+const unsigned long sampleInterval = 60000;      // 1분마다 읽기
+const unsigned long heartbeatInterval = 3600000; // 변화가 없어도 1시간마다 AWS 전송
+const int SOIL_DELTA = 2;                        // 이 %p 넘게 바뀌면 바로 전송
+int lastSentMoisture = -1;                       // -1: 아직 보낸 적 없음
 
 void setup() {
   Serial.begin(9600);
@@ -116,10 +122,17 @@ void setupWiFi() {
 void loop() {
   unsigned long currentTime = millis();
   
-  // AWS 전송 (30초마다)
-  if (currentTime - lastDataSend >= sendInterval) {
-    sendToAWS();
-    lastDataSend = currentTime;
+  // 토양수분 확인 (1분마다), 크게 바뀌었거나 heartbeat 때만 AWS 전송
+  if (currentTime - lastSample >= sampleInterval) {
+    lastSample = currentTime;
+    int moisture = readSoilMoisture();
+    if (lastSentMoisture < 0 || abs(moisture - lastSentMoisture) > SOIL_DELTA
+        || currentTime - lastDataSend >= heartbeatInterval) {
+      // 전송에 실패하면 마지막 전송 값/시각을 그대로 두어서 다음 측정 때 다시 보냅니다
+      if (sendToAWS()) {
+        lastDataSend = currentTime;
+      }
+    }
   }
   
   // 수동 테스트
@@ -144,12 +157,23 @@ void loop() {
   delay(100);
 }
 
-// AWS 전송 (완전 수정 버전)
-void sendToAWS() {
+// 토양수분 읽기 (4번 평균을 내서 1%p 흔들림으로 전송되지 않게)
+int readSoilMoisture() {
+  long total = 0;
+  for (int i = 0; i < 4; i++) {
+    total += analogRead(soilSensorPin);
+    delay(10);
+  }
+  int moisture = map(total / 4, 800, 300, 0, 100);
+  return constrain(moisture, 0, 100);
+}
+
+// AWS 전송 (완전 수정 버전), 서버가 200 OK 로 받으면 true
+bool sendToAWS() {
+  bool delivered = false;
+
   // 토양수분 읽기
-  int raw = analogRead(soilSensorPin);
-  soilMoisture = map(raw, 800, 300, 0, 100);
-  soilMoisture = constrain(soilMoisture, 0, 100);
+  soilMoisture = readSoilMoisture();
   
   Serial.print(F("토양수분: "));
   Serial.print(soilMoisture);
@@ -164,10 +188,10 @@ void sendToAWS() {
   if (waitForOK()) {
     Serial.println(F("TCP 연결 성공"));
     
-    // JSON 생성 - 테이블 구조에 맞게
-    char json[80];
-    sprintf(json, "{\"device_id\":\"%s\",\"soil_moisture\":\"%d\"}", 
-            DEVICE_ID, soilMoisture);
+    // JSON 생성 - 테이블 구조에 맞게 (next_report_seconds: 서버가 다음 보고를 기다릴 최대 시간)
+    char json[100];
+    sprintf(json, "{\"device_id\":\"%s\",\"soil_moisture\":\"%d\",\"next_report_seconds\":%lu}", 
+            DEVICE_ID, soilMoisture, heartbeatInterval / 1000);
     
     int jsonLength = strlen(json);
     Serial.print(F("JSON: "));
@@ -204,7 +228,13 @@ void sendToAWS() {
       esp01.print(json);
       
       Serial.println(F("전송 완료, 응답 대기중..."));
-      delay(8000);
+      delivered = waitFor("200 OK", 8000);
+      if (delivered) {
+        // 서버에 도착한 값만 마지막 전송 값으로 기억합니다
+        lastSentMoisture = soilMoisture;
+      } else {
+        Serial.println(F("서버 응답 200 OK 없음 → 다음 측정 때 다시 전송"));
+      }
       
       // 응답 읽기
       Serial.println(F("=== 서버 응답 ==="));
@@ -228,6 +258,7 @@ void sendToAWS() {
   // 연결 종료
   esp01.println(F("AT+CIPCLOSE=3"));
   delay(1000);
+  return delivered;
 }
 
 // 웹 요청 처리 (간단 버전)
@@ -294,9 +325,14 @@ void sendSimpleResponse(const char* message) {
 
 // OK 응답 대기
 bool waitForOK() {
+  return waitFor("OK", 8000);
+}
+
+// ESP-01 출력에서 target 이 나올 때까지 최대 timeoutMs 동안 기다립니다
+bool waitFor(const char* target, unsigned long timeoutMs) {
   unsigned long start = millis();
-  while (millis() - start < 8000) {
-    if (esp01.find("OK")) return true;
+  while (millis() - start < timeoutMs) {
+    if (esp01.find((char*)target)) return true;
   }
   return false;
 }
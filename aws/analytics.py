@@ -0,0 +1,256 @@
+"""
+토양수분/날씨 분석 모듈 (NumPy/pandas)
+
+API 서버(/api/analytics)와 대시보드가 같은 계산을 쓰도록 한 곳에 모았습니다.
+모든 계산은 장치별 groupby와 배열 연산으로 처리하고, 행마다 파이썬 반복문을 돌지 않습니다.
+
+- device_stats:     장치별 개수/평균/표준편차/최소/최대/마지막 값
+- class_stats:      반별 평균, 건조 장치 수, 전체 평균과의 차이
+- drying_rates:     장치별 시간당 수분 변화 기울기와, 물주기/비를 뺀 실제 마르는 속도
+- rain_correlation: 시간 단위로 묶은 강우 비율과 토양수분 변화의 상관계수
+- weather_stats:    기온/습도 요약과 비 온 시간
+
+벤치마크: python bench_analytics.py
+"""
+import numpy as np
+import pandas as pd
+
+# 이 값 미만이면 물이 필요한 장치로 셉니다 (rasp_control_arduino_v2.py 의 THRESHOLD 와 같습니다)
+DRY_THRESHOLD = 40
+# 연속된 두 측정 사이가 이보다 길면 (전송이 끊긴 구간) 마르는 속도 계산에서 뺍니다 (시간)
+# 아두이노는 값이 안 바뀌면 1시간마다 heartbeat 만 보내므로 그보다 조금 길게 둡니다
+MAX_GAP_HOURS = 1.5
+# 한 구간에 이만큼 넘게 오르면 물주기/비로 봅니다 (%p)
+WETTING_JUMP = 5.0
+# 강우 상관 계산에 쓰는 시간 단위
+CORRELATION_FREQ = '1h'
+
+# 대시보드 토양수분 상태 구분 (하한, 표시, 색)
+MOISTURE_LEVELS = [
+    (70, "습함 💧", '#2E8B57'),
+    (40, "적당 🌿", '#32CD32'),
+    (20, "건조 ⚠️", '#FFA500'),
+    (-np.inf, "매우건조 🚨", '#FF4500'),
+]
+
+
+def soil_frame(rows, archived=None):
+    """
+    (device_id, soil_moisture, received_at) 행들을 장치/시간 순으로 정렬한 DataFrame으로 만듭니다.
+    archived: archive.read_soil() 결과 (DB에서 읽은 행 앞에 붙입니다)
+    """
+    soil = pd.DataFrame(rows, columns=['device_id', 'soil_moisture', 'received_at'])
+    soil['soil_moisture'] = pd.to_numeric(soil['soil_moisture'], errors='coerce')
+    soil['received_at'] = pd.to_datetime(soil['received_at'])
+    if archived is not None and not archived.empty:
+        soil = pd.concat([archived, soil.astype({'device_id': object})], ignore_index=True)
+    soil = soil.dropna(subset=['soil_moisture', 'received_at'])
+    # 장치 ID를 범주형으로 두면 groupby가 문자열 대신 정수 코드로 묶습니다
+    soil['device_id'] = soil['device_id'].astype('category')
+    return soil.sort_values(['device_id', 'received_at'], kind='stable', ignore_index=True)
+
+
+def weather_frame(rows, archived=None):
+    """
+    (received_at, rain_detected, temperature, humidity) 행들을 시간 순 DataFrame으로 만듭니다.
+    archived: archive.read_weather() 결과 (DB에서 읽은 행 앞에 붙입니다)
+    """
+    weather = pd.DataFrame(rows, columns=['received_at', 'rain_detected', 'temperature', 'humidity'])
+    weather['received_at'] = pd.to_datetime(weather['received_at'])
+    if archived is not None and not archived.empty:
+        weather = pd.concat([archived, weather.astype({'rain_detected': object})], ignore_index=True)
+    weather['rain'] = weather['rain_detected'].eq('rain')
+    for column in ('temperature', 'humidity'):
+        weather[column] = pd.to_numeric(weather[column], errors='coerce')
+    return weather.sort_values('received_at', kind='stable', ignore_index=True)
+
+
+def _hours(times):
+    """시각 열을 기준 시각부터의 시간(float)으로 바꿉니다"""
+    return (times - pd.Timestamp('2000-01-01')).dt.total_seconds().to_numpy() / 3600
+
+
+def classify_moisture(values):
+    """
+    토양수분 값 배열을 (상태 표시 배열, 색 배열)로 바꿉니다.
+    """
+    values = np.asarray(values, dtype=float)
+    conditions = [values >= low for low, _, _ in MOISTURE_LEVELS]
+    labels = np.select(conditions, [label for _, label, _ in MOISTURE_LEVELS], default=MOISTURE_LEVELS[-1][1])
+    colors = np.select(conditions, [color for _, _, color in MOISTURE_LEVELS], default=MOISTURE_LEVELS[-1][2])
+    return labels, colors
+
+
+def device_stats(soil):
+    """
+    장치별 통계 (index: device_id)
+    """
+    grouped = soil.groupby('device_id', sort=True, observed=True)
+    stats = grouped['soil_moisture'].agg(['count', 'mean', 'std', 'min', 'max', 'last'])
+    stats['last_at'] = grouped['received_at'].max()
+    return stats
+
+
+def drying_rates(soil, weather=None, max_gap_hours=MAX_GAP_HOURS, wetting_jump=WETTING_JUMP):
+    """
+    장치별 토양수분 변화 (index: device_id)
+    - slope_per_hour:  구간 전체에 맞춘 직선의 기울기 (%p/시간, 물주기 포함)
+    - drying_rate_per_hour: 물주기(wetting_jump 넘게 오른 구간)와 비 온 시간을 뺀 나머지 구간의
+                       순 감소량 / 시간 (%p/시간, 양수). 센서 잡음으로 오르내린 구간도 넣어야
+                       줄어든 구간만 골랐을 때처럼 속도가 부풀지 않습니다
+    - drying_hours:    마르는 속도 계산에 쓴 시간
+    - wetting_events:  wetting_jump 넘게 오른 횟수 (물주기/비)
+    weather: weather_frame() 결과 (주면 비가 감지된 시간 단위의 구간을 뺍니다)
+    """
+    codes, devices = pd.factorize(soil['device_id'], sort=True)
+    size = len(devices)
+    hours = _hours(soil['received_at'])
+    moisture = soil['soil_moisture'].to_numpy(dtype=float)
+
+    def per_device(weights):
+        return np.bincount(codes, weights=weights, minlength=size)
+
+    # 최소제곱 기울기: 장치별로 평균을 뺀 뒤 Σxy / Σxx
+    count = per_device(None)
+    x = hours - (per_device(hours) / count)[codes]
+    y = moisture - (per_device(moisture) / count)[codes]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope = per_device(x * y) / per_device(x * x)
+
+    # 이웃한 측정 사이의 변화 (장치가 바뀌는 경계와 긴 공백은 뺍니다)
+    same_device = np.r_[False, codes[1:] == codes[:-1]]
+    dt = np.r_[np.nan, np.diff(hours)]
+    dm = np.r_[np.nan, np.diff(moisture)]
+    with np.errstate(invalid='ignore'):
+        valid = same_device & (dt > 0) & (dt <= max_gap_hours)
+        wetting = valid & (dm > wetting_jump)
+        drying = valid & ~wetting
+    if weather is not None and not weather.empty:
+        rainy = weather.loc[weather['rain'], 'received_at'].dt.floor(CORRELATION_FREQ).unique()
+        drying &= ~soil['received_at'].dt.floor(CORRELATION_FREQ).isin(rainy).to_numpy()
+
+    drying_hours = per_device(np.where(drying, dt, 0.0))
+    drying_drop = per_device(np.where(drying, dm, 0.0))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rate = np.where(drying_hours > 0, -drying_drop / drying_hours, np.nan)
+
+    return pd.DataFrame({
+        'slope_per_hour': slope,
+        'drying_rate_per_hour': rate,
+        'drying_hours': drying_hours,
+        'wetting_events': per_device(wetting.astype(float)).astype(int)
+    }, index=pd.Index(devices, name='device_id'))
+
+
+def class_stats(soil, classes, threshold=DRY_THRESHOLD):
+    """
+    반별 통계 (index: 반 번호)
+    classes: {반 번호: [device_id, ...]}
+    """
+    device_class = pd.Series({d: c for c, devices in classes.items() for d in devices}, dtype=float)
+    latest = device_stats(soil)['last']
+    latest_class = latest.index.map(device_class)
+    # 행마다 문자열을 찾지 않고, 장치 범주마다 한 번만 반 번호를 찾아서 코드로 펼칩니다
+    device = soil['device_id'].astype('category')
+    category_class = np.append(device.cat.categories.map(device_class).to_numpy(dtype=float), np.nan)
+    window_class = category_class[device.cat.codes.to_numpy()]
+
+    stats = pd.DataFrame({
+        'devices': pd.Series({c: len(devices) for c, devices in classes.items()}),
+        'reporting': latest.groupby(latest_class).size(),
+        'current_mean': latest.groupby(latest_class).mean(),
+        'dry_devices': (latest < threshold).groupby(latest_class).sum(),
+        'window_mean': soil['soil_moisture'].groupby(window_class).mean(),
+        'window_min': soil['soil_moisture'].groupby(window_class).min(),
+        'window_max': soil['soil_moisture'].groupby(window_class).max(),
+    }).reindex(list(classes))
+    stats[['reporting', 'dry_devices']] = stats[['reporting', 'dry_devices']].fillna(0).astype(int)
+    # 전체 장치 평균과의 차이 (반별 비교)
+    stats['vs_overall'] = stats['current_mean'] - latest.mean()
+    return stats
+
+
+def weather_stats(weather, freq=CORRELATION_FREQ):
+    """
+    기온/습도 요약과 비 온 시간 (비가 한 번이라도 감지된 시간 단위 수)
+    """
+    if weather.empty:
+        return {'samples': 0}
+    rain = weather.set_index('received_at')['rain'].resample(freq).max().dropna()
+    return {
+        'samples': int(len(weather)),
+        'temperature_mean': weather['temperature'].mean(),
+        'temperature_min': weather['temperature'].min(),
+        'temperature_max': weather['temperature'].max(),
+        'humidity_mean': weather['humidity'].mean(),
+        'rain_fraction': weather['rain'].mean(),
+        'rain_hours': int(rain.sum()) * pd.Timedelta(freq) / pd.Timedelta('1h')
+    }
+
+
+def rain_correlation(soil, weather, freq=CORRELATION_FREQ):
+    """
+    장치별로 시간 단위 토양수분 변화와 그 시간의 강우 비율의 상관계수 (index: device_id)
+    비가 올 때/안 올 때의 평균 변화도 함께 돌려줍니다.
+    """
+    moisture = soil.pivot_table(index=pd.Grouper(key='received_at', freq=freq), columns='device_id',
+                                values='soil_moisture', aggfunc='mean', observed=True)
+    change = moisture.diff()
+    rain = weather.set_index('received_at')['rain'].astype(float).resample(freq).mean().reindex(change.index)
+
+    raining = rain > 0
+    dry = rain == 0
+    return pd.DataFrame({
+        'correlation': change.corrwith(rain),
+        'change_when_rain': change[raining].mean(),
+        'change_when_dry': change[dry].mean(),
+        'rain_periods': int(raining.sum())
+    })
+
+
+def _records(frame, index_name):
+    """DataFrame을 NaN 없는 JSON용 dict 목록으로 바꿉니다 (소수 둘째 자리)"""
+    frame = frame.reset_index().rename(columns={'index': index_name})
+    frame[index_name] = frame[index_name].astype(str)
+    numeric = frame.select_dtypes('number').columns
+    frame[numeric] = frame[numeric].round(2)
+    frame = frame.astype(object).where(frame.notna(), None)
+    for column in frame.columns:
+        if pd.api.types.is_datetime64_any_dtype(frame[column]) or column.endswith('_at'):
+            frame[column] = [v.isoformat() if v is not None else None for v in frame[column]]
+    return frame.to_dict('records')
+
+
+def _clean(value):
+    if isinstance(value, (float, np.floating)):
+        return None if np.isnan(value) else round(float(value), 2)
+    if isinstance(value, np.integer):
+        return int(value)
+    return value
+
+
+def summarize(soil, weather, classes, threshold=DRY_THRESHOLD):
+    """
+    대시보드/API가 쓰는 분석 결과 전체를 JSON으로 보낼 수 있는 dict로 만듭니다.
+    """
+    if soil.empty:
+        devices, class_frame, correlation = [], None, []
+    else:
+        per_device = device_stats(soil).join(drying_rates(soil, weather))
+        if not weather.empty:
+            per_device = per_device.join(rain_correlation(soil, weather)[['correlation']]
+                                         .rename(columns={'correlation': 'rain_correlation'}))
+        devices = _records(per_device, 'device_id')
+        class_frame = class_stats(soil, classes, threshold)
+        correlation = _records(rain_correlation(soil, weather), 'device_id') if not weather.empty else []
+
+    if class_frame is None:
+        class_frame = pd.DataFrame(index=list(classes))
+    return {
+        'devices': devices,
+        'classes': {str(c): {k: _clean(v) for k, v in row.items()}
+                    for c, row in class_frame.to_dict('index').items()},
+        'weather': {k: _clean(v) for k, v in weather_stats(weather).items()},
+        'rain_correlation': correlation,
+        'threshold': threshold
+    }
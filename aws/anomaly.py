@@ -0,0 +1,170 @@
+"""
+센서 이상값 감지 모듈
+
+데이터를 저장하기 직전에 장치/측정 항목마다 한 번씩 check()를 불러 의심스러운 값에 표시를 붙입니다.
+장치별 상태는 평균/분산/마지막 값/반복 횟수 몇 개뿐이라 값이 아무리 쌓여도 메모리와 시간이 늘지 않습니다.
+
+- missing:      값이 없음 (DHT 읽기 실패로 None 이 그대로 온 경우)
+- out_of_range: 물리적으로 불가능한 값
+- rail:         아두이노 map()/constrain() 양 끝값 (0%, 100%) — 탐침이 빠지거나 합선되면 이렇게 보입니다
+- spike:        최근 평균에서 z-점수 Z_THRESHOLD 이상 벗어남 (토양수분은 물주기로 오르는 것은 정상이라 내려갈 때만)
+- stuck:        같은 값이 처음 나온 뒤 stuck_hours 시간 넘게 이어짐 (센서 멈춤/선 빠짐)
+                장치들이 값이 바뀔 때만 보내고 안 바뀌면 heartbeat 로만 보내므로, 몇 번 연속인지가 아니라
+                얼마나 오래 같은 값인지로 봅니다
+"""
+import math
+import threading
+from datetime import datetime
+
+# 최근 평균/분산에 반영할 대략적인 샘플 수 (이보다 오래된 값은 지수적으로 잊힙니다)
+WINDOW = 50
+# spike 검사를 시작하기 전에 모을 최소 샘플 수
+MIN_SAMPLES = 10
+Z_THRESHOLD = 4.0
+
+# 측정 항목별 기준
+# min/max: 가능한 범위, rails: 끝값, min_std: 표준편차 하한 (정수 센서의 흔들림을 spike로 보지 않도록)
+# spike: 'both' 또는 'down', stuck_hours: 같은 값이 이 시간 넘게 이어지면 멈춤으로 봄
+# (토양수분은 물주기/건조로 하루 안에는 바뀌고, 온습도는 낮밤으로 반나절 안에 바뀝니다)
+METRICS = {
+    'soil_moisture': {'min': 0, 'max': 100, 'rails': (0, 100), 'min_std': 3.0,
+                      'spike': 'down', 'stuck_hours': 24},
+    'temperature': {'min': -20, 'max': 60, 'rails': (), 'min_std': 1.0,
+                    'spike': 'both', 'stuck_hours': 12},
+    'humidity': {'min': 0, 'max': 100, 'rails': (), 'min_std': 2.0,
+                 'spike': 'both', 'stuck_hours': 12},
+}
+
+
+class RollingStats:
+    """
+    Welford 방식의 점진적 평균/분산. count가 window에 이르면 가중치를 1/window로 고정해서
+    최근 값 위주의 (지수 가중) 평균/분산이 됩니다.
+    """
+    __slots__ = ('window', 'count', 'mean', 'var')
+
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self.count = 0
+        self.mean = 0.0
+        self.var = 0.0
+
+    def update(self, value):
+        self.count += 1
+        weight = 1.0 / min(self.count, self.window)
+        delta = value - self.mean
+        self.mean += weight * delta
+        self.var = (1 - weight) * (self.var + weight * delta * delta)
+
+    @property
+    def std(self):
+        return math.sqrt(self.var)
+
+
+class SeriesState:
+    """장치 하나의 측정 항목 하나에 대한 감지 상태"""
+    __slots__ = ('stats', 'last_value', 'repeats', 'repeat_since', 'last_flags', 'updated_at')
+
+    def __init__(self, window):
+        self.stats = RollingStats(window)
+        self.last_value = None
+        self.repeats = 0
+        # 지금 값이 처음 들어온 시각
+        self.repeat_since = None
+        self.last_flags = ()
+        self.updated_at = None
+
+
+class AnomalyDetector:
+    """
+    장치/항목별 상태를 들고 있는 감지기. 여러 요청 스레드에서 함께 써도 됩니다.
+    """
+
+    def __init__(self, metrics=METRICS, window=WINDOW, min_samples=MIN_SAMPLES,
+                 z_threshold=Z_THRESHOLD):
+        self.metrics = metrics
+        self.window = window
+        self.min_samples = min_samples
+        self.z_threshold = z_threshold
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def check(self, device_id, metric, value):
+        """
+        값 하나를 검사하고 상태를 갱신합니다. 걸린 표시 목록을 돌려줍니다 (정상이면 빈 목록).
+        """
+        rule = self.metrics[metric]
+        now = datetime.now()
+        with self._lock:
+            state = self._series.get((device_id, metric))
+            if state is None:
+                state = self._series[(device_id, metric)] = SeriesState(self.window)
+            flags = self._evaluate(state, rule, value, now)
+            state.last_flags = tuple(flags)
+            state.updated_at = now
+        return flags
+
+    def _evaluate(self, state, rule, value, now):
+        if value is None:
+            return ['missing']
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return ['missing']
+        if math.isnan(value):
+            return ['missing']
+
+        flags = []
+        if value < rule['min'] or value > rule['max']:
+            # 불가능한 값은 통계에도 넣지 않습니다
+            return ['out_of_range']
+        if value in rule['rails']:
+            flags.append('rail')
+
+        if value == state.last_value:
+            state.repeats += 1
+        else:
+            state.last_value = value
+            state.repeats = 1
+            state.repeat_since = now
+        # 한 번 온 뒤 조용한 것은 heartbeat 추적이 볼 일이므로, 같은 값이 다시 왔을 때만 봅니다
+        if state.repeats > 1 and (now - state.repeat_since).total_seconds() > rule['stuck_hours'] * 3600:
+            flags.append('stuck')
+
+        stats = state.stats
+        if stats.count >= self.min_samples and 'rail' not in flags:
+            deviation = (value - stats.mean) / max(stats.std, rule['min_std'])
+            if deviation <= -self.z_threshold or (rule['spike'] == 'both' and deviation >= self.z_threshold):
+                flags.append('spike')
+
+        # 끝값은 통계를 끌어당기지 않도록 빼고, spike는 실제 수준 변화일 수 있으니 반영합니다
+        if 'rail' not in flags:
+            stats.update(value)
+        return flags
+
+    def check_reading(self, device_id, values):
+        """
+        {항목: 값} 여러 개를 검사해서 suspect 컬럼에 넣을 문자열을 돌려줍니다 (정상이면 None).
+        예: 'humidity:missing,temperature:spike'
+        """
+        marks = [f"{metric}:{flag}" for metric, value in values.items()
+                 for flag in self.check(device_id, metric, value)]
+        return ','.join(marks) if marks else None
+
+    def current_state(self):
+        """
+        장치/항목별 현재 상태 (마지막 값에 걸린 표시, 평균, 표준편차, 같은 값 반복 횟수와 처음 나온 시각)
+        """
+        with self._lock:
+            return [{
+                'device_id': device_id,
+                'metric': metric,
+                'last_value': state.last_value,
+                'flags': list(state.last_flags),
+                'mean': round(state.stats.mean, 2),
+                'std': round(state.stats.std, 2),
+                'samples': state.stats.count,
+                'repeats': state.repeats,
+                'repeat_since': state.repeat_since.isoformat() if state.repeat_since else None,
+                'updated_at': state.updated_at.isoformat() if state.updated_at else None
+            } for (device_id, metric), state in sorted(self._series.items())]
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+센서 기록 열(column) 보관 모듈
+
+지난 달(끝난 기간)의 weather_data / soil_moisture_data 를 월별/장치별로 나누어
+컬럼마다 NumPy .npy 파일 하나로 저장합니다. 여러 달에 걸친 분석은 DB 대신 이 파일을
+메모리 매핑(np.load(mmap_mode='r'))으로 읽어서, 운영 DB에 긴 전체 스캔을 걸지 않습니다.
+
+보관 폴더 구조:
+    <보관 폴더>/soil_moisture_data/2025-09/smartfarm_01/received_at.npy
+                                                      soil_moisture.npy
+                                                      suspect.npy
+    <보관 폴더>/weather_data/2025-09/raspberry_sf/received_at.npy, rain.npy, temperature.npy, ...
+    <보관 폴더>/<테이블>/manifest.json    (보관한 달, 행 수, 저장 시각)
+
+- 각 장치 폴더의 행은 received_at 순서라서, 기간 조회는 searchsorted 로 필요한 부분만 읽습니다
+- 한 달은 그 달이 끝나고 grace_hours 가 지나야 닫힌 것으로 봅니다 (늦게 올라온 묶음 전송 대비)
+- DB의 행은 지우지 않습니다. 이미 보관한 달은 건너뛰고, --force 면 다시 씁니다
+
+보관 폴더는 config/smartfarm.json 의 archive.path (없으면 aws/archive),
+환경변수 SMARTFARM_ARCHIVE 가 있으면 그쪽을 씁니다.
+
+사용 예 (cron 으로 하루 한 번):
+    python archive.py
+    python archive.py --until 2025-10 --force
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config'))
+from smartfarm_config import get_config
+
+logging.basicConfig(level=logging.INFO)
+
+# 달이 끝난 뒤 보관하기 전에 기다리는 시간 (시간)
+GRACE_HOURS = 6
+# DB에서 한 번에 가져올 행 수 (서버 쪽 커서)
+FETCH_SIZE = 20000
+
+# 테이블별 보관 컬럼: (컬럼 이름, SELECT 식, dtype)
+TABLES = {
+    'soil_moisture_data': [
+        ('received_at', 'received_at', 'datetime64[us]'),
+        ('soil_moisture', 'soil_moisture', 'float64'),
+        ('suspect', 'suspect IS NOT NULL', 'bool'),
+    ],
+    'weather_data': [
+        ('received_at', 'received_at', 'datetime64[us]'),
+        ('rain', "rain_detected = 'rain'", 'bool'),
+        ('temperature', 'temperature', 'float64'),
+        ('humidity', 'humidity', 'float64'),
+        ('suspect', 'suspect IS NOT NULL', 'bool'),
+    ],
+}
+
+
+def archive_root():
+    path = os.environ.get('SMARTFARM_ARCHIVE') or get_config().archive.get('path')
+    return path or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'archive')
+
+
+def month_start(value):
+    return datetime(value.year, value.month, 1)
+
+
+def next_month(value):
+    return (month_start(value) + timedelta(days=32)).replace(day=1)
+
+
+def closed_until(now=None, grace_hours=None):
+    """이 시각보다 앞선 달은 모두 닫혔습니다 (보관해도 됩니다)"""
+    grace = GRACE_HOURS if grace_hours is None else grace_hours
+    return month_start((now or datetime.now()) - timedelta(hours=grace))
+
+
+def _column(values, dtype):
+    if dtype == 'float64':
+        return np.array([np.nan if v is None else v for v in values], dtype=dtype)
+    return np.array(values, dtype=dtype)
+
+
+# ========== 읽기 ==========
+
+def read_manifest(table, root=None):
+    path = os.path.join(root or archive_root(), table, 'manifest.json')
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'months': {}}
+
+
+def archived_until(table, root=None):
+    """
+    보관이 끝난 마지막 달의 다음 달 1일 (보관한 달이 없으면 None).
+    이 시각 이전 기록은 보관 파일에서, 이후 기록은 DB에서 읽으면 됩니다.
+    """
+    months = read_manifest(table, root)['months']
+    if not months:
+        return None
+    return next_month(datetime.strptime(max(months), '%Y-%m'))
+
+
+def _partitions(table, start, end, devices, root):
+    table_dir = os.path.join(root, table)
+    months = read_manifest(table, root)['months']
+    for month in sorted(months):
+        begin = datetime.strptime(month, '%Y-%m')
+        if next_month(begin) <= start or begin >= end:
+            continue
+        month_dir = os.path.join(table_dir, month)
+        for device_id in months[month].get('devices', []):
+            if devices is None or device_id in devices:
+                yield device_id, os.path.join(month_dir, device_id)
+
+
+def read_columns(table, start, end, devices=None, root=None):
+    """
+    [start, end) 기간의 보관 기록을 {'device_id': 장치 번호 배열, 컬럼: 배열, ...} 로 읽습니다.
+    장치 번호는 돌려주는 'devices' 목록의 위치입니다.
+    파일은 메모리 매핑으로 열고, 기간에 들어가는 부분만 복사합니다.
+    """
+    root = root or archive_root()
+    names = [name for name, _, _ in TABLES[table]]
+    start64, end64 = np.datetime64(start, 'us'), np.datetime64(end, 'us')
+
+    parts = {name: [] for name in names}
+    codes, device_ids = [], []
+    for device_id, folder in _partitions(table, start, end, devices, root):
+        received = np.load(os.path.join(folder, 'received_at.npy'), mmap_mode='r')
+        lo, hi = np.searchsorted(received, [start64, end64])
+        if lo == hi:
+            continue
+        if device_id not in device_ids:
+            device_ids.append(device_id)
+        codes.append(np.full(hi - lo, device_ids.index(device_id), dtype=np.int32))
+        for name in names:
+            column = received if name == 'received_at' else \
+                np.load(os.path.join(folder, f'{name}.npy'), mmap_mode='r')
+            parts[name].append(np.array(column[lo:hi]))
+
+    result = {'devices': device_ids,
+              'device_id': np.concatenate(codes) if codes else np.empty(0, dtype=np.int32)}
+    for name, _, dtype in TABLES[table]:
+        result[name] = np.concatenate(parts[name]) if parts[name] else np.empty(0, dtype=dtype)
+    return result
+
+
+def _device_column(columns):
+    return pd.Categorical.from_codes(columns['device_id'], categories=columns['devices'])
+
+
+def read_soil(start, end, devices=None, include_suspect=False, root=None):
+    """
+    보관된 토양수분 기록 (analytics.soil_frame() 에 넘길 수 있는 DataFrame)
+    이상값으로 표시된 행은 기본으로 뺍니다.
+    """
+    columns = read_columns('soil_moisture_data', start, end, devices, root)
+    frame = pd.DataFrame({
+        'device_id': _device_column(columns),
+        'soil_moisture': columns['soil_moisture'],
+        'received_at': columns['received_at'],
+    })
+    if not include_suspect:
+        frame = frame[~columns['suspect']]
+    return frame
+
+
+def read_weather(start, end, devices=None, root=None):
+    """
+    보관된 날씨 기록 (analytics.weather_frame() 에 넘길 수 있는 DataFrame)
+    """
+    columns = read_columns('weather_data', start, end, devices, root)
+    return pd.DataFrame({
+        'received_at': columns['received_at'],
+        'rain_detected': pd.Categorical.from_codes(columns['rain'].astype(np.int8),
+                                                   categories=['no_rain', 'rain']),
+        'temperature': columns['temperature'],
+        'humidity': columns['humidity'],
+    })
+
+
+# ========== 쓰기 ==========
+
+def _write_partition(folder, columns):
+    """장치 폴더 하나를 임시 폴더에 쓴 뒤 이름을 바꿔서, 읽는 쪽이 반쯤 쓴 파일을 보지 않게 합니다"""
+    temp = folder + '.tmp'
+    shutil.rmtree(temp, ignore_errors=True)
+    os.makedirs(temp)
+    for name, values in columns.items():
+        np.save(os.path.join(temp, f'{name}.npy'), values)
+    if os.path.exists(folder):
+        shutil.rmtree(folder)
+    os.replace(temp, folder)
+
+
+def _write_manifest(table, manifest, root):
+    path = os.path.join(root, table, 'manifest.json')
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def archive_month(conn, table, month, root):
+    """
+    한 달치 기록을 장치별 컬럼 파일로 씁니다. {device_id: 행 수} 를 돌려줍니다.
+    """
+    spec = TABLES[table]
+    cursor = conn.cursor(name=f'archive_{table}')
+    cursor.itersize = FETCH_SIZE
+    cursor.execute(f'''
+        SELECT device_id, {', '.join(expr for _, expr, _ in spec)}
+        FROM {table}
+        WHERE received_at >= %s AND received_at < %s
+        ORDER BY device_id, received_at
+    ''', (month, next_month(month)))
+
+    counts = {}
+    month_dir = os.path.join(root, table, month.strftime('%Y-%m'))
+    os.makedirs(month_dir, exist_ok=True)
+
+    def flush(device_id, rows):
+        values = list(zip(*rows))
+        _write_partition(os.path.join(month_dir, device_id or 'unknown'), {
+            name: _column(values[i], dtype) for i, (name, _, dtype) in enumerate(spec)
+        })
+        counts[device_id or 'unknown'] = len(rows)
+
+    current, rows = None, []
+    for row in cursor:
+        if row[0] != current and rows:
+            flush(current, rows)
+            rows = []
+        current = row[0]
+        rows.append(row[1:])
+    if rows:
+        flush(current, rows)
+    cursor.close()
+    return counts
+
+
+def run_archive(until=None, force=False, tables=tuple(TABLES), root=None):
+    """
+    DB의 가장 오래된 기록이 있는 달부터 until(기본: 닫힌 마지막 달) 이전 달까지 보관합니다.
+    """
+    from weather_data_aws import get_db_connection
+
+    root = root or archive_root()
+    until = month_start(until) if until else closed_until()
+    conn = get_db_connection()
+    try:
+        for table in tables:
+            os.makedirs(os.path.join(root, table), exist_ok=True)
+            manifest = read_manifest(table, root)
+            cursor = conn.cursor()
+            cursor.execute(f'SELECT MIN(received_at) FROM {table}')
+            oldest = cursor.fetchone()[0]
+            cursor.close()
+            if oldest is None:
+                continue
+
+            month = month_start(oldest)
+            while month < until:
+                key = month.strftime('%Y-%m')
+                if force or key not in manifest['months']:
+                    counts = archive_month(conn, table, month, root)
+                    # 기록이 없는 달도 적어 둬야 보관 범위가 끊기지 않습니다
+                    manifest['months'][key] = {
+                        'rows': sum(counts.values()),
+                        'devices': sorted(counts),
+                        'written_at': datetime.now().isoformat(timespec='seconds')
+                    }
+                    _write_manifest(table, manifest, root)
+                    logging.info(f"{table} {key}: 장치 {len(counts)}대, {sum(counts.values())}행 보관")
+                month = next_month(month)
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='지난 달 센서 기록을 월별/장치별 컬럼 파일로 보관합니다')
+    parser.add_argument('--until', help='이 달 이전까지만 보관 (예: 2025-10, 기본: 닫힌 마지막 달)')
+    parser.add_argument('--force', action='store_true', help='이미 보관한 달도 다시 씁니다')
+    parser.add_argument('--table', choices=sorted(TABLES), action='append', help='보관할 테이블 (기본: 전체)')
+    parser.add_argument('--root', help='보관 폴더 (기본: 설정 파일의 archive.path)')
+    args = parser.parse_args()
+
+    run_archive(until=datetime.strptime(args.until, '%Y-%m') if args.until else None,
+                force=args.force, tables=tuple(args.table or TABLES), root=args.root)
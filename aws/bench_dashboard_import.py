@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+대시보드 시작 시간 벤치마크 (python -X importtime)
+
+새 파이썬 프로세스에서 dashborad_streamlit.py 를 import 해서
+- 콜드 스타트: 모듈을 처음 import 하는 전체 시간과, 오래 걸린 import 목록
+- 다시 실행: Streamlit이 새로고침마다 하듯이 이미 import 된 상태에서 스크립트 맨 위를 다시 실행하는 시간
+- 화면별 main(): 가짜 st 로 화면(st.radio key="view")마다 main() 한 번을 그리는 시간
+  (처음 그릴 때는 그 화면의 무거운 import 가 들어가므로 처음/다시 그리기를 따로 보여줍니다)
+을 잽니다. --baseline 으로 git 의 이전 버전과 비교할 수 있습니다.
+
+streamlit 밖에서 import 하므로 "missing ScriptRunContext" 경고가 나와도 괜찮습니다.
+화면별 측정은 가짜 st 를 쓰므로 streamlit 이 없어도 됩니다. API 는 기본으로 닫힌 포트를 가리켜서
+연결 오류 화면을 그리고, --api 로 실제 서버(예: replay_server.py)를 주면 데이터가 있는 화면을 잽니다.
+
+사용 예:
+    python bench_dashboard_import.py
+    python bench_dashboard_import.py --baseline HEAD~1 --repeat 5
+    python bench_dashboard_import.py --api http://localhost:5001 --reruns 50
+    python bench_dashboard_import.py --module analytics --top 15
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DASHBOARD = 'dashborad_streamlit'
+LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+# 대시보드 화면 수 (main()의 views 목록과 같게)
+VIEWS = 5
+# 화면별 측정 때 대시보드가 부를 API 주소 (닫힌 포트라 바로 연결 오류가 납니다)
+NO_API_URL = 'http://127.0.0.1:9'
+
+# 다시 실행 시간 측정: 한 번 import 한 뒤 같은 파일을 run_path 로 여러 번 실행합니다
+RERUN_SNIPPET = '''
+import importlib, runpy, sys, time
+module = importlib.import_module({module!r})
+times = []
+for _ in range({reruns}):
+    started = time.perf_counter()
+    runpy.run_path(module.__file__, run_name='__bench__')
+    times.append(time.perf_counter() - started)
+print(min(times) * 1000)
+'''
+
+# 화면별 main() 측정: streamlit 대신 가짜 st 를 넣고 import 한 뒤, 화면마다 main()을 여러 번 부릅니다
+VIEW_SNIPPET = '''
+import functools, importlib, json, sys, time, types
+
+
+class Widget:
+    """어떤 호출/속성/with 에도 자기 자신을 돌려주는 가짜 요소 (버튼 등은 눌리지 않은 것으로 봅니다)"""
+    def __getattr__(self, name):
+        return self
+
+    def __call__(self, *args, **kwargs):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __bool__(self):
+        return False
+
+    def __iter__(self):
+        return iter(())
+
+
+class SessionState(dict):
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    __setattr__ = dict.__setitem__
+    __delattr__ = dict.__delitem__
+
+
+class Streamlit(Widget):
+    def __init__(self):
+        self.session_state = SessionState()
+        self.query_params = {{}}
+        self.sidebar = Widget()
+        self.view = 0
+
+    def radio(self, label, options, *args, index=0, key=None, **kwargs):
+        return list(options)[self.view if key == 'view' else index]
+
+    def selectbox(self, label, options, index=0, **kwargs):
+        return list(options)[index]
+
+    def number_input(self, label, min_value=None, value=None, key=None, **kwargs):
+        if key in self.session_state:
+            return self.session_state[key]
+        return value if value is not None else (min_value or 0)
+
+    def text_input(self, *args, **kwargs):
+        return ''
+
+    text_area = text_input
+
+    def columns(self, spec, **kwargs):
+        return [Widget() for _ in range(spec if isinstance(spec, int) else len(spec))]
+
+    def tabs(self, labels):
+        return [Widget() for _ in labels]
+
+    def cache_data(self, func=None, **kwargs):
+        # 다시 실행 때 Streamlit 캐시에 맞는 경우와 같게, 인자별로 결과를 기억합니다
+        def wrap(func):
+            cache = {{}}
+
+            @functools.wraps(func)
+            def cached(*args, **kwargs):
+                key = repr((args, sorted(kwargs.items())))
+                if key not in cache:
+                    cache[key] = func(*args, **kwargs)
+                return cache[key]
+            cached.clear = cache.clear
+            return cached
+        return wrap(func) if func else wrap
+
+    cache_resource = cache_data
+
+    def rerun(self):
+        pass
+
+
+st = Streamlit()
+sys.modules['streamlit'] = st
+module = importlib.import_module({module!r})
+
+results = {{}}
+for view in range({views}):
+    st.view = view
+    times = []
+    for _ in range({reruns} + 1):
+        started = time.perf_counter()
+        module.main()
+        times.append((time.perf_counter() - started) * 1000)
+    results[view] = [times[0], min(times[1:])]
+print(json.dumps(results))
+'''
+
+
+def profile_import(module, cwd=HERE):
+    """
+    새 프로세스에서 import 하고, 그 모듈 아래의 [(누적 us, 자기 us, 깊이, 이름), ...] 와
+    모듈 전체 import 시간(us)을 돌려줍니다.
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=cwd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{module} import 실패:\n{result.stderr[-2000:]}")
+
+    entries = []
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative, indent, name = match.groups()
+            entries.append((int(cumulative), int(self_us), (len(indent) - 1) // 2, name))
+
+    # 인터프리터 시작 때의 import(site, encodings 등)는 빼고, 모듈 아래에서 import 된 것만 남깁니다
+    end = max(i for i, entry in enumerate(entries) if entry[2] == 0 and entry[3] == module)
+    start = end
+    while start > 0 and entries[start - 1][2] > 0:
+        start -= 1
+    return entries[start:end], entries[end][0]
+
+
+def measure_rerun(module, reruns, cwd=HERE):
+    snippet = RERUN_SNIPPET.format(module=module, reruns=reruns)
+    result = subprocess.run([sys.executable, '-c', snippet], cwd=cwd, capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def measure_views(module, reruns, api_url=NO_API_URL, cwd=HERE):
+    """
+    {화면 번호: (처음 그린 ms, 다시 그린 최소 ms)} 를 돌려줍니다. 실패하면 None 이고 오류를 보여줍니다.
+    """
+    snippet = VIEW_SNIPPET.format(module=module, views=VIEWS, reruns=reruns)
+    env = dict(os.environ, SMARTFARM_API_URL=api_url)
+    result = subprocess.run([sys.executable, '-c', snippet], cwd=cwd, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        print(f"[{module}] 화면별 측정 실패:\n{result.stderr[-1000:]}")
+        return None
+    return {int(view): tuple(times) for view, times in json.loads(result.stdout.strip().splitlines()[-1]).items()}
+
+
+def summarize(module, repeat, reruns, top, api_url=NO_API_URL, cwd=HERE):
+    totals = []
+    for _ in range(repeat):
+        entries, total = profile_import(module, cwd)
+        totals.append(total)
+
+    print(f"[{module}] 콜드 import {statistics.median(totals) / 1000:8.1f} ms (중앙값, {repeat}회)")
+    # 모듈이 직접 import 한 것 중 오래 걸린 것
+    heavy = sorted((e for e in entries if e[2] == 1), reverse=True)[:top]
+    for cumulative, _, _, name in heavy:
+        print(f"    {cumulative / 1000:8.1f} ms  {name}")
+
+    rerun = measure_rerun(module, reruns, cwd)
+    if rerun is not None:
+        print(f"[{module}] 다시 실행 {rerun:8.2f} ms (최소, {reruns}회)")
+
+    views = measure_views(module, reruns, api_url, cwd)
+    if views is not None:
+        print(f"[{module}] 화면별 main() (처음 / 다시 그리기 최소, {reruns}회)")
+        for view, (first, again) in sorted(views.items()):
+            print(f"    화면 {view}: {first:8.2f} ms / {again:8.2f} ms")
+    return statistics.median(totals), rerun, views
+
+
+def checkout_baseline(revision, module):
+    """git 의 이전 버전 모듈을 같은 폴더에 임시 파일로 꺼냅니다 (옆 모듈 import 가 그대로 되도록)"""
+    source = subprocess.run(['git', 'show', f'{revision}:aws/{module}.py'], cwd=HERE,
+                            capture_output=True, text=True, check=True).stdout
+    name = f'_baseline_{module}'
+    with open(os.path.join(HERE, f'{name}.py'), 'w', encoding='utf-8') as f:
+        f.write(source)
+    return name
+
+
+def main():
+    parser = argparse.ArgumentParser(description='대시보드 import 시간 벤치마크')
+    parser.add_argument('--module', default=DASHBOARD, help='측정할 모듈 (기본: 대시보드)')
+    parser.add_argument('--baseline', help='비교할 git 리비전 (예: HEAD~1)')
+    parser.add_argument('--repeat', type=int, default=3, help='콜드 import 반복 횟수')
+    parser.add_argument('--reruns', type=int, default=20, help='다시 실행 반복 횟수')
+    parser.add_argument('--top', type=int, default=10, help='보여줄 무거운 import 수')
+    parser.add_argument('--api', default=NO_API_URL, help='화면별 측정 때 대시보드가 부를 API 주소')
+    args = parser.parse_args()
+
+    current = summarize(args.module, args.repeat, args.reruns, args.top, args.api)
+    if not args.baseline:
+        return
+
+    print()
+    name = checkout_baseline(args.baseline, args.module)
+    try:
+        baseline = summarize(name, args.repeat, args.reruns, args.top, args.api)
+    finally:
+        os.remove(os.path.join(HERE, f'{name}.py'))
+
+    print(f"\n콜드 import: {baseline[0] / 1000:.1f} ms → {current[0] / 1000:.1f} ms "
+          f"({baseline[0] / max(current[0], 1):.1f}배)")
+    if baseline[1] is not None and current[1] is not None:
+        print(f"다시 실행:   {baseline[1]:.2f} ms → {current[1]:.2f} ms")
+    if baseline[2] and current[2]:
+        for view in sorted(current[2]):
+            if view in baseline[2]:
+                print(f"화면 {view} 다시 그리기: {baseline[2][view][1]:.2f} ms → {current[2][view][1]:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,16 @@
 import streamlit as st
 import requests
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime, timedelta
+from datetime import datetime
+import statistics
 import time
-import base64
-import io
-from PIL import Image
-import random
+import os
+import sys
+
+# pandas, plotly, PIL(image_pipeline), analytics(numpy/pandas)는 무거워서 쓰는 화면에서 처음 import 합니다.
+# 시작 시간은 python bench_dashboard_import.py 로 잽니다
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config'))
+from smartfarm_config import get_config
 
 # Streamlit 페이지 설정 - 이 부분은 반드시 다른 streamlit 명령어보다 먼저 와야 합니다
 st.set_page_config(
@@ -18,105 +20,55 @@ st.set_page_config(
     initial_sidebar_state="expanded"  # 사이드바를 기본적으로 열어둡니다
 )
 
-# 사용자 정의 CSS로 더 예쁘게 만들어봅시다
-st.markdown("""
-<style>
-    /* 메인 타이틀의 스타일을 꾸며줍니다 */
-    .main-title {
-        text-align: center;
-        color: #2E8B57;
-        font-size: 3rem;
-        font-weight: bold;
-        margin-bottom: 2rem;
-    }
-
-    /* 센서 카드들의 스타일입니다 */
-    .sensor-card {
-        padding: 1rem;
-        border-radius: 10px;
-        margin: 1rem 0;
-        box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-    }
-
-    /* 메트릭 값들을 더 눈에 띄게 만듭니다 */
-    .metric-container {
-        text-align: center;
-        padding: 1rem;
-    }
+# 사용자 정의 CSS (static/dashboard.css)
+CSS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'dashboard.css')
 
-    /* 게시글 카드 스타일 */
-    .post-card {
-        background-color: #f8f9fa;
-        padding: 1rem;
-        border-radius: 8px;
-        border-left: 4px solid #2E8B57;
-        margin: 1rem 0;
-        box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-    }
 
-    /* 게시글 제목 스타일 */
-    .post-title {
-        color: #2E8B57;
-        font-weight: bold;
-        font-size: 1.1rem;
-        margin-bottom: 0.5rem;
-    }
+@st.cache_resource(show_spinner=False)
+def load_css():
+    """
+    스타일 파일은 프로세스당 한 번만 읽습니다.
+    (스크립트가 다시 실행될 때마다 함수도 새로 정의되므로 lru_cache 대신 Streamlit 캐시를 씁니다)
+    Streamlit은 다시 실행할 때마다 화면을 새로 그리므로 <style> 요소는 매번 넣어야 하지만,
+    파일을 다시 읽지는 않습니다.
+    """
+    with open(CSS_PATH, encoding='utf-8') as f:
+        return f"<style>\n{f.read()}</style>"
 
-    /* 게시글 메타 정보 스타일 */
-    .post-meta {
-        color: #6c757d;
-        font-size: 0.9rem;
-        margin-bottom: 0.5rem;
-    }
 
-    /* 게시글 내용 스타일 */
-    .post-content {
-        color: #333;
-        line-height: 1.5;
-    }
+st.markdown(load_css(), unsafe_allow_html=True)
 
-    /* 반 구분 헤더 스타일 */
-    .class-header {
-        background: linear-gradient(90deg, #2E8B57, #32CD32);
-        color: white;
-        padding: 1rem;
-        border-radius: 8px;
-        text-align: center;
-        margin: 1rem 0;
-        font-size: 1.5rem;
-        font-weight: bold;
-    }
+# API 서버 주소 설정 - config/smartfarm.json 의 local_url (같은 서버 내의 Flask 앱)
+# 녹화 데이터 재생 서버(replay_server.py)를 보려면 SMARTFARM_API_URL 환경변수로 바꿉니다
+API_BASE_URL = os.environ.get("SMARTFARM_API_URL") or get_config().local_api_url
 
-    /* 게시글 이미지 스타일 */
-    .post-image {
-        max-width: 100%;
-        border-radius: 8px;
-        margin: 10px 0;
-        box-shadow: 0 2px 8px rgba(0,0,0,0.1);
-    }
-</style>
-""", unsafe_allow_html=True)
+# 물주기 서버(water_flask.py) 주소 - 버튼, cron 스크립트와 같은 /api/relay 로 릴레이를 제어합니다
+# 대시보드가 아두이노와 다른 망에 있으면 SMARTFARM_RELAY_URL 환경변수로 물주기 서버에 닿는 주소를 줍니다
+RELAY_CONTROL_URL = os.environ.get("SMARTFARM_RELAY_URL") or get_config().relay.get("control_url")
 
-# API 서버 주소 설정 - 여기서 localhost는 같은 서버 내의 Flask 앱을 의미합니다
-API_BASE_URL = "http://localhost:5000"
+# 게시판 한 페이지에 보여줄 게시글 수
+POSTS_PER_PAGE = 5
 
 # 게시글 데이터를 세션 상태에 저장 (실제 환경에서는 데이터베이스를 사용하세요)
+# posts는 등록 순서대로 append 되고, posts_by_id로 id 조회를 O(1)에 처리합니다
 if 'posts' not in st.session_state:
     st.session_state.posts = []
-
-# 스마트팜 장치 그룹 정의
-SMARTFARM_GROUPS = {
-    1: {
-        'name': '2반 (smartfarm01~04)',
-        'devices': ['smartfarm_01', 'smartfarm_02', 'smartfarm_03', 'smartfarm_04'],
-        'emoji': '🌱'
-    },
-    2: {
-        'name': '4반 (smartfarm05~08)',
-        'devices': ['smartfarm_05', 'smartfarm_06', 'smartfarm_07', 'smartfarm_08'],
-        'emoji': '🌿'
+    st.session_state.posts_by_id = {}
+    st.session_state.next_post_id = 1
+    # 통계는 매번 전체를 훑지 않도록 카운터로 유지합니다
+    st.session_state.post_stats = {
+        'total_likes': 0,
+        'posts_with_images': 0,
+        'author_counts': {}
     }
-}
+
+
+def get_groups():
+    """
+    스마트팜 장치 그룹 {반 번호: {'name', 'emoji', 'devices'}}
+    config/smartfarm.json 에서 읽으므로, 장치를 추가하면 다음 새로고침부터 반영됩니다.
+    """
+    return get_config().classes
 
 
 def get_current_class():
@@ -130,15 +82,15 @@ def get_current_class():
     if 'class' in query_params:
         try:
             class_num = int(query_params['class'])
-            if class_num in [1, 2]:
+            if class_num in get_groups():
                 st.session_state.selected_class = class_num
                 return class_num
         except ValueError:
             pass
 
-    # 세션 상태에서 가져오기 (기본값은 2반)
-    if 'selected_class' not in st.session_state:
-        st.session_state.selected_class = 1
+    # 세션 상태에서 가져오기 (기본값은 첫 번째 반, 설정에서 빠진 반이면 첫 번째 반으로)
+    if st.session_state.get('selected_class') not in get_groups():
+        st.session_state.selected_class = next(iter(get_groups()))
 
     return st.session_state.selected_class
 
@@ -150,80 +102,144 @@ def set_class_url(class_num):
     st.query_params['class'] = str(class_num)
 
 
-def generate_dummy_soil_data(devices):
+def fetch_dashboard_payload(class_num):
     """
-    API가 연결되지 않을 때 사용할 더미 토양수분 데이터를 생성합니다.
+    /api/dashboard/<반> 에서 한 번에 대시보드 데이터를 가져옵니다.
+    이전에 받은 버전을 If-None-Match로 보내서, 바뀐 것이 없으면(304) 저장해 둔 데이터를 씁니다.
+    API가 연결되지 않으면 마지막으로 받은 데이터에 stale=True를 붙여 돌려주고,
+    받은 적이 없으면 빈 데이터를 돌려줍니다. 가짜 값은 만들지 않습니다.
     """
-    sensors = []
-    for device_id in devices:
-        # 각 장치별로 랜덤한 토양수분 값 생성 (실제로는 데이터베이스에서 가져와야 함)
-        moisture_level = random.randint(20, 90)
-        sensors.append({
-            'device_id': device_id,
-            'soil_moisture': moisture_level,
-            'last_updated': datetime.now().isoformat()
-        })
-
-    return {'sensors': sensors}
+    if 'dashboard_cache' not in st.session_state:
+        st.session_state.dashboard_cache = {}
+    cached = st.session_state.dashboard_cache.get(class_num)
 
+    headers = {}
+    if cached:
+        headers['If-None-Match'] = f'"{cached["version"]}"'
 
-def fetch_api_data(endpoint, device_filter=None):
-    """
-    Flask API에서 데이터를 가져오는 함수입니다.
-    device_filter가 있으면 해당 장치들만 필터링합니다.
-    API가 연결되지 않으면 더미 데이터를 반환합니다.
-    """
     try:
-        response = requests.get(f"{API_BASE_URL}{endpoint}", timeout=5)
+        response = requests.get(f"{API_BASE_URL}/api/dashboard/{class_num}", headers=headers, timeout=5)
+        if response.status_code == 304 and cached:
+            cached['received_at'] = datetime.now()
+            return cached
         if response.status_code == 200:
-            data = response.json()
+            payload = response.json()
+            payload['received_at'] = datetime.now()
+            st.session_state.dashboard_cache[class_num] = payload
+            return payload
+    except requests.exceptions.RequestException:
+        pass
+
+    if cached:
+        return dict(cached, stale=True, health=None)
+
+    return {
+        'class': class_num,
+        'weather': None,
+        'soil': None,
+        'devices': None,
+        'health': None,
+        'stale': True,
+        'received_at': None
+    }
 
-            # 장치 필터링이 필요한 경우
-            if device_filter and isinstance(data, dict) and 'sensors' in data:
-                filtered_sensors = [
-                    sensor for sensor in data['sensors']
-                    if sensor.get('device_id') in device_filter
-                ]
-                data['sensors'] = filtered_sensors
 
-            return data
+def display_data_source(payload):
+    """
+    오래된 데이터나 녹화 재생 데이터를 보고 있으면 화면 위쪽에 표시합니다.
+    """
+    if payload.get('stale'):
+        if payload.get('received_at'):
+            st.warning(f"⚠️ 서버에 연결할 수 없어 {payload['received_at'].strftime('%H:%M:%S')}에 "
+                       f"받은 데이터를 표시하고 있습니다. 현재 값과 다를 수 있습니다.")
         else:
-            # API 호출 실패 시 더미 데이터 반환
-            if endpoint == "/api/soil/all" and device_filter:
-                return generate_dummy_soil_data(device_filter)
-            return None
-    except requests.exceptions.RequestException:
-        # 네트워크 오류 시 더미 데이터 반환
-        if endpoint == "/api/soil/all" and device_filter:
-            return generate_dummy_soil_data(device_filter)
-        elif endpoint == "/api/weather":
-            return {
-                'temperature': random.randint(18, 28),
-                'humidity': random.randint(40, 80),
-                'rain_status': random.choice(['rain', 'no_rain']),
-                'last_updated': datetime.now().isoformat()
-            }
-        return None
-    except Exception as e:
-        st.error(f"예상치 못한 오류가 발생했습니다: {str(e)}")
-        return None
+            st.error("⚠️ 서버에 연결할 수 없고 이전에 받은 데이터도 없습니다.")
+        return
 
+    health = payload.get('health') or {}
+    if health.get('mode') == 'replay':
+        replay_info = health.get('replay', {})
+        st.info(f"🎬 녹화 데이터 재생 모드 ({replay_info.get('speed', 1)}배속, "
+                f"{replay_info.get('trace_start', '')[:10]} ~ {replay_info.get('trace_end', '')[:10]} 기록)")
 
-def image_to_base64(image):
+
+def add_post(author, category, title, content, image_job=None):
+    """
+    새 게시글을 등록하고 통계 카운터를 갱신합니다.
+    image_job은 이미지 처리 작업(Future)이며, 끝나면 resolve_post_image에서 결과를 붙입니다.
+    """
+    post_id = st.session_state.next_post_id
+    st.session_state.next_post_id += 1
+
+    new_post = {
+        "id": post_id,
+        "author": author,
+        "category": category,
+        "title": title,
+        "content": content,
+        "timestamp": datetime.now(),
+        "likes": 0,
+        "image": None,  # 처리가 끝난 이미지 바이트
+        "image_job": image_job  # 처리 중인 이미지 작업 (없으면 None)
+    }
+    st.session_state.posts.append(new_post)
+    st.session_state.posts_by_id[post_id] = new_post
+
+    stats = st.session_state.post_stats
+    stats['author_counts'][author] = stats['author_counts'].get(author, 0) + 1
+    if image_job is not None:
+        stats['posts_with_images'] += 1
+
+    return new_post
+
+
+def resolve_post_image(post):
     """
-    PIL Image를 base64 문자열로 변환합니다.
+    이미지 처리 작업이 끝났으면 결과를 게시글에 붙이고, 표시할 이미지 바이트를 돌려줍니다.
+    아직 처리 중이면 None을 돌려줍니다.
     """
-    buffer = io.BytesIO()
-    image.save(buffer, format="PNG")
-    img_str = base64.b64encode(buffer.getvalue()).decode()
-    return img_str
+    job = post.get('image_job')
+    if job is not None and job.done():
+        post['image_job'] = None
+        try:
+            post['image'] = job.result()
+        except Exception:
+            post['image_error'] = True
+            st.session_state.post_stats['posts_with_images'] -= 1
+
+    return post.get('image')
+
+
+def like_post(post_id):
+    """
+    id로 게시글을 바로 찾아 좋아요를 1 올립니다.
+    """
+    post = st.session_state.posts_by_id.get(post_id)
+    if post is None:
+        return False
+
+    post['likes'] += 1
+    st.session_state.post_stats['total_likes'] += 1
+    return True
 
 
-def display_weather_data(class_num):
+def get_posts_page(page):
+    """
+    최신 글이 먼저 오도록 해당 페이지의 게시글만 잘라서 돌려줍니다.
+    page는 1부터 시작합니다.
+    """
+    posts = st.session_state.posts
+    end = len(posts) - (page - 1) * POSTS_PER_PAGE
+    start = max(end - POSTS_PER_PAGE, 0)
+    return posts[start:end][::-1]
+
+
+def display_weather_data(class_num, payload):
     """
     선택된 반의 날씨 센서 데이터를 표시합니다.
+    payload: fetch_dashboard_payload()의 결과
     """
-    group_info = SMARTFARM_GROUPS[class_num]
+    group_info = get_groups()[class_num]
 
     # 반 헤더 표시
     st.markdown(f"""
@@ -234,7 +250,7 @@ def display_weather_data(class_num):
 
     # 실제 API에서는 장치별로 날씨 데이터를 가져와야 하지만,
     # 여기서는 예시로 전체 날씨 데이터를 표시하고 반 정보를 함께 보여줍니다
-    weather_data = fetch_api_data("/api/weather")
+    weather_data = payload.get('weather')
 
     if weather_data:
         # 3개의 열로 나누어 각 센서 값을 표시합니다
@@ -295,12 +311,13 @@ def display_weather_data(class_num):
         st.warning(f"{group_info['name']} 날씨 데이터를 불러올 수 없습니다.")
 
 
-def display_soil_data(class_num, chart_key_suffix=""):
+def display_soil_data(class_num, payload, chart_key_suffix=""):
     """
     선택된 반의 토양수분 센서 데이터를 표시합니다.
+    payload: fetch_dashboard_payload()의 결과
     chart_key_suffix: plotly_chart의 고유 키를 위한 접미사
     """
-    group_info = SMARTFARM_GROUPS[class_num]
+    group_info = get_groups()[class_num]
 
     # 반 헤더 표시
     st.markdown(f"""
@@ -309,8 +326,8 @@ def display_soil_data(class_num, chart_key_suffix=""):
     </div>
     """, unsafe_allow_html=True)
 
-    # 해당 반의 장치들만 필터링해서 데이터 가져오기
-    soil_data = fetch_api_data("/api/soil/all", device_filter=group_info['devices'])
+    # 해당 반의 장치 데이터 (서버에서 반별로 걸러서 내려줍니다)
+    soil_data = payload.get('soil')
 
     if soil_data and soil_data.get('sensors'):
         sensors = soil_data['sensors']
@@ -322,50 +339,40 @@ def display_soil_data(class_num, chart_key_suffix=""):
         # 센서가 여러 개인 경우 열로 나누어 표시합니다
         cols = st.columns(len(sensors) if len(sensors) <= 4 else 4)
 
-        sensor_names = []
-        moisture_values = []
-        device_colors = []
-
-        for i, sensor in enumerate(sensors):
-            col_index = i % len(cols)
-
-            with cols[col_index]:
-                moisture_level = sensor['soil_moisture']
-                device_id = sensor['device_id']
-
-                # 토양수분 레벨에 따른 상태 판단
-                if moisture_level >= 70:
-                    status_text = "습함 💧"
-                    device_color = '#2E8B57'  # 녹색
-                elif moisture_level >= 40:
-                    status_text = "적당 🌿"
-                    device_color = '#32CD32'  # 연녹색
-                elif moisture_level >= 20:
-                    status_text = "건조 ⚠️"
-                    device_color = '#FFA500'  # 주황색
-                else:
-                    status_text = "매우건조 🚨"
-                    device_color = '#FF4500'  # 빨간색
+        sensor_names = [sensor['device_id'] for sensor in sensors]
+        moisture_values = [sensor['soil_moisture'] for sensor in sensors]
+        # 토양수분 레벨에 따른 상태/색은 서버가 analytics 모듈로 계산해서 보내줍니다
+        # (예전 서버 응답이면 여기서 계산합니다)
+        if all('status' in sensor for sensor in sensors):
+            status_texts = [sensor['status'] for sensor in sensors]
+            device_colors = [sensor['color'] for sensor in sensors]
+        else:
+            from analytics import classify_moisture
+            status_texts, device_colors = classify_moisture(moisture_values)
 
+        for i, (device_id, moisture_level, status_text) in enumerate(
+                zip(sensor_names, moisture_values, status_texts)):
+            with cols[i % len(cols)]:
                 st.metric(
                     label=f"🏷️ {device_id}",
                     value=f"{moisture_level}%",
                     delta=status_text
                 )
 
-                sensor_names.append(device_id)
-                moisture_values.append(moisture_level)
-                device_colors.append(device_color)
+        st.caption(f"반 평균 토양수분 {statistics.fmean(moisture_values):.1f}% · "
+                   f"최저 {min(moisture_values):.0f}% · 최고 {max(moisture_values):.0f}%")
 
         # 토양수분 데이터를 막대 차트로 시각화
         if sensor_names and moisture_values:
+            import plotly.graph_objects as go
+
             st.subheader(f"📊 {group_info['name']} 토양수분 비교 차트")
 
             fig = go.Figure(data=[
                 go.Bar(
                     x=sensor_names,
                     y=moisture_values,
-                    marker_color=device_colors,
+                    marker_color=list(device_colors),
                     text=[f'{val}%' for val in moisture_values],
                     textposition='auto',
                 )
@@ -385,13 +392,93 @@ def display_soil_data(class_num, chart_key_suffix=""):
         st.warning(f"{group_info['name']} 토양수분 데이터를 불러올 수 없습니다.")
 
 
-def display_system_status():
+@st.cache_data(ttl=60, show_spinner=False)
+def fetch_analytics(class_num, hours):
+    """
+    /api/analytics 결과 (서버도 60초 캐시하므로 같은 기간을 여러 번 봐도 DB를 다시 읽지 않습니다)
+    실패하면 None
+    """
+    try:
+        response = requests.get(f"{API_BASE_URL}/api/analytics",
+                                params={'class': class_num, 'hours': hours}, timeout=30)
+        if response.status_code == 200:
+            return response.json()
+    except requests.exceptions.RequestException:
+        pass
+    return None
+
+
+def display_analytics(class_num):
+    """
+    상세 분석 탭: 서버의 analytics 모듈이 계산한 반별/장치별 통계를 보여줍니다.
+    """
+    group_info = get_groups()[class_num]
+    st.subheader(f"📈 {group_info['name']} 상세 데이터 분석")
+
+    periods = {'최근 24시간': 24, '최근 7일': 24 * 7, '최근 30일': 24 * 30, '최근 1년': 24 * 365}
+    period = st.selectbox("기간", list(periods), index=1, key="analytics_period")
+    result = fetch_analytics(class_num, periods[period])
+    if result is None:
+        st.warning("분석 데이터를 불러올 수 없습니다.")
+        return
+
+    class_stats = result['classes'].get(str(class_num), {})
+    weather = result['weather']
+
+    def fmt(value, unit, digits=1):
+        return f"{value:.{digits}f}{unit}" if value is not None else "-"
+
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        vs = class_stats.get('vs_overall')
+        st.metric("현재 평균 토양수분", fmt(class_stats.get('current_mean'), "%"),
+                  f"전체 대비 {vs:+.1f}%p" if vs is not None else None)
+    with col2:
+        st.metric(f"물이 필요한 장치 (<{result['threshold']}%)",
+                  f"{class_stats.get('dry_devices', 0)} / {class_stats.get('reporting', 0)}대")
+    with col3:
+        st.metric("평균 기온", fmt(weather.get('temperature_mean'), "°C"),
+                  f"{fmt(weather.get('temperature_min'), '')} ~ {fmt(weather.get('temperature_max'), '')}°C"
+                  if weather.get('temperature_min') is not None else None, delta_color="off")
+    with col4:
+        st.metric("평균 습도", fmt(weather.get('humidity_mean'), "%"),
+                  f"비 {weather.get('rain_hours', 0):.0f}시간", delta_color="off")
+
+    import pandas as pd
+    import plotly.express as px
+
+    devices = pd.DataFrame(result['devices'])
+    if devices.empty:
+        st.info("기간 안에 토양수분 데이터가 없습니다.")
+        return
+    devices = devices[devices['device_id'].isin(group_info['devices'])]
+    if devices.empty:
+        st.info(f"{group_info['name']} 장치의 데이터가 없습니다.")
+        return
+
+    st.markdown("#### 🌵 장치별 마르는 속도")
+    fig = px.bar(devices, x='device_id', y='drying_rate_per_hour',
+                 labels={'device_id': '센서 ID', 'drying_rate_per_hour': '시간당 감소 (%p)'},
+                 text_auto='.2f', height=350)
+    st.plotly_chart(fig, use_container_width=True, key=f"drying_rate_{class_num}")
+
+    columns = {
+        'device_id': '장치', 'count': '측정 수', 'mean': '평균', 'min': '최저', 'max': '최고',
+        'last': '최근', 'drying_rate_per_hour': '마르는 속도(%p/h)', 'wetting_events': '물주기/비 횟수',
+        'rain_correlation': '강우 상관'
+    }
+    st.dataframe(devices[[c for c in columns if c in devices]].rename(columns=columns),
+                 hide_index=True, use_container_width=True)
+
+
+def display_system_status(payloads):
     """
     시스템 전체 상태를 확인하는 함수입니다.
+    payloads: {반 번호: fetch_dashboard_payload() 결과}
     """
     st.subheader("🔧 시스템 상태")
 
-    health_data = fetch_api_data("/health")
+    health_data = next(iter(payloads.values())).get('health')
 
     if health_data:
         col1, col2 = st.columns(2)
@@ -406,26 +493,104 @@ def display_system_status():
                 for service, description in health_data['services'].items():
                     st.write(f"• {description}")
     else:
-        st.warning("⚠️ Flask 서버에 연결할 수 없어 더미 데이터로 동작 중입니다")
+        st.warning("⚠️ Flask 서버에 연결할 수 없습니다")
         st.info(f"🕐 로컬 시간: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
 
     # 반별 장치 상태 표시
     st.markdown("---")
     st.subheader("📱 반별 장치 현황")
 
-    col1, col2 = st.columns(2)
+    groups = get_groups()
+    for col, class_num in zip(st.columns(len(payloads)), payloads):
+        with col:
+            group = groups[class_num]
+            st.markdown(f"### {group['emoji']} {group['name'].split()[0]}")
+            devices = payloads[class_num].get('devices')
+            if devices is None:
+                for device in group['devices']:
+                    st.write(f"• {device}: ⚠️ 상태 확인 불가")
+                continue
+
+            for device in devices:
+                # 장치는 값이 크게 바뀔 때만 보내므로, 오래 조용해도 heartbeat 예정 안이면 정상입니다
+                # 'ok' 일 때만 연결됨으로 보고, 서버가 수신을 모르면('never') 응답 없음, 상태가 없으면 알 수 없음
+                heartbeat = device.get('heartbeat')
+                if not device['has_data']:
+                    status = "❔ 수신 기록 없음"
+                elif heartbeat == 'ok':
+                    status = f"✅ 연결됨 (최근 수신 {device['last_update'][:19]})"
+                elif heartbeat == 'late':
+                    status = f"⏳ 보고 늦음 (최근 수신 {device['last_update'][:19]})"
+                elif heartbeat in ('silent', 'never'):
+                    status = f"🚨 응답 없음 (최근 수신 {device['last_update'][:19]})"
+                else:
+                    status = f"❔ 상태 확인 불가 (최근 수신 {device['last_update'][:19]})"
+                st.write(f"• {device['device_id']}: {status}")
 
-    with col1:
-        st.markdown("### 🌱 2반")
-        for device in SMARTFARM_GROUPS[1]['devices']:
-            status = "✅ 연결됨" if health_data else "⚠️ 더미 데이터"
-            st.write(f"• {device}: {status}")
+    st.markdown("---")
+    display_relay_control()
 
-    with col2:
-        st.markdown("### 🌿 4반")
-        for device in SMARTFARM_GROUPS[2]['devices']:
-            status = "✅ 연결됨" if health_data else "⚠️ 더미 데이터"
-            st.write(f"• {device}: {status}")
+
+def fetch_relay_state():
+    """
+    물주기 서버의 조별 릴레이 상태 (/api/relay/state). 연결할 수 없으면 None
+    """
+    if not RELAY_CONTROL_URL:
+        return None
+    try:
+        response = requests.get(f"{RELAY_CONTROL_URL}/api/relay/state", timeout=3)
+        response.raise_for_status()
+        return response.json()
+    except (requests.exceptions.RequestException, ValueError):
+        return None
+
+
+def send_relay_action(target, action):
+    """
+    물주기 서버로 릴레이 명령을 보냅니다. target: 조 번호 또는 'all'
+    """
+    try:
+        response = requests.post(f"{RELAY_CONTROL_URL}/api/relay/{target}/{action}", timeout=30)
+        result = response.json()
+    except (requests.exceptions.RequestException, ValueError) as e:
+        st.error(f"❌ 릴레이 명령 실패: {e}")
+        return
+    if target == 'all':
+        st.info(f"💧 전체 {action.upper()}: {result.get('success')}/{result.get('total')}대 성공")
+    elif result.get('ok'):
+        st.success(f"✅ {target}조 {action.upper()} 성공 ({result.get('latency_ms')}ms)")
+    else:
+        st.error(f"❌ {target}조 {action.upper()} 실패: {result.get('error')}")
+
+
+def display_relay_control():
+    """
+    릴레이 상태와 제어 버튼 (물주기 서버를 거치므로 명령 결과와 상태가 버튼/cron 과 한 곳에 남습니다)
+    """
+    st.subheader("💧 릴레이 제어")
+    states = fetch_relay_state()
+    if states is None:
+        st.info(f"물주기 서버({RELAY_CONTROL_URL or '설정 없음'})에 연결할 수 없어 릴레이를 제어할 수 없습니다")
+        return
+
+    col_on, col_off, _ = st.columns([1, 1, 4])
+    with col_on:
+        if st.button("💧 전체 ON", key="relay_all_on"):
+            send_relay_action('all', 'on')
+    with col_off:
+        if st.button("⏹️ 전체 OFF", key="relay_all_off"):
+            send_relay_action('all', 'off')
+
+    labels = {'on': '🟢 켜짐', 'off': '⚪ 꺼짐', 'unknown': '❔ 알 수 없음'}
+    for group, state in states.items():
+        col_name, col_state, col_on, col_off = st.columns([2, 3, 1, 1])
+        col_name.write(f"**{group}조** ({state['ip']})")
+        detail = f" · {state['latency_ms']}ms · {state['updated_at'][11:19]}" if state.get('updated_at') else ""
+        col_state.write(labels.get(state['state'], state['state']) + detail)
+        if col_on.button("ON", key=f"relay_{group}_on"):
+            send_relay_action(group, 'on')
+        if col_off.button("OFF", key=f"relay_{group}_off"):
+            send_relay_action(group, 'off')
 
 
 def display_bulletin_board():
@@ -460,38 +625,21 @@ def display_bulletin_board():
             help="PNG, JPG, JPEG, GIF 파일을 업로드할 수 있습니다."
         )
 
-        # 업로드된 이미지 미리보기
-        uploaded_image_data = None
-        if uploaded_file is not None:
-            try:
-                image = Image.open(uploaded_file)
-                # 이미지 크기 조정 (너무 큰 이미지는 리사이즈)
-                max_size = (800, 600)
-                image.thumbnail(max_size, Image.Resampling.LANCZOS)
-
-                st.image(image, caption="업로드된 이미지 미리보기", width=300)
-
-                # 이미지를 base64로 인코딩하여 세션에 저장할 준비
-                uploaded_image_data = image_to_base64(image)
-
-            except Exception as e:
-                st.error(f"이미지 처리 중 오류가 발생했습니다: {str(e)}")
+        st.caption("사진은 등록 후 자동으로 축소·최적화되어 게시됩니다.")
 
         submitted = st.form_submit_button("📤 게시글 등록", use_container_width=True)
 
         if submitted:
             if author_name and post_title and post_content:
-                new_post = {
-                    "id": len(st.session_state.posts) + 1,
-                    "author": author_name,
-                    "category": post_category,
-                    "title": post_title,
-                    "content": post_content,
-                    "timestamp": datetime.now(),
-                    "likes": 0,
-                    "image": uploaded_image_data  # 이미지 데이터 추가
-                }
-                st.session_state.posts.insert(0, new_post)
+                # 이미지 처리는 작업 풀에서 진행하고 게시글은 바로 등록합니다
+                image_job = None
+                if uploaded_file is not None:
+                    # PIL과 이미지 작업 풀은 사진을 처음 올릴 때 만듭니다
+                    from image_pipeline import submit_image
+                    image_job = submit_image(uploaded_file.getvalue())
+
+                add_post(author_name, post_category, post_title, post_content, image_job)
+                st.session_state.board_page = 1
                 st.success("✅ 게시글이 성공적으로 등록되었습니다!")
                 st.rerun()
             else:
@@ -503,25 +651,37 @@ def display_bulletin_board():
     st.write("### 📋 게시글 목록")
 
     if st.session_state.posts:
-        # 게시글 통계 표시
+        # 게시글 통계 표시 (카운터 값만 읽습니다)
+        stats = st.session_state.post_stats
         col1, col2, col3, col4 = st.columns(4)
         with col1:
             st.metric("📝 총 게시글", len(st.session_state.posts))
         with col2:
-            total_likes = sum(post['likes'] for post in st.session_state.posts)
-            st.metric("👍 총 좋아요", total_likes)
+            st.metric("👍 총 좋아요", stats['total_likes'])
         with col3:
-            unique_authors = len(set(post['author'] for post in st.session_state.posts))
-            st.metric("👥 참여 인원", unique_authors)
+            st.metric("👥 참여 인원", len(stats['author_counts']))
         with col4:
-            posts_with_images = len([post for post in st.session_state.posts if post.get('image')])
-            st.metric("📸 사진 게시글", posts_with_images)
+            st.metric("📸 사진 게시글", stats['posts_with_images'])
 
         st.markdown("---")
 
-        # 각 게시글을 카드 형태로 표시
-        for post in st.session_state.posts:
-            time_ago = datetime.now() - post['timestamp']
+        # 페이지 선택
+        total_pages = (len(st.session_state.posts) - 1) // POSTS_PER_PAGE + 1
+        if 'board_page' not in st.session_state:
+            st.session_state.board_page = 1
+        st.session_state.board_page = min(st.session_state.board_page, total_pages)
+
+        page = st.number_input(
+            f"📄 페이지 (전체 {total_pages}쪽)",
+            min_value=1,
+            max_value=total_pages,
+            key="board_page"
+        )
+
+        # 현재 페이지의 게시글만 카드 형태로 표시
+        now = datetime.now()
+        for post in get_posts_page(page):
+            time_ago = now - post['timestamp']
             if time_ago.days > 0:
                 time_str = f"{time_ago.days}일 전"
             elif time_ago.seconds > 3600:
@@ -535,7 +695,9 @@ def display_bulletin_board():
 
             with st.container():
                 # 게시글 헤더 정보
-                image_indicator = " 📸" if post.get('image') else ""
+                image_data = resolve_post_image(post)
+                has_image = image_data or post.get('image_job') is not None
+                image_indicator = " 📸" if has_image else ""
                 st.markdown(f"""
                 <div class="post-card">
                     <div class="post-title">{post['category']} {post['title']}{image_indicator}</div>
@@ -544,29 +706,23 @@ def display_bulletin_board():
                 </div>
                 """, unsafe_allow_html=True)
 
-                # 첨부된 이미지가 있으면 표시
-                if post.get('image'):
-                    try:
-                        # base64 이미지를 다시 디코딩해서 표시
-                        image_data = base64.b64decode(post['image'])
-                        image = Image.open(io.BytesIO(image_data))
-
-                        # 이미지를 중앙 정렬하여 표시
-                        col1, col2, col3 = st.columns([1, 2, 1])
-                        with col2:
-                            st.image(image, use_column_width=True, caption="첨부된 사진")
-
-                    except Exception as e:
-                        st.error("이미지를 불러올 수 없습니다.")
+                # 첨부된 이미지가 있으면 표시 (보이는 페이지의 이미지만 전송됩니다)
+                if has_image:
+                    # 이미지를 중앙 정렬하여 표시
+                    col1, col2, col3 = st.columns([1, 2, 1])
+                    with col2:
+                        if image_data:
+                            st.image(image_data, use_column_width=True, caption="첨부된 사진")
+                        else:
+                            st.caption("⏳ 사진을 처리하고 있습니다. 잠시 후 새로고침하세요.")
+                elif post.get('image_error'):
+                    st.error("이미지를 불러올 수 없습니다.")
 
                 # 좋아요 및 댓글 버튼
                 col1, col2, col3 = st.columns([1, 1, 8])
                 with col1:
                     if st.button("👍", key=f"like_{post['id']}", help="좋아요"):
-                        for i, p in enumerate(st.session_state.posts):
-                            if p['id'] == post['id']:
-                                st.session_state.posts[i]['likes'] += 1
-                                break
+                        like_post(post['id'])
                         st.rerun()
 
                 with col2:
@@ -593,7 +749,8 @@ def main():
     """
     # 현재 선택된 반 가져오기
     current_class = get_current_class()
-    group_info = SMARTFARM_GROUPS[current_class]
+    groups = get_groups()
+    group_info = groups[current_class]
 
     # 페이지 제목에 현재 반 정보 포함
     st.markdown(
@@ -608,26 +765,18 @@ def main():
         st.subheader("🏫 반 선택")
 
         # URL 링크 버튼들
-        col1, col2 = st.columns(2)
-
-        with col1:
-            if st.button("🌱 2반", key="class1_btn",
-                         type="primary" if current_class == 1 else "secondary"):
-                set_class_url(1)
-                st.session_state.selected_class = 1
-                st.rerun()
-
-        with col2:
-            if st.button("🌿 4반", key="class2_btn",
-                         type="primary" if current_class == 2 else "secondary"):
-                set_class_url(2)
-                st.session_state.selected_class = 2
-                st.rerun()
+        for col, (class_num, group) in zip(st.columns(len(groups)), groups.items()):
+            with col:
+                if st.button(f"{group['emoji']} {group['name'].split()[0]}", key=f"class{class_num}_btn",
+                             type="primary" if current_class == class_num else "secondary"):
+                    set_class_url(class_num)
+                    st.session_state.selected_class = class_num
+                    st.rerun()
 
         # URL 정보 표시
         st.markdown("**🔗 직접 접속 링크:**")
-        st.markdown(f"• [2반 대시보드](?class=1)")
-        st.markdown(f"• [4반 대시보드](?class=2)")
+        for class_num, group in groups.items():
+            st.markdown(f"• [{group['name'].split()[0]} 대시보드](?class={class_num})")
 
         st.markdown("---")
 
@@ -656,54 +805,50 @@ def main():
             st.markdown("---")
             st.subheader("📝 게시판 현황")
             st.write(f"• 총 게시글: {len(st.session_state.posts)}개")
-            posts_with_images = len([post for post in st.session_state.posts if post.get('image')])
-            st.write(f"• 사진 게시글: {posts_with_images}개")
-            st.write(f"• 최근 게시글: {st.session_state.posts[0]['title'][:15]}...")
+            st.write(f"• 사진 게시글: {st.session_state.post_stats['posts_with_images']}개")
+            st.write(f"• 최근 게시글: {st.session_state.posts[-1]['title'][:15]}...")
 
-    # 메인 콘텐츠를 탭으로 구성
-    # 반별 데이터와 전체 기능을 함께 제공
-    tab1, tab2, tab3, tab4, tab5 = st.tabs([
+    # 메인 콘텐츠 화면 선택
+    # st.tabs 는 보이지 않는 탭까지 다시 실행할 때마다 모두 그리므로, 고른 화면 하나만 그립니다
+    # (무거운 모듈도 그 화면을 처음 열 때 import 됩니다)
+    views = [
         f"📊 {group_info['emoji']} {current_class}반 데이터",
         "🔄 반별 비교",
         "📈 상세 분석",
         "⚙️ 시스템",
         "📝 커뮤니티"
-    ])
+    ]
+    view = st.radio("화면", range(len(views)), format_func=views.__getitem__, horizontal=True,
+                    key="view", label_visibility="collapsed")
 
-    with tab1:
-        # 선택된 반의 실시간 데이터 표시
-        display_weather_data(current_class)
-        st.markdown("---")
-        display_soil_data(current_class, "_main")
+    # 반별 대시보드 데이터는 필요한 반만 한 번씩 받아옵니다 (반별 비교/시스템 화면은 모든 반을 씁니다)
+    needed = groups if view in (1, 3) else [current_class]
+    payloads = {class_num: fetch_dashboard_payload(class_num) for class_num in needed}
 
-    with tab2:
-        # 반별 비교 탭
-        st.subheader("🔄 2반 vs 4반 비교")
+    display_data_source(payloads[current_class])
 
-        col1, col2 = st.columns(2)
-
-        with col1:
-            st.markdown("### 🌱 2반 데이터")
-            display_soil_data(1, "_compare_left")
+    if view == 0:
+        # 선택된 반의 실시간 데이터 표시
+        display_weather_data(current_class, payloads[current_class])
+        st.markdown("---")
+        display_soil_data(current_class, payloads[current_class], "_main")
 
-        with col2:
-            st.markdown("### 🌿 4반 데이터")
-            display_soil_data(2, "_compare_right")
+    elif view == 1:
+        # 반별 비교
+        st.subheader(f"🔄 {' vs '.join(group['name'].split()[0] for group in groups.values())} 비교")
 
-    with tab3:
-        st.subheader("📈 상세 데이터 분석")
-        st.info(f"이 섹션에서는 {group_info['name']}의 시간별 트렌드, 일별 통계, 센서 비교 분석 등의 기능을 추가할 예정입니다.")
+        for col, (class_num, group) in zip(st.columns(len(groups)), groups.items()):
+            with col:
+                st.markdown(f"### {group['emoji']} {group['name'].split()[0]} 데이터")
+                display_soil_data(class_num, payloads[class_num], f"_compare_{class_num}")
 
-        col1, col2 = st.columns(2)
-        with col1:
-            st.metric(f"{group_info['name']} 평균 온도", "23.5°C", "↑2.1°C")
-        with col2:
-            st.metric(f"{group_info['name']} 평균 습도", "65.2%", "↓3.4%")
+    elif view == 2:
+        display_analytics(current_class)
 
-    with tab4:
-        display_system_status()
+    elif view == 3:
+        display_system_status(payloads)
 
-    with tab5:
+    else:
         display_bulletin_board()
 
     # 자동 새로고침 기능
@@ -0,0 +1,86 @@
+"""
+센서 기록 내보내기 스크립트
+
+weather_data, soil_moisture_data 테이블을 JSON Lines 파일로 저장합니다.
+저장한 파일은 replay_server.py 로 다시 재생할 수 있습니다.
+
+사용 예:
+    python export_traces.py traces.jsonl --since 2025-10-01 --until 2025-10-08
+"""
+import argparse
+import json
+import logging
+
+from weather_data_aws import get_db_connection
+
+logging.basicConfig(level=logging.INFO)
+
+
+def export_traces(path, since=None, until=None):
+    """
+    기간 안의 날씨/토양수분 기록을 수신 시각 순서로 파일에 씁니다.
+    """
+    conditions = []
+    params = []
+    if since:
+        conditions.append('received_at >= %s')
+        params.append(since)
+    if until:
+        conditions.append('received_at < %s')
+        params.append(until)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+    conn = get_db_connection()
+    # 서버 쪽 커서로 나눠 읽어서 큰 기간도 메모리에 다 올리지 않습니다
+    weather_cursor = conn.cursor(name='export_weather')
+    weather_cursor.itersize = 5000
+    weather_cursor.execute(f'''
+        SELECT device_id, rain_detected, humidity, temperature, received_at
+        FROM weather_data {where}
+        ORDER BY received_at
+    ''', params)
+
+    count = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        for row in weather_cursor:
+            f.write(json.dumps({
+                'type': 'weather',
+                'device_id': row[0],
+                'rain_status': row[1],
+                'humidity': row[2],
+                'temperature': row[3],
+                'received_at': row[4].isoformat()
+            }, ensure_ascii=False) + '\n')
+            count += 1
+        weather_cursor.close()
+
+        soil_cursor = conn.cursor(name='export_soil')
+        soil_cursor.itersize = 5000
+        soil_cursor.execute(f'''
+            SELECT device_id, soil_moisture, received_at
+            FROM soil_moisture_data {where}
+            ORDER BY received_at
+        ''', params)
+        for row in soil_cursor:
+            f.write(json.dumps({
+                'type': 'soil',
+                'device_id': row[0],
+                'soil_moisture': row[1],
+                'received_at': row[2].isoformat()
+            }, ensure_ascii=False) + '\n')
+            count += 1
+        soil_cursor.close()
+
+    conn.close()
+    logging.info(f"{count}건을 {path} 에 저장했습니다")
+    return count
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='센서 기록을 JSON Lines 파일로 내보냅니다')
+    parser.add_argument('path', help='저장할 파일 경로')
+    parser.add_argument('--since', help='시작 시각 (예: 2025-10-01)')
+    parser.add_argument('--until', help='끝 시각 (이 시각은 포함하지 않음)')
+    args = parser.parse_args()
+
+    export_traces(args.path, args.since, args.until)
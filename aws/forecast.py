@@ -0,0 +1,179 @@
+"""
+토양수분 건조 예측 모듈
+
+장치마다 '마지막 물주기(또는 비) 이후 마르는 구간'에 직선을 맞추고,
+그 기울기로 토양수분이 임계값까지 내려가는 시각을 예측합니다.
+
+- 측정값이 들어올 때마다 observe()로 합계 몇 개만 고칩니다 (장치당 O(1) 시간/메모리)
+- 오래된 측정은 HALF_LIFE_HOURS 반감기로 가중치를 줄여서 최근 마르는 속도를 따라갑니다
+- 물주기/비로 WETTING_JUMP 넘게 오르면 새 구간을 시작하고, 지난 구간들의 속도는 평균으로 남겨서
+  새 구간의 측정이 적을 때 대신 씁니다
+- 예측 결과는 새 측정이 들어올 때까지 캐시합니다
+"""
+import threading
+from datetime import datetime, timedelta
+
+from analytics import WETTING_JUMP
+
+# 측정 가중치 반감기 (시간)
+HALF_LIFE_HOURS = 12.0
+# 구간 기울기를 믿기 위한 최소 측정 수와 최소 길이 (시간)
+MIN_POINTS = 4
+MIN_SPAN_HOURS = 1.0
+# 지난 구간 속도 평균에 새 구간 속도를 섞는 비율
+HISTORY_WEIGHT = 0.3
+# 연속된 두 측정 사이가 이보다 길면 새 구간으로 시작합니다 (시간)
+MAX_GAP_HOURS = 6.0
+
+
+class DryingModel:
+    """
+    장치 하나의 가중 최소제곱 직선 (x: 구간 시작부터의 시간, y: 토양수분)
+    """
+    __slots__ = ('start', 'last_at', 'last_value', 'sw', 'sx', 'sy', 'sxx', 'sxy',
+                 'points', 'history_rate', 'segments')
+
+    def __init__(self):
+        self.start = None
+        self.last_at = None
+        self.last_value = None
+        self.history_rate = None
+        self.segments = 0
+        self._reset()
+
+    def _reset(self):
+        self.sw = self.sx = self.sy = self.sxx = self.sxy = 0.0
+        self.points = 0
+
+    def observe(self, value, at):
+        """측정 하나를 반영합니다 (at: datetime)"""
+        if self.last_at is not None and at <= self.last_at:
+            return
+        if self.last_at is not None:
+            gap = (at - self.last_at).total_seconds() / 3600
+            if value - self.last_value > WETTING_JUMP or gap > MAX_GAP_HOURS:
+                self._close_segment()
+        if self.points == 0:
+            self.start = at
+
+        x = (at - self.start).total_seconds() / 3600
+        if self.last_at is not None and self.points:
+            decay = 0.5 ** ((at - self.last_at).total_seconds() / 3600 / HALF_LIFE_HOURS)
+            self.sw *= decay
+            self.sx *= decay
+            self.sy *= decay
+            self.sxx *= decay
+            self.sxy *= decay
+        self.sw += 1
+        self.sx += x
+        self.sy += value
+        self.sxx += x * x
+        self.sxy += x * value
+        self.points += 1
+        self.last_at = at
+        self.last_value = value
+
+    def _segment_fit(self):
+        """(기울기, 현재 시각에서의 값) — 구간이 짧으면 (None, None)"""
+        if self.points < MIN_POINTS:
+            return None, None
+        span = (self.last_at - self.start).total_seconds() / 3600
+        denominator = self.sw * self.sxx - self.sx * self.sx
+        if span < MIN_SPAN_HOURS or denominator <= 1e-9:
+            return None, None
+        slope = (self.sw * self.sxy - self.sx * self.sy) / denominator
+        intercept = (self.sy - slope * self.sx) / self.sw
+        return slope, intercept + slope * span
+
+    def _close_segment(self):
+        slope, _ = self._segment_fit()
+        if slope is not None and slope < 0:
+            rate = -slope
+            self.history_rate = rate if self.history_rate is None else \
+                (1 - HISTORY_WEIGHT) * self.history_rate + HISTORY_WEIGHT * rate
+            self.segments += 1
+        self._reset()
+
+    def predict(self, threshold):
+        """
+        임계값까지 남은 시간 예측. 마르는 속도를 모르거나 마르지 않는 중이면 hours_to_threshold 는 None
+        """
+        slope, level = self._segment_fit()
+        if slope is not None and slope < 0:
+            rate, basis = -slope, 'segment'
+        elif self.history_rate is not None:
+            rate, basis, level = self.history_rate, 'history', None
+        else:
+            rate, basis, level = None, 'insufficient', None
+        if level is None:
+            level = self.last_value
+
+        hours = None
+        if level is not None and level <= threshold:
+            hours = 0.0
+        elif rate:
+            hours = (level - threshold) / rate
+
+        return {
+            'current_moisture': round(level, 1) if level is not None else None,
+            'last_moisture': self.last_value,
+            'last_reading_at': self.last_at.isoformat() if self.last_at else None,
+            'drying_rate_per_hour': round(rate, 3) if rate else None,
+            'basis': basis,
+            'segment_points': self.points,
+            'hours_to_threshold': round(hours, 2) if hours is not None else None,
+            'predicted_at': (self.last_at + timedelta(hours=hours)).isoformat()
+            if hours is not None and self.last_at else None
+        }
+
+
+class ForecastService:
+    """
+    장치별 DryingModel 과 예측 캐시. 여러 요청 스레드에서 함께 써도 됩니다.
+    loader: 처음 보는 장치의 최근 측정 [(값, 시각), ...] 을 돌려주는 함수 (서버 재시작 후 모델 복원용)
+    """
+
+    def __init__(self, loader=None):
+        self.loader = loader
+        self._models = {}
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def _model(self, device_id):
+        """
+        장치 모델. 처음 보는 장치는 잠금 밖에서 loader 로 최근 측정을 불러와 만듭니다
+        (느린 DB 조회가 다른 장치의 observe/forecast 를 막지 않게, 실패하면 저장하지 않아 다음에 다시 불러옵니다)
+        """
+        with self._lock:
+            model = self._models.get(device_id)
+        if model is not None:
+            return model
+
+        model = DryingModel()
+        if self.loader:
+            for value, at in self.loader(device_id):
+                model.observe(float(value), at)
+        with self._lock:
+            # 불러오는 동안 다른 스레드가 먼저 만들었으면 그것을 씁니다
+            return self._models.setdefault(device_id, model)
+
+    def observe(self, device_id, value, at=None):
+        model = self._model(device_id)
+        with self._lock:
+            model.observe(float(value), at or datetime.now())
+            self._cache.pop(device_id, None)
+
+    def forecast(self, device_id, threshold):
+        """
+        hours_to_threshold 는 마지막 측정 시각부터 센 시간이라, 지금까지 지난 시간(age_seconds)도 함께 돌려줍니다.
+        """
+        model = self._model(device_id)
+        with self._lock:
+            result = self._cache.get(device_id, {}).get(threshold)
+            if result is None:
+                result = dict(model.predict(threshold), device_id=device_id, threshold=threshold)
+                self._cache.setdefault(device_id, {})[threshold] = result
+            last_at = model.last_at
+        # 캐시된 예측이어도 경과 시간은 지금 기준으로 계산합니다 (서버 시계 기준)
+        age = round((datetime.now() - last_at).total_seconds(), 1) if last_at else None
+        return dict(result, age_seconds=age)
@@ -0,0 +1,98 @@
+"""
+장치 heartbeat 추적 모듈
+
+장치들이 값이 크게 바뀔 때만 보내고, 안 바뀌면 긴 heartbeat 간격으로만 보내게 되면서
+'한동안 안 왔다'만으로는 조용한 것인지 고장인지 알 수 없습니다.
+그래서 장치마다 마지막 수신 시각과 '다음 보고 예정 시각'을 들고 있다가 상태를 나눕니다.
+
+- 다음 보고 예정: 장치가 보낸 next_report_seconds (없으면 config/smartfarm.json 의 reporting.<종류>.heartbeat)
+- ok:      예정 시각 x LATE_FACTOR 안에 들어옴 (값이 안 바뀌어서 조용한 것)
+- late:    예정 시각을 넘김 (전송 한두 번 실패)
+- silent:  heartbeat 를 MISSING_FACTOR 번 이상 놓침 (전원/통신/센서 고장 의심)
+- never:   서버가 아는 기록이 없음
+"""
+import threading
+from datetime import datetime, timedelta
+
+# 예정 시각에 이 배수까지는 늦어도 정상으로 봅니다 (전송 지연/재시도 여유)
+LATE_FACTOR = 1.25
+# heartbeat 를 이만큼 놓치면 응답 없음으로 봅니다
+MISSING_FACTOR = 3
+# 장치가 간격을 알려주지 않고 설정에도 없을 때 쓰는 간격 (초)
+DEFAULT_INTERVALS = {'soil': 600, 'weather': 300, 'rain': 300}
+
+
+class HeartbeatTracker:
+    """
+    장치별 마지막 수신 시각과 보고 간격. 여러 요청 스레드에서 함께 써도 됩니다.
+    loader: 서버 재시작 후 처음 쓸 때 [(device_id, 종류, 마지막 수신 시각), ...] 을 돌려주는 함수
+    intervals: 종류별 기본 간격(초)을 돌려주는 함수 (설정 파일을 고치면 바로 반영되도록 함수로 받습니다)
+    """
+
+    def __init__(self, loader=None, intervals=None):
+        self.loader = loader
+        self.intervals = intervals or (lambda: DEFAULT_INTERVALS)
+        self._devices = {}
+        self._loaded = loader is None
+        self._lock = threading.Lock()
+
+    def _default_interval(self, kind):
+        return self.intervals().get(kind) or DEFAULT_INTERVALS.get(kind, 600)
+
+    def _load(self):
+        if self._loaded:
+            return
+        # 불러오기가 실패하면 다음 호출 때 다시 시도합니다
+        for device_id, kind, last_at in self.loader():
+            if device_id not in self._devices:
+                self._devices[device_id] = {'kind': kind, 'last_at': last_at, 'interval': None}
+        self._loaded = True
+
+    def observe(self, device_id, kind, next_report_seconds=None, at=None):
+        """수신 한 번을 기록합니다 (next_report_seconds: 장치가 알려준 다음 보고까지 최대 시간)"""
+        try:
+            interval = float(next_report_seconds) if next_report_seconds else None
+        except (TypeError, ValueError):
+            interval = None
+        with self._lock:
+            self._load()
+            self._devices[device_id] = {'kind': kind, 'last_at': at or datetime.now(), 'interval': interval}
+
+    def _describe(self, device_id, record, now):
+        if record is None:
+            return {'device_id': device_id, 'state': 'never', 'last_seen': None,
+                    'interval_seconds': None, 'expected_by': None, 'overdue_seconds': None}
+
+        interval = record['interval'] or self._default_interval(record['kind'])
+        expected_by = record['last_at'] + timedelta(seconds=interval)
+        elapsed = (now - record['last_at']).total_seconds()
+        if elapsed <= interval * LATE_FACTOR:
+            state = 'ok'
+        elif elapsed <= interval * MISSING_FACTOR:
+            state = 'late'
+        else:
+            state = 'silent'
+        return {
+            'device_id': device_id,
+            'kind': record['kind'],
+            'state': state,
+            'last_seen': record['last_at'].isoformat(),
+            'interval_seconds': interval,
+            'interval_source': 'device' if record['interval'] else 'config',
+            'expected_by': expected_by.isoformat(),
+            'overdue_seconds': round(max(0.0, (now - expected_by).total_seconds()), 1)
+        }
+
+    def status(self, device_ids=None, now=None):
+        """
+        장치별 상태 목록. device_ids 를 주면 (기록이 없는 장치도 'never'로) 그 장치들만 돌려줍니다.
+        """
+        now = now or datetime.now()
+        with self._lock:
+            self._load()
+            ids = sorted(self._devices) if device_ids is None else device_ids
+            return [self._describe(d, self._devices.get(d), now) for d in ids]
+
+    def state(self, device_id, now=None):
+        """장치 하나의 상태 문자열 (ok/late/silent/never)"""
+        return self.status([device_id], now)[0]['state']
@@ -0,0 +1,71 @@
+"""
+게시판 업로드 이미지 처리 모듈
+
+휴대폰 사진처럼 큰 이미지를 Streamlit 스크립트 스레드 밖(작업 스레드 풀)에서
+축소 → EXIF 제거 → JPEG 재인코딩 합니다.
+"""
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps
+
+# 게시판에 저장할 최대 이미지 크기 (픽셀)
+MAX_IMAGE_SIZE = (800, 600)
+# 인코딩 결과 최대 용량 (바이트)
+MAX_IMAGE_BYTES = 200 * 1024
+# 용량을 맞출 때 시도할 JPEG 품질 (높은 순서)
+JPEG_QUALITIES = (85, 75, 65, 55, 45)
+# 동시에 처리할 이미지 수
+WORKER_COUNT = 4
+
+# 프로세스당 하나의 풀을 공유합니다 (Streamlit은 모듈을 한 번만 import 합니다)
+_executor = ThreadPoolExecutor(max_workers=WORKER_COUNT, thread_name_prefix="image")
+
+
+def _to_rgb(image):
+    """
+    투명 배경은 흰색으로 채워서 JPEG로 저장할 수 있는 RGB 이미지로 바꿉니다.
+    """
+    if image.mode in ("RGBA", "LA", "P"):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    if image.mode != "RGB":
+        return image.convert("RGB")
+    return image
+
+
+def process_image(data, max_size=MAX_IMAGE_SIZE, max_bytes=MAX_IMAGE_BYTES):
+    """
+    업로드된 이미지 바이트를 게시판용 JPEG 바이트로 변환합니다.
+    - JPEG는 draft 모드로 디코딩 단계에서 바로 축소합니다
+    - 회전 정보만 반영하고 EXIF(위치 정보 등)는 저장하지 않습니다
+    - max_bytes 이하가 될 때까지 품질과 크기를 낮춰서 다시 인코딩합니다
+    """
+    image = Image.open(io.BytesIO(data))
+    # JPEG가 아니면 draft는 아무 일도 하지 않습니다
+    image.draft("RGB", max_size)
+    image = ImageOps.exif_transpose(image)
+    image = _to_rgb(image)
+    image.thumbnail(max_size, Image.Resampling.LANCZOS)
+
+    while True:
+        for quality in JPEG_QUALITIES:
+            buffer = io.BytesIO()
+            image.save(buffer, format="JPEG", quality=quality, optimize=True)
+            if buffer.tell() <= max_bytes:
+                return buffer.getvalue()
+
+        # 가장 낮은 품질로도 크면 크기를 줄여서 다시 시도합니다
+        width, height = image.size
+        if width <= 64 or height <= 64:
+            return buffer.getvalue()
+        image = image.resize((width * 3 // 4, height * 3 // 4), Image.Resampling.LANCZOS)
+
+
+def submit_image(data):
+    """
+    이미지 처리를 작업 풀에 맡기고 Future를 돌려줍니다.
+    """
+    return _executor.submit(process_image, data)
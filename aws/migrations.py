@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+DB 스키마 마이그레이션 모듈
+
+서버를 켤 때마다 CREATE TABLE / ALTER TABLE 을 모두 다시 실행하지 않고,
+적용한 버전을 schema_migrations 테이블에 적어 두었다가 아직 적용하지 않은 것만 실행합니다.
+이미 최신이면 버전 조회 한 번으로 끝납니다.
+
+단계 종류
+- sql:       일반 DDL. lock_timeout 을 걸어서, 긴 조회 뒤에 줄을 서며 센서 저장을 막지 않게 합니다
+- index:     CREATE INDEX CONCURRENTLY (트랜잭션 밖에서 실행, 만들다 실패해서 남은 INVALID 인덱스는 지우고 다시 만듭니다)
+- backfill:  UPDATE 를 id 범위로 나눠 BACKFILL_BATCH 행씩 따로 커밋합니다 (한 번에 큰 잠금/WAL 을 만들지 않게)
+
+모든 단계는 다시 실행해도 안전하게 씁니다 (중간에 끊기면 처음 단계부터 다시 실행합니다).
+서버 여러 개가 동시에 켜져도 advisory lock 으로 한 곳에서만 실행합니다.
+
+채우기는 큰 테이블에서 오래 걸리므로 서버 시작 때는 migrate(backfill=False)로 채우기가 있는 버전 앞까지만
+적용하고, 나머지는 백그라운드 스레드나 CLI 로 적용합니다. 그래서 채우기는 채우기만 있는 버전에 따로 둡니다.
+
+새 마이그레이션은 MIGRATIONS 끝에 다음 버전 번호로 추가합니다. 이미 적용한 항목은 고치지 않습니다.
+
+사용 예:
+    python migrations.py            # 밀린 마이그레이션 적용
+    python migrations.py --status   # 적용 상태만 확인
+"""
+import argparse
+import logging
+import time
+
+logging.basicConfig(level=logging.INFO)
+
+# DDL이 잠금을 기다리는 최대 시간 (넘으면 실패하고 다음 시작 때 다시 시도합니다)
+LOCK_TIMEOUT = '5s'
+# 채우기(backfill) 한 번에 고칠 id 범위
+BACKFILL_BATCH = 5000
+# 채우기 묶음 사이에 쉬는 시간 (초) — 센서 저장과 번갈아 가게 합니다
+BACKFILL_PAUSE = 0.05
+# pg_advisory_lock 키 (아무 정수나 되지만 다른 프로그램과 겹치지 않게)
+ADVISORY_LOCK_KEY = 20250901
+
+
+def sql(statement):
+    return ('sql', statement)
+
+
+def index(name, table, definition):
+    return ('index', name, table, definition)
+
+
+def backfill(table, assignment, condition, lookups=None):
+    """
+    lookups: {이름: 조회 SQL}. 채우기 전에 한 번씩 실행한 첫 컬럼 목록을 condition 의 %(이름)s 로 넘깁니다
+    (묶음마다 같은 하위 조회를 다시 하지 않게)
+    """
+    return ('backfill', table, assignment, condition, lookups or {})
+
+
+# (버전, 이름, 단계 목록)
+MIGRATIONS = [
+    (1, '기본 테이블', [
+        sql('''
+            CREATE TABLE IF NOT EXISTS weather_data (
+                id SERIAL PRIMARY KEY,
+                device_id VARCHAR(50),
+                timestamp TIMESTAMP,
+                rain_detected VARCHAR(20),
+                humidity FLOAT,
+                temperature FLOAT,
+                received_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        '''),
+        sql('''
+            CREATE TABLE IF NOT EXISTS soil_moisture_data (
+                id SERIAL PRIMARY KEY,
+                device_id VARCHAR(50) DEFAULT 'smartfarm_01',
+                soil_moisture FLOAT NOT NULL,
+                timestamp VARCHAR(50),
+                received_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        '''),
+        # 관수(릴레이) 이벤트 기록 테이블
+        sql('''
+            CREATE TABLE IF NOT EXISTS irrigation_events (
+                id SERIAL PRIMARY KEY,
+                device_id VARCHAR(50) NOT NULL,
+                action VARCHAR(10) NOT NULL,
+                source VARCHAR(20) NOT NULL,
+                ok BOOLEAN DEFAULT TRUE,
+                duration_seconds FLOAT,
+                reason VARCHAR(50),
+                event_time TIMESTAMP NOT NULL,
+                received_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        '''),
+        # 예전 서버가 만든 테이블에 빠진 컬럼 (NULL 허용 컬럼 추가는 테이블을 다시 쓰지 않습니다)
+        sql('ALTER TABLE weather_data ADD COLUMN IF NOT EXISTS humidity FLOAT'),
+        sql('ALTER TABLE weather_data ADD COLUMN IF NOT EXISTS temperature FLOAT'),
+        # 길이만 늘리는 VARCHAR 변경은 다시 쓰지 않지만 잠깐 배타 잠금을 잡으므로 필요할 때만 합니다
+        sql('''
+            DO $$
+            BEGIN
+                IF (SELECT character_maximum_length FROM information_schema.columns
+                    WHERE table_name = 'weather_data' AND column_name = 'rain_detected') < 20 THEN
+                    ALTER TABLE weather_data ALTER COLUMN rain_detected TYPE VARCHAR(20);
+                END IF;
+            END $$
+        '''),
+        # 장치별 최신값 조회용 인덱스
+        index('idx_soil_device_received', 'soil_moisture_data', '(device_id, received_at DESC)'),
+        # 장치별/기간별 관수 조회용 인덱스
+        index('idx_irrigation_device_time', 'irrigation_events', '(device_id, event_time)'),
+    ]),
+    (2, '온습도 요약값과 강우 엣지 기록', [
+        # 온습도 요약값 (라즈베리파이에서 여러 번 읽어서 보냅니다)
+        sql('''
+            ALTER TABLE weather_data
+                ADD COLUMN IF NOT EXISTS temperature_min FLOAT,
+                ADD COLUMN IF NOT EXISTS temperature_max FLOAT,
+                ADD COLUMN IF NOT EXISTS humidity_min FLOAT,
+                ADD COLUMN IF NOT EXISTS humidity_max FLOAT,
+                ADD COLUMN IF NOT EXISTS sample_count INTEGER
+        '''),
+        # 강우 엣지 기록 (비 시작/종료 시각, 전송 구간 중 비 온 시간)
+        sql('''
+            ALTER TABLE weather_data
+                ADD COLUMN IF NOT EXISTS rain_started_at TIMESTAMP,
+                ADD COLUMN IF NOT EXISTS rain_stopped_at TIMESTAMP,
+                ADD COLUMN IF NOT EXISTS rain_duration_seconds FLOAT
+        '''),
+    ]),
+    (3, '이상값 표시', [
+        # 예: 'temperature:spike,humidity:missing', 정상이면 NULL
+        sql('ALTER TABLE weather_data ADD COLUMN IF NOT EXISTS suspect VARCHAR(200)'),
+        sql('ALTER TABLE soil_moisture_data ADD COLUMN IF NOT EXISTS suspect VARCHAR(200)'),
+        # 표시된 행만 담는 부분 인덱스 (/api/alerts 조회용)
+        index('idx_weather_suspect', 'weather_data', '(received_at) WHERE suspect IS NOT NULL'),
+        index('idx_soil_suspect', 'soil_moisture_data', '(received_at) WHERE suspect IS NOT NULL'),
+    ]),
+    (4, '날씨 최신값/기간 조회 인덱스', [
+        # 최신 날씨(ORDER BY received_at DESC LIMIT 1), 분석/보관/heartbeat 의 기간 조회가 전체 스캔하지 않게
+        index('idx_weather_received', 'weather_data', '(received_at)'),
+    ]),
+    (5, '예전 단일 측정 행의 sample_count 채우기', [
+        # DHT 샘플러 이전 행은 한 번 읽은 값이라 1, 읽기 실패 행은 0
+        # 온도를 보내지 않는 강우 전용 장치의 행은 읽기 실패가 아니므로 NULL 로 둡니다
+        backfill('weather_data', 'sample_count = CASE WHEN temperature IS NULL THEN 0 ELSE 1 END',
+                 'sample_count IS NULL AND device_id = ANY(%(dht_devices)s)',
+                 {'dht_devices': 'SELECT DISTINCT device_id FROM weather_data WHERE temperature IS NOT NULL'}),
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def ensure_version_table(conn):
+    with conn.cursor() as cursor:
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name VARCHAR(200) NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                duration_seconds FLOAT
+            )
+        ''')
+
+
+def applied_versions(conn):
+    with conn.cursor() as cursor:
+        cursor.execute('SELECT version FROM schema_migrations ORDER BY version')
+        return [row[0] for row in cursor.fetchall()]
+
+
+def current_version(conn):
+    """
+    적용한 최신 버전 (schema_migrations 테이블이 없으면 0). 테이블을 만들지 않습니다.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT to_regclass('schema_migrations') IS NOT NULL")
+        if not cursor.fetchone()[0]:
+            return 0
+        cursor.execute('SELECT COALESCE(MAX(version), 0) FROM schema_migrations')
+        return cursor.fetchone()[0]
+
+
+def _run_sql(conn, statement):
+    with conn.cursor() as cursor:
+        cursor.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+        cursor.execute(statement)
+    conn.commit()
+
+
+def _run_index(conn, name, table, definition):
+    """
+    CREATE INDEX CONCURRENTLY 는 트랜잭션 안에서 실행할 수 없어서 autocommit 으로 바꿔서 실행합니다.
+    만들다 끊긴 INVALID 인덱스가 있으면 IF NOT EXISTS 가 그냥 넘어가므로 먼저 지웁니다.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute('''
+            SELECT i.indisvalid FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE c.relname = %s
+        ''', (name,))
+        row = cursor.fetchone()
+    conn.commit()
+    if row and row[0]:
+        return
+
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cursor:
+            if row:
+                logging.warning(f"INVALID 인덱스 {name} 을(를) 지우고 다시 만듭니다")
+                cursor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+            cursor.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} {definition}')
+    finally:
+        conn.autocommit = False
+
+
+def _run_backfill(conn, table, assignment, condition, lookups):
+    """
+    id 범위를 BACKFILL_BATCH 씩 나눠 UPDATE 하고 묶음마다 커밋합니다.
+    새로 들어오는 행과 잠금을 오래 다투지 않고, 중간에 끊겨도 condition 덕분에 남은 행만 다시 고칩니다.
+    """
+    params = {}
+    with conn.cursor() as cursor:
+        for name, query in lookups.items():
+            cursor.execute(query)
+            params[name] = [row[0] for row in cursor.fetchall()]
+        cursor.execute(f'SELECT MIN(id), MAX(id) FROM {table} WHERE {condition}', params)
+        low, high = cursor.fetchone()
+    conn.commit()
+    if low is None:
+        return 0
+
+    updated = 0
+    for start in range(low, high + 1, BACKFILL_BATCH):
+        with conn.cursor() as cursor:
+            cursor.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+            cursor.execute(f'''
+                UPDATE {table} SET {assignment}
+                WHERE id >= %(start)s AND id < %(end)s AND {condition}
+            ''', dict(params, start=start, end=start + BACKFILL_BATCH))
+            updated += cursor.rowcount
+        conn.commit()
+        time.sleep(BACKFILL_PAUSE)
+    logging.info(f"{table}: {updated}행 채움")
+    return updated
+
+
+def apply_migration(conn, version, name, steps):
+    started = time.monotonic()
+    logging.info(f"마이그레이션 {version} 적용 중: {name}")
+    for step in steps:
+        kind, args = step[0], step[1:]
+        if kind == 'sql':
+            _run_sql(conn, *args)
+        elif kind == 'index':
+            _run_index(conn, *args)
+        elif kind == 'backfill':
+            _run_backfill(conn, *args)
+        else:
+            raise ValueError(f"알 수 없는 마이그레이션 단계입니다: {kind}")
+
+    duration = time.monotonic() - started
+    with conn.cursor() as cursor:
+        cursor.execute('''
+            INSERT INTO schema_migrations (version, name, duration_seconds)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (version) DO NOTHING
+        ''', (version, name, round(duration, 3)))
+    conn.commit()
+    logging.info(f"마이그레이션 {version} 완료 ({duration:.1f}초)")
+
+
+def has_backfill(steps):
+    return any(step[0] == 'backfill' for step in steps)
+
+
+def migrate(conn, target=LATEST_VERSION, backfill=True):
+    """
+    target 버전까지 밀린 마이그레이션을 적용합니다. 적용한 개수를 돌려줍니다.
+    backfill=False 이면 채우기 단계가 있는 버전 앞에서 멈춥니다 (버전 순서를 지키기 위해 그 뒤 버전도 미룹니다).
+    """
+    if current_version(conn) >= target:
+        conn.commit()
+        return 0
+
+    with conn.cursor() as cursor:
+        # 다른 서버 프로세스가 같이 켜졌으면 끝날 때까지 기다렸다가, 남은 것만 적용합니다
+        cursor.execute('SELECT pg_advisory_lock(%s)', (ADVISORY_LOCK_KEY,))
+    conn.commit()
+    try:
+        ensure_version_table(conn)
+        conn.commit()
+        done = set(applied_versions(conn))
+        conn.commit()
+        count = 0
+        for version, name, steps in MIGRATIONS:
+            if version <= target and version not in done:
+                if not backfill and has_backfill(steps):
+                    logging.info(f"마이그레이션 {version}부터는 채우기가 있어 나중에 적용합니다")
+                    break
+                apply_migration(conn, version, name, steps)
+                count += 1
+        return count
+    finally:
+        # 실패한 단계의 트랜잭션을 정리해야 잠금을 풀 수 있습니다
+        # 연결이 끊겨서 풀지 못해도 원래 오류를 가리지 않게 합니다 (세션이 끝나면 잠금도 풀립니다)
+        try:
+            conn.rollback()
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_unlock(%s)', (ADVISORY_LOCK_KEY,))
+            conn.commit()
+        except Exception as e:
+            logging.warning(f"마이그레이션 잠금을 풀지 못했습니다: {e}")
+
+
+def status(conn):
+    """[(버전, 이름, 적용 시각 또는 None), ...]"""
+    applied = {}
+    if current_version(conn):
+        with conn.cursor() as cursor:
+            cursor.execute('SELECT version, applied_at FROM schema_migrations')
+            applied = dict(cursor.fetchall())
+    conn.commit()
+    return [(version, name, applied.get(version)) for version, name, _ in MIGRATIONS]
+
+
+if __name__ == '__main__':
+    from weather_data_aws import get_db_connection
+
+    parser = argparse.ArgumentParser(description='DB 스키마 마이그레이션')
+    parser.add_argument('--status', action='store_true', help='적용 상태만 보여줍니다')
+    parser.add_argument('--target', type=int, default=LATEST_VERSION, help='이 버전까지만 적용')
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    try:
+        if args.status:
+            for version, name, applied_at in status(conn):
+                print(f"{version:>3}  {'✅ ' + str(applied_at)[:19] if applied_at else '⏳ 미적용':<24}  {name}")
+        else:
+            count = migrate(conn, args.target)
+            logging.info(f"마이그레이션 {count}개 적용" if count else "스키마가 최신입니다")
+    finally:
+        conn.close()
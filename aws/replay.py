@@ -0,0 +1,131 @@
+"""
+녹화된 센서 기록 재생 엔진
+
+export_traces.py 로 저장한 JSON Lines 파일을 읽어서, 실제 속도 또는 배속으로
+"지금 이 순간의 최신값"을 API와 같은 모양으로 돌려줍니다.
+"""
+import bisect
+import json
+import time
+from datetime import datetime
+
+
+class TraceReplay:
+    """
+    기록 파일의 시간축을 현재 시간에 맞춰 재생합니다.
+    speed=60 이면 1초에 기록 1분이 지나갑니다. loop=True면 끝에서 처음으로 돌아갑니다.
+    """
+
+    def __init__(self, path, speed=1.0, loop=True, clock=time.monotonic):
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+        self._clock = clock
+
+        # 날씨: 시각 배열 + 기록 배열, 토양수분: 장치별로 같은 구조
+        self._weather_times = []
+        self._weather_records = []
+        self._soil = {}
+        self._load(path)
+
+        # 각 시각 배열은 정렬되어 있으므로 처음/끝 값만 보면 됩니다
+        bounds = [times[i] for times in [self._weather_times] + [t for t, _ in self._soil.values()]
+                  if times for i in (0, -1)]
+        if not bounds:
+            raise ValueError(f'재생할 기록이 없습니다: {path}')
+        self.trace_start = min(bounds)
+        self.trace_end = max(bounds)
+        self.record_count = len(self._weather_records) + sum(len(r) for _, r in self._soil.values())
+        self._started = clock()
+
+    def _load(self, path):
+        weather = []
+        soil = {}
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                ts = datetime.fromisoformat(record['received_at']).timestamp()
+                if record['type'] == 'weather':
+                    weather.append((ts, record))
+                elif record['type'] == 'soil':
+                    soil.setdefault(record['device_id'], []).append((ts, record))
+
+        weather.sort(key=lambda item: item[0])
+        self._weather_times = [ts for ts, _ in weather]
+        self._weather_records = [record for _, record in weather]
+        for device_id, items in soil.items():
+            items.sort(key=lambda item: item[0])
+            self._soil[device_id] = ([ts for ts, _ in items], [record for _, record in items])
+
+    def trace_time(self):
+        """
+        현재 재생 위치(기록 파일 기준 시각, epoch 초)를 돌려줍니다.
+        """
+        elapsed = (self._clock() - self._started) * self.speed
+        span = self.trace_end - self.trace_start
+        if self.loop and span > 0:
+            elapsed %= span
+        return min(self.trace_start + elapsed, self.trace_end)
+
+    @staticmethod
+    def _latest(times, records, now):
+        index = bisect.bisect_right(times, now)
+        return records[index - 1] if index else None
+
+    def latest_weather(self):
+        """
+        재생 위치 기준 최신 날씨 기록 (없으면 None)
+        """
+        record = self._latest(self._weather_times, self._weather_records, self.trace_time())
+        if record is None:
+            return None
+        return {
+            'device_id': record['device_id'],
+            'rain_status': record['rain_status'],
+            'humidity': record['humidity'],
+            'temperature': record['temperature'],
+            'last_updated': record['received_at']
+        }
+
+    def latest_soil(self, devices=None):
+        """
+        재생 위치 기준 장치별 최신 토양수분 기록 목록
+        """
+        now = self.trace_time()
+        sensors = []
+        for device_id in sorted(devices or self._soil):
+            if device_id not in self._soil:
+                continue
+            record = self._latest(*self._soil[device_id], now)
+            if record is not None:
+                sensors.append({
+                    'device_id': device_id,
+                    'soil_moisture': record['soil_moisture'],
+                    'last_updated': record['received_at']
+                })
+        return sensors
+
+    def soil_ages(self, sensors):
+        """
+        latest_soil() 결과에 재생 위치 기준 경과 시간(age_seconds)을 붙입니다.
+        """
+        now = self.trace_time()
+        for sensor in sensors:
+            age = now - datetime.fromisoformat(sensor['last_updated']).timestamp()
+            sensor['age_seconds'] = round(age, 1)
+        return sensors
+
+    def info(self):
+        """
+        재생 파일 정보 (health 응답에 포함됩니다)
+        """
+        return {
+            'file': self.path,
+            'speed': self.speed,
+            'loop': self.loop,
+            'records': self.record_count,
+            'trace_start': datetime.fromtimestamp(self.trace_start).isoformat(),
+            'trace_end': datetime.fromtimestamp(self.trace_end).isoformat()
+        }
@@ -0,0 +1,102 @@
+"""
+녹화 데이터 재생 서버 (오프라인/데모 모드)
+
+export_traces.py 로 저장한 기록을 실제 API(weather_data_aws.py)와 같은 경로,
+같은 응답 모양으로 재생합니다. DB나 센서 없이 대시보드를 띄우거나
+많은 양의 데이터로 화면/차트 성능을 측정할 때 사용합니다.
+
+사용 예:
+    python replay_server.py traces.jsonl --speed 60 --port 5000
+"""
+import argparse
+import logging
+from datetime import datetime
+
+from flask import Flask, jsonify
+
+from replay import TraceReplay
+from weather_data_aws import assemble_dashboard_payload, get_config, get_device_filter, make_dashboard_response
+
+app = Flask(__name__)
+logging.basicConfig(level=logging.INFO)
+
+# main에서 설정합니다
+replay = None
+
+
+def replay_health():
+    """
+    재생 모드 상태 정보 (재생 위치는 매번 바뀌므로 대시보드 버전 계산에서 뺍니다)
+    """
+    return {
+        'status': 'healthy',
+        'mode': 'replay',
+        'replay': replay.info(),
+        'services': {
+            'weather_data': '날씨 데이터 재생',
+            'soil_moisture': '토양수분 데이터 재생'
+        }
+    }
+
+
+@app.route('/health', methods=['GET'])
+def health():
+    data = replay_health()
+    data['replay']['position'] = datetime.fromtimestamp(replay.trace_time()).isoformat()
+    return jsonify(dict(data, timestamp=datetime.now().isoformat())), 200
+
+
+@app.route('/api/weather', methods=['GET'])
+def get_weather():
+    weather = replay.latest_weather()
+    if weather:
+        return jsonify(weather)
+    return jsonify({'message': '날씨 데이터가 없습니다'}), 404
+
+
+@app.route('/api/soil/all', methods=['GET'])
+def get_all_soil_sensors():
+    try:
+        devices = get_device_filter()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    sensors = replay.soil_ages(replay.latest_soil(devices))
+    if sensors:
+        return jsonify({'total_sensors': len(sensors), 'sensors': sensors})
+    return jsonify({'message': '토양수분 데이터가 없습니다'}), 404
+
+
+@app.route('/api/soil/<device_id>', methods=['GET'])
+def get_soil_sensor(device_id):
+    sensors = replay.latest_soil([device_id])
+    if sensors:
+        return jsonify(sensors[0])
+    return jsonify({'message': f'{device_id} 토양수분 데이터가 없습니다'}), 404
+
+
+@app.route('/api/dashboard/<int:class_num>', methods=['GET'])
+def get_dashboard(class_num):
+    if class_num not in get_config().classes:
+        return jsonify({'error': f'알 수 없는 반입니다: {class_num}'}), 404
+
+    payload = assemble_dashboard_payload(
+        class_num,
+        replay.latest_weather(),
+        replay.latest_soil(get_config().class_devices(class_num)),
+        replay_health()
+    )
+    return make_dashboard_response(payload)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='녹화된 센서 기록을 API 형태로 재생합니다')
+    parser.add_argument('path', help='export_traces.py 로 만든 JSON Lines 파일')
+    parser.add_argument('--speed', type=float, default=1.0, help='재생 배속 (기본 1배속)')
+    parser.add_argument('--no-loop', action='store_true', help='끝까지 재생하면 마지막 값에서 멈춤')
+    parser.add_argument('--port', type=int, default=5000)
+    args = parser.parse_args()
+
+    replay = TraceReplay(args.path, speed=args.speed, loop=not args.no_loop)
+    logging.info(f"재생 서버 시작 - {replay.record_count}건, {args.speed}배속, 포트 {args.port}")
+    app.run(host='0.0.0.0', port=args.port, threaded=True)
@@ -1,7 +1,37 @@
-from flask import Flask, render_template_string
+from flask import Flask, render_template_string, jsonify, request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import json
+import os
+import sys
+import threading
+import time
+import urllib.request
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config'))
+from smartfarm_config import get_config
+
+# 아두이노 명령은 cron 스크립트와 같은 relay_client 로 보냅니다 (타임아웃/재시도/backoff 규칙이 하나)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'raspberrypi'))
+from relay_client import send_relay_command
 
 app = Flask(__name__)
 
+# 조 번호별 아두이노 IP/장치 ID와 이벤트 기록 서버 주소는 config/smartfarm.json 에서 읽습니다
+# (파일을 고치면 재시작 없이 다음 요청부터 반영됩니다)
+RELAY_TIMEOUT = 5  # 아두이노 응답 대기 시간 (초, /api/relay/batch 는 요청에서 바꿀 수 있습니다)
+RELAY_RETRIES = 1  # 실패 시 재시도 횟수
+RELAY_WORKERS = 16  # 동시에 명령을 보낼 수 있는 최대 장치 수
+
+# 조별 마지막 명령 결과와 릴레이 상태 (명령을 보낸 조만 들어 있습니다)
+relay_state = {}
+relay_state_lock = threading.Lock()
+relay_executor = ThreadPoolExecutor(max_workers=RELAY_WORKERS, thread_name_prefix="relay")
+# 이벤트 기록은 응답을 늦추지 않도록 따로 보냅니다
+event_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="event")
+# {조 번호: 버튼으로 켠 시각} — 끌 때 물준 시간을 계산합니다
+relay_on_since = {}
+
 # HTML 템플릿
 template = '''
 <!DOCTYPE html>
@@ -105,7 +135,7 @@ template = '''
     <div class="container">
         <h1>🌱 생태와 환경 스마트팜 물주기</h1>
 
-        {% for i in range(1, 9) %}
+        {% for i, ip in devices.items() %}
         <div class="group">
             <h3>{{ i }}조 화분 물주기</h3>
             <div class="button-container">
@@ -116,14 +146,14 @@ template = '''
                     ⏹️ 물주기 OFF
                 </button>
                 <span class="loading" id="loading-{{ i }}">⏳ 전송중...</span>
-                <span class="status">IP: 192.168.0.10{{ i }}</span>
+                <span class="status">IP: {{ ip }}</span>
                 <div class="result" id="result-{{ i }}"></div>
             </div>
         </div>
         {% endfor %}
 
         <div style="text-align: center; margin-top: 30px; color: #95a5a6;">
-            <p>💡 버튼을 클릭하면 해당 장치로 직접 명령이 전송됩니다</p>
+            <p>💡 버튼을 클릭하면 서버가 해당 장치로 명령을 전송하고 결과를 알려줍니다</p>
         </div>
     </div>
 
@@ -137,17 +167,17 @@ template = '''
             resultEl.style.display = 'none';
             button.disabled = true;
 
-            // 직접 아두이노로 요청
-            const arduinoUrl = `http://192.168.0.10${group}/relay/${action}`;
-            console.log('요청 URL:', arduinoUrl);
-
-            fetch(arduinoUrl, {
-                method: 'GET',
-                mode: 'no-cors'
+            // 서버를 거쳐 아두이노로 요청 (성공 여부와 응답 시간을 받습니다)
+            fetch(`/api/relay/${group}/${action}`, {
+                method: 'POST'
             })
-                .then(() => {
+                .then(response => response.json())
+                .then(result => {
+                    if (!result.ok) {
+                        throw new Error(result.error || '응답 없음');
+                    }
                     loadingEl.style.display = 'none';
-                    resultEl.textContent = `${group}조 릴레이 ${action.toUpperCase()} 명령 전송완료!`;
+                    resultEl.textContent = `${group}조 릴레이 ${action.toUpperCase()} 성공! (${result.latency_ms}ms)`;
                     resultEl.className = 'result success';
                     resultEl.style.display = 'inline-block';
                     button.disabled = false;
@@ -174,10 +204,162 @@ template = '''
 '''
 
 
+def relay_devices():
+    """
+    {조 번호: 아두이노 IP}
+    """
+    return {group: device['ip'] for group, device in get_config().relay_groups().items()}
+
+
+def send_relay(ip, action, timeout=RELAY_TIMEOUT, retries=RELAY_RETRIES):
+    """
+    아두이노 한 대에 릴레이 명령을 보내고 결과와 걸린 시간을 relay_state에 기록합니다.
+    relay_client 결과(ok, attempts, elapsed, error ...)에 조 번호와 상태를 더해서 돌려줍니다.
+    """
+    result = send_relay_command(ip, action, timeout, retries)
+    group = next((g for g, device_ip in relay_devices().items() if device_ip == ip), None)
+    state = {
+        'ip': ip,
+        'state': action if result['ok'] else 'unknown',
+        'last_action': action,
+        'ok': result['ok'],
+        'latency_ms': round(result['elapsed'] * 1000),
+        'updated_at': datetime.now().isoformat(),
+        'error': result['error']
+    }
+    with relay_state_lock:
+        relay_state[group if group is not None else ip] = state
+    return dict(result, **state, group=group)
+
+
+def post_irrigation_events(events):
+    """
+    관수 이벤트를 서버에 저장합니다. 실패해도 릴레이 제어에는 영향이 없습니다.
+    """
+    request = urllib.request.Request(
+        get_config().api_url('/api/irrigation/events'),
+        data=json.dumps({'events': events}).encode('utf-8'),
+        headers={'Content-Type': 'application/json'},
+        method='POST'
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            response.read()
+    except Exception as e:
+        app.logger.warning(f"관수 이벤트 기록 실패: {e}")
+
+
+def dispatch(ips, action, timeout=RELAY_TIMEOUT, retries=RELAY_RETRIES, record_events=True):
+    """
+    여러 장치에 동시에 명령을 보내고 ips 순서대로 결과를 돌려줍니다.
+    record_events: 버튼 명령은 여기서 관수 이벤트를 남기고, 이벤트를 직접 남기는 cron/자동 관수는 끕니다.
+    """
+    results = list(relay_executor.map(lambda ip: send_relay(ip, action, timeout, retries), ips))
+    if not record_events:
+        return results
+
+    device_ids = get_config().ip_map()
+    now = time.monotonic()
+    events = []
+    with relay_state_lock:
+        for result in results:
+            group = result['group']
+            duration = None
+            if action == 'on' and result['ok']:
+                relay_on_since.setdefault(group, now)
+            elif action == 'off' and result['ok'] and group in relay_on_since:
+                duration = round(now - relay_on_since.pop(group), 1)
+            events.append({
+                'device_id': device_ids.get(result['ip'], result['ip']),
+                'action': action,
+                'source': 'button',
+                'ok': result['ok'],
+                'duration_seconds': duration,
+                'reason': None if result['ok'] else (result['error'] or '')[:50],
+                'event_time': result['updated_at']
+            })
+    event_executor.submit(post_irrigation_events, events)
+    return results
+
+
 @app.route('/')
 def index():
-    return render_template_string(template)
+    return render_template_string(template, devices=relay_devices())
+
+
+@app.route('/api/relay/<int:group>/<action>', methods=['POST'])
+def relay_one(group, action):
+    """특정 조 릴레이 제어 (action: on / off)"""
+    if action not in ('on', 'off'):
+        return jsonify({'error': f'알 수 없는 명령입니다: {action}'}), 400
+    if group not in relay_devices():
+        return jsonify({'error': f'알 수 없는 조입니다: {group}'}), 404
+
+    result = dispatch([relay_devices()[group]], action)[0]
+    return jsonify(result), 200 if result['ok'] else 502
+
+
+@app.route('/api/relay/all/<action>', methods=['POST'])
+def relay_all(action):
+    """모든 조 릴레이 동시 제어 (action: on / off)"""
+    if action not in ('on', 'off'):
+        return jsonify({'error': f'알 수 없는 명령입니다: {action}'}), 400
+
+    results = dispatch(list(relay_devices().values()), action)
+    return jsonify({
+        'action': action,
+        'success': sum(1 for r in results if r['ok']),
+        'total': len(results),
+        'results': results
+    })
+
+
+@app.route('/api/relay/batch/<action>', methods=['POST'])
+def relay_batch(action):
+    """
+    여러 장치 동시 제어 (cron/자동 관수 스크립트가 relay_client.make_relay 로 부릅니다)
+    요청: {"ips": [아두이노 IP, ...], "timeout": 초, "retries": 횟수}
+    관수 이벤트는 물준 시간과 이유를 아는 호출한 쪽이 남깁니다.
+    """
+    if action not in ('on', 'off'):
+        return jsonify({'error': f'알 수 없는 명령입니다: {action}'}), 400
+
+    data = request.get_json(silent=True) or {}
+    ips = data.get('ips') or []
+    known = get_config().ip_map()
+    unknown = [ip for ip in ips if ip not in known]
+    if not ips or unknown:
+        return jsonify({'error': f'알 수 없는 장치입니다: {unknown}' if unknown else 'ips 목록이 필요합니다'}), 400
+
+    try:
+        timeout = float(data.get('timeout', RELAY_TIMEOUT))
+        retries = int(data.get('retries', RELAY_RETRIES))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'timeout/retries 는 숫자여야 합니다'}), 400
+    # retries 가 음수면 한 번도 보내지 않고 성공으로, timeout 이 0 이하면 모든 장치가 실패로 나옵니다
+    if not 0 < timeout <= 30:
+        return jsonify({'error': 'timeout 은 0초보다 크고 30초 이하여야 합니다'}), 400
+    if not 0 <= retries <= 5:
+        return jsonify({'error': 'retries 는 0~5 사이여야 합니다'}), 400
+
+    results = dispatch(ips, action, timeout, retries, record_events=False)
+    return jsonify({
+        'action': action,
+        'success': sum(1 for r in results if r['ok']),
+        'total': len(results),
+        'results': results
+    })
+
+
+@app.route('/api/relay/state', methods=['GET'])
+def relay_states():
+    """조별 마지막 명령 결과와 릴레이 상태"""
+    unknown = {'state': 'unknown', 'last_action': None, 'ok': None,
+               'latency_ms': None, 'updated_at': None, 'error': None}
+    with relay_state_lock:
+        return jsonify({str(group): dict(relay_state.get(group) or dict(unknown, ip=ip))
+                        for group, ip in relay_devices().items()})
 
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=8001, debug=True)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=8001, debug=True, threaded=True)
\ No newline at end of file
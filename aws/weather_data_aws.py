@@ -1,65 +1,253 @@
 from flask import Flask, request, jsonify
 import psycopg2
-from datetime import datetime
+from psycopg2.extras import execute_values
+from datetime import datetime, timedelta
+import hashlib
+import json
 import logging
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config'))
+from smartfarm_config import get_config
+from anomaly import AnomalyDetector
+import analytics
+import archive
+import migrations
+from forecast import ForecastService
+from heartbeat import HeartbeatTracker
 
 app = Flask(__name__)
 logging.basicConfig(level=logging.INFO)
 
-# PostgreSQL 설정
-DB_CONFIG = {
-    'host': 'localhost',
-    'database': 'weatherdb',
-    'user': 'postgres',
-    'password': 'smartfarm',
-    'port': 5432
-}
+# PostgreSQL 접속 정보와 반별 장치 목록은 config/smartfarm.json 에서 읽습니다
+# (파일을 고치면 재시작 없이 다음 요청부터 반영됩니다)
+
+# 대시보드 통합 응답 캐시 유지 시간 (초)
+DASHBOARD_CACHE_SECONDS = 10
+
+# {반 번호: (만료 시각, 응답 데이터)}
+_dashboard_cache = {}
+_dashboard_cache_lock = threading.Lock()
+
+# 분석 결과 캐시 유지 시간 (초)과 조회할 수 있는 최대 기간 (시간)
+ANALYTICS_CACHE_SECONDS = 60
+ANALYTICS_MAX_HOURS = 24 * 366
+
+# {(장치 목록, 기간): (만료 시각, 분석 결과)}
+_analytics_cache = {}
+_analytics_cache_lock = threading.Lock()
+
+# 저장 직전에 장치별 이상값을 표시합니다 (상태는 메모리에만 있고 재시작하면 다시 쌓입니다)
+detector = AnomalyDetector()
+
+# 건조 예측 모델을 처음 만들 때 DB에서 읽어 올 최근 기간 (시간)과 최대 행 수
+FORECAST_WARMUP_HOURS = 72
+FORECAST_WARMUP_ROWS = 1000
+
+
+def load_recent_soil(device_id):
+    """
+    예측 모델 복원용 최근 토양수분 [(값, 시각), ...] (이상값 제외, 시간 순)
+    """
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT soil_moisture, received_at FROM (
+                SELECT soil_moisture, received_at
+                FROM soil_moisture_data
+                WHERE device_id = %s AND suspect IS NULL
+                  AND received_at >= LOCALTIMESTAMP - %s * INTERVAL '1 hour'
+                ORDER BY received_at DESC
+                LIMIT %s
+            ) recent
+            ORDER BY received_at
+        ''', (device_id, FORECAST_WARMUP_HOURS, FORECAST_WARMUP_ROWS))
+        return cursor.fetchall()
+    finally:
+        conn.close()
+
+
+# 측정값이 들어올 때마다 장치별 건조 곡선을 고칩니다
+forecaster = ForecastService(loader=load_recent_soil)
+
+def load_last_seen():
+    """
+    heartbeat 추적 복원용 [(device_id, 종류, 마지막 수신 시각), ...]
+    기간을 자르지 않고 설정된 장치마다 실제 마지막 수신 시각을 찾습니다 (오래 조용한 장치가 재시작 뒤 'never'가 되지 않게).
+    장치별 MAX(received_at) 하위 조회라 토양수분은 (device_id, received_at) 인덱스를, 날씨는 received_at 인덱스를 씁니다.
+    """
+    config = get_config()
+    soil_devices = [d['device_id'] for d in config.devices]
+    weather_devices = list(config.weather_stations.values())
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT d.device_id, 'soil',
+                   (SELECT MAX(received_at) FROM soil_moisture_data s WHERE s.device_id = d.device_id)
+            FROM unnest(%s::text[]) AS d(device_id)
+            UNION ALL
+            SELECT d.device_id, 'weather',
+                   (SELECT MAX(received_at) FROM weather_data w WHERE w.device_id = d.device_id)
+            FROM unnest(%s::text[]) AS d(device_id)
+        ''', (soil_devices, weather_devices))
+        return [(device_id, 'soil' if kind == 'soil' else weather_kind(device_id), last_at)
+                for device_id, kind, last_at in cursor.fetchall() if last_at is not None]
+    finally:
+        conn.close()
+
+
+def reporting_intervals():
+    """종류별 기본 heartbeat 간격 (장치가 next_report_seconds 를 보내지 않을 때)"""
+    reporting = get_config().reporting
+    return {kind: reporting.get(kind, {}).get('heartbeat') for kind in ('soil', 'weather', 'rain')}
+
+
+# 장치마다 다음 보고 예정 시각을 들고 있다가 조용한 것과 고장을 구분합니다
+heartbeats = HeartbeatTracker(loader=load_last_seen, intervals=reporting_intervals)
+
+
+def observe_heartbeat(device_id, kind, next_report_seconds):
+    """
+    수신 기록을 남깁니다. 측정값은 이미 저장했으므로 기록이 실패해도 요청은 성공으로 돌려줍니다
+    (실패로 돌려주면 라즈베리파이 보관함이 같은 측정값을 다시 보내서 중복 저장됩니다)
+    """
+    try:
+        heartbeats.observe(device_id, kind, next_report_seconds)
+    except Exception as e:
+        logging.error(f"수신 기록 오류: {device_id} {e}")
+
+
+def weather_kind(device_id):
+    """강우 전용 장치면 'rain', 아니면 'weather'"""
+    return 'rain' if device_id == get_config().weather_stations.get('rain') else 'weather'
 
 
 def get_db_connection():
-    return psycopg2.connect(**DB_CONFIG)
+    return psycopg2.connect(**get_config().database)
+
+
+def get_device_filter():
+    """
+    요청의 ?class= 또는 ?devices= 파라미터를 장치 목록으로 바꿉니다.
+    필터가 없으면 None, 알 수 없는 반이면 ValueError를 냅니다.
+    """
+    class_param = request.args.get('class')
+    if class_param:
+        try:
+            return get_config().class_devices(int(class_param))
+        except (ValueError, KeyError):
+            raise ValueError(f'알 수 없는 반입니다: {class_param}')
+
+    devices_param = request.args.get('devices')
+    if devices_param:
+        devices = [d.strip() for d in devices_param.split(',') if d.strip()]
+        if devices:
+            return devices
+
+    return None
+
+
+def fetch_latest_soil(cursor, devices=None):
+    """
+    장치별 최신 토양수분 1건씩 조회합니다. devices가 있으면 SQL에서 바로 거릅니다.
+    각 행은 (device_id, soil_moisture, received_at, 경과 초) 입니다.
+    """
+    if devices:
+        cursor.execute('''
+            SELECT DISTINCT ON (device_id) device_id, soil_moisture, received_at,
+                   EXTRACT(EPOCH FROM LOCALTIMESTAMP - received_at)
+            FROM soil_moisture_data
+            WHERE device_id = ANY(%s)
+            ORDER BY device_id, received_at DESC
+        ''', (list(devices),))
+    else:
+        cursor.execute('''
+            SELECT DISTINCT ON (device_id) device_id, soil_moisture, received_at,
+                   EXTRACT(EPOCH FROM LOCALTIMESTAMP - received_at)
+            FROM soil_moisture_data
+            ORDER BY device_id, received_at DESC
+        ''')
+    return cursor.fetchall()
 
 
 def init_database():
+    """
+    밀린 스키마 마이그레이션만 적용합니다 (migrations.py). 이미 최신이면 버전 조회 한 번으로 끝납니다.
+    오래 걸리는 채우기(backfill) 버전은 서버를 켠 뒤 백그라운드 스레드에서 적용합니다.
+    마이그레이션이 실패해도 (예: 잠금 대기 시간 초과) 서버는 켜고, 다음 시작 때 다시 시도합니다.
+    """
     conn = get_db_connection()
-    cursor = conn.cursor()
-
-    # 기존 날씨 데이터 테이블 생성 (온도, 습도 포함)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS weather_data (
-            id SERIAL PRIMARY KEY,
-            device_id VARCHAR(50),
-            timestamp TIMESTAMP,
-            rain_detected VARCHAR(20),
-            humidity FLOAT,
-            temperature FLOAT,
-            received_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-
-    # 토양수분 데이터 테이블 생성 (새로 추가)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS soil_moisture_data (
-            id SERIAL PRIMARY KEY,
-            device_id VARCHAR(50) DEFAULT 'smartfarm_01',
-            soil_moisture FLOAT NOT NULL,
-            timestamp VARCHAR(50),
-            received_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-
-    # 기존 테이블에 새 컬럼 추가 (이미 있으면 무시)
     try:
-        cursor.execute('ALTER TABLE weather_data ADD COLUMN IF NOT EXISTS humidity FLOAT')
-        cursor.execute('ALTER TABLE weather_data ADD COLUMN IF NOT EXISTS temperature FLOAT')
-        cursor.execute('ALTER TABLE weather_data ALTER COLUMN rain_detected TYPE VARCHAR(20)')
-        logging.info("테이블 스키마 업데이트 완료")
+        count = migrations.migrate(conn, backfill=False)
+        if count:
+            logging.info(f"스키마 마이그레이션 {count}개 적용")
+        pending = migrations.current_version(conn) < migrations.LATEST_VERSION
+        conn.commit()
+        logging.info("데이터베이스 초기화 완료")
     except Exception as e:
-        logging.info(f"테이블 업데이트 스킵: {e}")
+        logging.error(f"스키마 마이그레이션 실패 (다음 시작 때 다시 시도): {e}")
+        pending = False
+    finally:
+        conn.close()
 
-    conn.commit()
-    conn.close()
-    logging.info("데이터베이스 초기화 완료")
+    if pending:
+        threading.Thread(target=run_backfill_migrations, name='migrations', daemon=True).start()
+
+
+def run_backfill_migrations():
+    """
+    남은 (채우기가 있는) 마이그레이션을 적용합니다. 묶음마다 커밋하므로 중간에 서버가 꺼져도 다음에 이어서 합니다.
+    """
+    conn = get_db_connection()
+    try:
+        count = migrations.migrate(conn)
+        logging.info(f"백그라운드 마이그레이션 {count}개 적용")
+    except Exception as e:
+        logging.error(f"백그라운드 마이그레이션 실패 (다음 시작 때 다시 시도): {e}")
+    finally:
+        conn.close()
+
+
+def check_weather(data):
+    """
+    보낸 온습도 값만 이상값 검사를 합니다 (강우 전용 장치는 온습도 키를 보내지 않습니다).
+    """
+    values = {metric: data[metric] for metric in ('temperature', 'humidity') if metric in data}
+    if not values:
+        return None
+    suspect = detector.check_reading(data['device_id'], values)
+    if suspect:
+        logging.warning(f"의심 값: {data['device_id']} {suspect} "
+                        f"(온도: {data.get('temperature')}, 습도: {data.get('humidity')})")
+    return suspect
+
+
+def weather_values(data):
+    """
+    날씨 데이터 JSON을 weather_data INSERT 값 튜플로 바꿉니다 (없는 값은 None).
+    마지막 값은 이상값 표시입니다.
+    """
+    return (
+        data['device_id'],
+        data['timestamp'],
+        data['rain_detected'],
+        data.get('humidity'),
+        data.get('temperature'),
+        data.get('humidity_min'),
+        data.get('humidity_max'),
+        data.get('temperature_min'),
+        data.get('temperature_max'),
+        data.get('sample_count'),
+        data.get('rain_started_at'),
+        data.get('rain_stopped_at'),
+        data.get('rain_duration_seconds'),
+        check_weather(data)
+    )
 
 
 # 기존 날씨 데이터 엔드포인트
@@ -71,20 +259,18 @@ def receive_weather_data():
         conn = get_db_connection()
         cursor = conn.cursor()
 
-        # 온도, 습도 포함해서 데이터 저장
+        # 온도, 습도 (요약값 포함) 데이터 저장
         cursor.execute('''
-            INSERT INTO weather_data (device_id, timestamp, rain_detected, humidity, temperature)
-            VALUES (%s, %s, %s, %s, %s)
-        ''', (
-            data['device_id'],
-            data['timestamp'],
-            data['rain_detected'],
-            data.get('humidity'),  # 없으면 None
-            data.get('temperature')  # 없으면 None
-        ))
+            INSERT INTO weather_data (device_id, timestamp, rain_detected, humidity, temperature,
+                                      humidity_min, humidity_max, temperature_min, temperature_max,
+                                      sample_count, rain_started_at, rain_stopped_at,
+                                      rain_duration_seconds, suspect)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        ''', weather_values(data))
 
         conn.commit()
         conn.close()
+        observe_heartbeat(data['device_id'], weather_kind(data['device_id']), data.get('next_report_seconds'))
 
         logging.info(
             f"날씨 데이터 저장: {data['device_id']} - {data['rain_detected']} (온도: {data.get('temperature')}°C, 습도: {data.get('humidity')}%)")
@@ -95,6 +281,41 @@ def receive_weather_data():
         return jsonify({'error': str(e)}), 500
 
 
+# 날씨 데이터 묶음 전송 엔드포인트 (라즈베리파이 보관함 전송용)
+@app.route('/rainfall/batch', methods=['POST'])
+def receive_weather_batch():
+    try:
+        data = request.get_json()
+        readings = data.get('readings') if data else None
+        if not readings:
+            return jsonify({'error': 'readings 목록이 필요합니다'}), 400
+
+        conn = get_db_connection()
+        cursor = conn.cursor()
+
+        execute_values(cursor, '''
+            INSERT INTO weather_data (device_id, timestamp, rain_detected, humidity, temperature,
+                                      humidity_min, humidity_max, temperature_min, temperature_max,
+                                      sample_count, rain_started_at, rain_stopped_at,
+                                      rain_duration_seconds, suspect)
+            VALUES %s
+        ''', [weather_values(reading) for reading in readings])
+
+        conn.commit()
+        conn.close()
+        # 보관함에 쌓였던 옛 측정값이라도 지금 받았으니 장치는 살아 있습니다
+        latest = {reading['device_id']: reading for reading in readings}
+        for device_id, reading in latest.items():
+            observe_heartbeat(device_id, weather_kind(device_id), reading.get('next_report_seconds'))
+
+        logging.info(f"날씨 데이터 묶음 저장: {readings[0]['device_id']} 외 {len(readings)}건")
+        return jsonify({'status': 'success', 'count': len(readings)}), 200
+
+    except Exception as e:
+        logging.error(f"날씨 데이터 묶음 저장 오류: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
 # 토양수분 데이터 엔드포인트 (새로 추가)
 @app.route('/soil', methods=['POST'])
 def receive_soil_moisture():
@@ -105,21 +326,35 @@ def receive_soil_moisture():
         if not data or 'soil_moisture' not in data:
             return jsonify({'error': 'soil_moisture 데이터가 필요합니다'}), 400
 
+        device_id = data.get('device_id', 'smartfarm_01')
+        suspect = detector.check_reading(device_id, {'soil_moisture': data['soil_moisture']})
+        if suspect:
+            logging.warning(f"의심 값: {device_id} {suspect} (토양수분: {data['soil_moisture']})")
+
         conn = get_db_connection()
         cursor = conn.cursor()
 
         # 테이블 구조에 맞게 저장
         cursor.execute('''
-            INSERT INTO soil_moisture_data (device_id, soil_moisture, timestamp)
-            VALUES (%s, %s, %s)
+            INSERT INTO soil_moisture_data (device_id, soil_moisture, timestamp, suspect)
+            VALUES (%s, %s, %s, %s)
         ''', (
-            data.get('device_id', 'smartfarm_01'),
+            device_id,
             data['soil_moisture'],
-            timestamp
+            timestamp,
+            suspect
         ))
 
         conn.commit()
         conn.close()
+        observe_heartbeat(device_id, 'soil', data.get('next_report_seconds'))
+        # 저장된 측정값만 예측에 넣습니다 (저장이 실패해서 다시 보내는 값이 두 번 들어가지 않게)
+        if not suspect:
+            # 예측이 실패해도 저장은 이미 끝났으므로 성공으로 돌려줍니다
+            try:
+                forecaster.observe(device_id, data['soil_moisture'])
+            except Exception as e:
+                logging.error(f"건조 예측 갱신 오류: {e}")
 
         print(timestamp)
 
@@ -191,6 +426,7 @@ def get_soil_moisture_data():
 def health():
     return jsonify({
         'status': 'healthy',
+        'mode': 'live',
         'timestamp': datetime.now().isoformat(),
         'services': {
             'weather_data': '날씨 데이터 수집',
@@ -306,20 +542,16 @@ def get_rain_only():
 
 @app.route('/api/soil/all', methods=['GET'])
 def get_all_soil_sensors():
-    """모든 토양수분 센서의 최신 데이터"""
+    """모든 토양수분 센서의 최신 데이터 (?class=1 또는 ?devices=a,b 로 필터링)"""
     try:
+        try:
+            devices = get_device_filter()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
         conn = get_db_connection()
         cursor = conn.cursor()
-        cursor.execute('''
-            SELECT device_id, soil_moisture, received_at,
-                   ROW_NUMBER() OVER (PARTITION BY device_id ORDER BY received_at DESC) as rn
-            FROM soil_moisture_data
-        ''')
-
-        # 각 디바이스별 최신 데이터만 필터링
-        all_rows = cursor.fetchall()
-        latest_data = [row for row in all_rows if row[3] == 1]  # rn = 1인 것만
-
+        latest_data = fetch_latest_soil(cursor, devices)
         conn.close()
 
         if latest_data:
@@ -328,7 +560,8 @@ def get_all_soil_sensors():
                 sensors.append({
                     'device_id': row[0],
                     'soil_moisture': row[1],
-                    'last_updated': str(row[2])
+                    'last_updated': str(row[2]),
+                    'age_seconds': round(float(row[3]), 1)  # 서버 시계 기준 경과 시간
                 })
 
             return jsonify({
@@ -404,12 +637,140 @@ def get_soil_device_list():
         return jsonify({'error': str(e)}), 500
 
 
+# ========== 관수 이벤트 API ==========
+
+IRRIGATION_ACTIONS = ('on', 'off')
+
+
+@app.route('/api/irrigation/events', methods=['POST'])
+def receive_irrigation_events():
+    """
+    릴레이 이벤트 저장. {"events": [...]} 또는 이벤트 하나를 받습니다.
+    이벤트: device_id, action(on/off), source(button/cron/auto/closed_loop),
+           ok, duration_seconds(off일 때 켜져 있던 시간), reason, event_time
+    """
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({'error': '이벤트 데이터가 필요합니다'}), 400
+        events = data['events'] if 'events' in data else [data]
+
+        rows = []
+        for event in events:
+            if not event.get('device_id') or event.get('action') not in IRRIGATION_ACTIONS:
+                return jsonify({'error': f'잘못된 이벤트입니다: {event}'}), 400
+            rows.append((
+                event['device_id'],
+                event['action'],
+                event.get('source', 'unknown'),
+                event.get('ok', True),
+                event.get('duration_seconds'),
+                event.get('reason'),
+                event.get('event_time') or datetime.now().isoformat()
+            ))
+
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        execute_values(cursor, '''
+            INSERT INTO irrigation_events (device_id, action, source, ok, duration_seconds, reason, event_time)
+            VALUES %s
+        ''', rows)
+        conn.commit()
+        conn.close()
+
+        logging.info(f"관수 이벤트 {len(rows)}건 저장")
+        return jsonify({'status': 'success', 'count': len(rows)}), 200
+
+    except Exception as e:
+        logging.error(f"관수 이벤트 저장 오류: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/irrigation/events', methods=['GET'])
+def get_irrigation_events():
+    """관수 이벤트 조회 (?device_id=, ?days=7, ?limit=100)"""
+    try:
+        device_id = request.args.get('device_id')
+        days = request.args.get('days', 7, type=int)
+        limit = request.args.get('limit', 100, type=int)
+
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT device_id, action, source, ok, duration_seconds, reason, event_time
+            FROM irrigation_events
+            WHERE event_time >= LOCALTIMESTAMP - make_interval(days => %s)
+              AND (%s IS NULL OR device_id = %s)
+            ORDER BY event_time DESC
+            LIMIT %s
+        ''', (days, device_id, device_id, limit))
+        rows = cursor.fetchall()
+        conn.close()
+
+        return jsonify({
+            'count': len(rows),
+            'events': [{
+                'device_id': row[0],
+                'action': row[1],
+                'source': row[2],
+                'ok': row[3],
+                'duration_seconds': row[4],
+                'reason': row[5],
+                'event_time': str(row[6])
+            } for row in rows]
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/irrigation/daily', methods=['GET'])
+def get_irrigation_daily():
+    """장치별 하루 물준 시간 합계 (?device_id=, ?days=7)"""
+    try:
+        device_id = request.args.get('device_id')
+        days = request.args.get('days', 7, type=int)
+
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        # off 이벤트의 duration_seconds가 그 회차에 물을 준 시간입니다
+        # (실패한 명령과, 켜진 적 없이 안전을 위해 보낸 off 는 duration 이 없으므로 세지 않습니다)
+        cursor.execute('''
+            SELECT device_id, event_time::date AS day,
+                   SUM(duration_seconds) AS water_seconds, COUNT(*) AS waterings
+            FROM irrigation_events
+            WHERE action = 'off' AND ok AND duration_seconds IS NOT NULL
+              AND event_time >= CURRENT_DATE - make_interval(days => %s - 1)
+              AND (%s IS NULL OR device_id = %s)
+            GROUP BY device_id, day
+            ORDER BY day DESC, device_id
+        ''', (days, device_id, device_id))
+        rows = cursor.fetchall()
+        conn.close()
+
+        return jsonify({
+            'days': days,
+            'daily': [{
+                'device_id': row[0],
+                'date': str(row[1]),
+                'water_seconds': round(row[2] or 0, 1),
+                'waterings': row[3]
+            } for row in rows]
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 # ========== 통합 조회 API ==========
 
 @app.route('/api/summary', methods=['GET'])
 def get_farm_summary():
-    """전체 농장 센서 요약"""
+    """전체 농장 센서 요약 (?class=, ?devices= 필터 지원)"""
     try:
+        try:
+            devices = get_device_filter()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
         conn = get_db_connection()
         cursor = conn.cursor()
 
@@ -422,14 +783,8 @@ def get_farm_summary():
         ''')
         weather_row = cursor.fetchone()
 
-        # 모든 토양수분 센서의 최신 데이터
-        cursor.execute('''
-            SELECT device_id, soil_moisture, received_at,
-                   ROW_NUMBER() OVER (PARTITION BY device_id ORDER BY received_at DESC) as rn
-            FROM soil_moisture_data
-        ''')
-        all_soil_rows = cursor.fetchall()
-        soil_sensors = [row for row in all_soil_rows if row[3] == 1]
+        # 토양수분 센서별 최신 데이터
+        soil_sensors = fetch_latest_soil(cursor, devices)
 
         conn.close()
 
@@ -463,6 +818,349 @@ def get_farm_summary():
         return jsonify({'error': str(e)}), 500
 
 
+def build_dashboard_payload(class_num):
+    """
+    대시보드 한 화면에 필요한 날씨, 반별 토양수분, 장치 목록을
+    읽기 전용 트랜잭션 하나에서 조회합니다.
+    """
+    devices = get_config().class_devices(class_num)
+
+    conn = get_db_connection()
+    try:
+        # 같은 시점의 스냅샷에서 모든 값을 읽습니다
+        conn.set_session(isolation_level='REPEATABLE READ', readonly=True)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT device_id, rain_detected, humidity, temperature, received_at
+            FROM weather_data
+            ORDER BY received_at DESC
+            LIMIT 1
+        ''')
+        weather_row = cursor.fetchone()
+        soil_rows = fetch_latest_soil(cursor, devices)
+        conn.commit()
+    finally:
+        conn.close()
+
+    weather = None
+    if weather_row:
+        weather = {
+            'device_id': weather_row[0],
+            'rain_status': weather_row[1],
+            'humidity': weather_row[2],
+            'temperature': weather_row[3],
+            'last_updated': str(weather_row[4])
+        }
+
+    sensors = [{
+        'device_id': row[0],
+        'soil_moisture': row[1],
+        'last_updated': str(row[2])
+    } for row in soil_rows]
+
+    return assemble_dashboard_payload(class_num, weather, sensors, {
+        'status': 'healthy',
+        'mode': 'live',
+        'services': {
+            'weather_data': '날씨 데이터 수집',
+            'soil_moisture': '토양수분 모니터링'
+        }
+    }, {status['device_id']: status['state'] for status in heartbeats.status(devices)})
+
+
+def assemble_dashboard_payload(class_num, weather, sensors, health, heartbeat_states=None):
+    """
+    대시보드 통합 응답 모양을 만듭니다 (replay_server.py 도 같은 모양을 씁니다).
+    heartbeat_states: {device_id: 'ok'/'late'/'silent'/'never'} (없으면 장치 상태에 None)
+    """
+    reporting = {sensor['device_id']: sensor['last_updated'] for sensor in sensors}
+    heartbeat_states = heartbeat_states or {}
+
+    # 토양수분 상태 표시/색은 여기서 한 번 계산해서, 대시보드가 다시 그릴 때마다 numpy/pandas 를 쓰지 않게 합니다
+    if sensors:
+        labels, colors = analytics.classify_moisture([sensor['soil_moisture'] for sensor in sensors])
+        sensors = [dict(sensor, status=str(label), color=str(color))
+                   for sensor, label, color in zip(sensors, labels, colors)]
+
+    payload = {
+        'class': class_num,
+        'weather': weather,
+        'soil': {
+            'total_sensors': len(sensors),
+            'sensors': sensors
+        },
+        'devices': [{
+            'device_id': device_id,
+            'last_update': reporting.get(device_id),
+            'has_data': device_id in reporting,
+            'heartbeat': heartbeat_states.get(device_id)
+        } for device_id in get_config().class_devices(class_num)],
+        'health': health
+    }
+    body = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    payload['version'] = hashlib.sha1(body.encode('utf-8')).hexdigest()[:16]
+    return payload
+
+
+def make_dashboard_response(payload):
+    """
+    If-None-Match가 현재 버전과 같으면 304, 아니면 ETag를 붙인 JSON 응답을 만듭니다.
+    """
+    version = payload['version']
+    if version in request.if_none_match:
+        response = app.response_class(status=304)
+    else:
+        response = jsonify(dict(payload, timestamp=datetime.now().isoformat()))
+    response.set_etag(version)
+    return response
+
+
+def get_dashboard_payload(class_num):
+    """
+    캐시된 대시보드 응답을 돌려주고, 만료되었으면 새로 만듭니다.
+    버전은 응답 내용의 해시라서 데이터가 그대로면 같은 값이 나옵니다.
+    """
+    now = time.monotonic()
+    with _dashboard_cache_lock:
+        cached = _dashboard_cache.get(class_num)
+        if cached and cached[0] > now:
+            return cached[1]
+
+    payload = build_dashboard_payload(class_num)
+
+    with _dashboard_cache_lock:
+        _dashboard_cache[class_num] = (now + DASHBOARD_CACHE_SECONDS, payload)
+    return payload
+
+
+@app.route('/api/dashboard/<int:class_num>', methods=['GET'])
+def get_dashboard(class_num):
+    """대시보드 통합 데이터 (If-None-Match에 이전 버전을 보내면 변경이 없을 때 304)"""
+    if class_num not in get_config().classes:
+        return jsonify({'error': f'알 수 없는 반입니다: {class_num}'}), 404
+
+    try:
+        return make_dashboard_response(get_dashboard_payload(class_num))
+
+    except Exception as e:
+        logging.error(f"대시보드 통합 데이터 조회 오류: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+# ========== 분석 ==========
+
+def build_analytics(devices, hours):
+    """
+    기간 안의 토양수분/날씨를 한 번에 읽어서 analytics.summarize() 결과를 만듭니다.
+    이상값으로 표시된 토양수분은 통계에서 뺍니다.
+    archive.py 로 보관한 달은 보관 파일(메모리 매핑)에서 읽고, 그 뒤 기록만 DB에서 읽습니다.
+    """
+    start = datetime.now() - timedelta(hours=hours)
+    soil_until = archive.archived_until('soil_moisture_data')
+    weather_until = archive.archived_until('weather_data')
+    archived_soil = archived_weather = None
+    if soil_until and soil_until > start:
+        archived_soil = archive.read_soil(start, soil_until, devices)
+    if weather_until and weather_until > start:
+        archived_weather = archive.read_weather(start, weather_until)
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT device_id, soil_moisture, received_at
+            FROM soil_moisture_data
+            WHERE received_at >= %s
+              AND suspect IS NULL
+              AND (%s IS NULL OR device_id = ANY(%s))
+        ''', (max(start, soil_until or start), devices, devices))
+        soil = analytics.soil_frame(cursor.fetchall(), archived_soil)
+
+        cursor.execute('''
+            SELECT received_at, rain_detected, temperature, humidity
+            FROM weather_data
+            WHERE received_at >= %s
+        ''', (max(start, weather_until or start),))
+        weather = analytics.weather_frame(cursor.fetchall(), archived_weather)
+    finally:
+        conn.close()
+
+    classes = {class_num: info['devices'] for class_num, info in get_config().classes.items()}
+    result = analytics.summarize(soil, weather, classes)
+    result['hours'] = hours
+    result['archived_rows'] = len(archived_soil) if archived_soil is not None else 0
+    return result
+
+
+@app.route('/api/analytics', methods=['GET'])
+def get_analytics():
+    """
+    장치별/반별 통계, 마르는 속도, 강우 상관 (?hours=168, ?class= 또는 ?devices=)
+    """
+    try:
+        try:
+            devices = get_device_filter()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        hours = min(max(request.args.get('hours', 168, type=int), 1), ANALYTICS_MAX_HOURS)
+
+        key = (tuple(devices) if devices else None, hours)
+        now = time.monotonic()
+        with _analytics_cache_lock:
+            cached = _analytics_cache.get(key)
+            if cached and cached[0] > now:
+                return jsonify(cached[1])
+
+        result = build_analytics(list(devices) if devices else None, hours)
+        with _analytics_cache_lock:
+            _analytics_cache[key] = (now + ANALYTICS_CACHE_SECONDS, result)
+        return jsonify(result)
+
+    except Exception as e:
+        logging.error(f"분석 오류: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+# ========== 건조 예측 ==========
+
+@app.route('/api/forecast/<device_id>', methods=['GET'])
+def get_forecast(device_id):
+    """토양수분이 임계값(?threshold=40)까지 내려가는 데 남은 시간 예측"""
+    try:
+        # 모르는 장치는 모델을 만들거나 DB를 조회하지 않습니다
+        if device_id not in {d['device_id'] for d in get_config().devices}:
+            return jsonify({'error': f'알 수 없는 장치입니다: {device_id}'}), 404
+        threshold = request.args.get('threshold', analytics.DRY_THRESHOLD, type=float)
+        result = forecaster.forecast(device_id, threshold)
+        if result['last_reading_at'] is None:
+            return jsonify({'message': f'{device_id} 토양수분 데이터가 없습니다'}), 404
+        return jsonify(result)
+
+    except Exception as e:
+        logging.error(f"건조 예측 오류: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/forecast', methods=['GET'])
+def get_forecasts():
+    """여러 장치의 건조 예측 (?class= 또는 ?devices=, 없으면 설정된 모든 장치)"""
+    try:
+        try:
+            devices = get_device_filter()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        known = [d['device_id'] for d in get_config().devices]
+        # 모르는 장치는 모델을 만들거나 DB를 조회하지 않습니다
+        devices = [d for d in devices if d in known] if devices else known
+        threshold = request.args.get('threshold', analytics.DRY_THRESHOLD, type=float)
+
+        forecasts = [forecaster.forecast(device_id, threshold) for device_id in devices]
+        return jsonify({'threshold': threshold, 'forecasts': forecasts})
+
+    except Exception as e:
+        logging.error(f"건조 예측 오류: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+# ========== 이상값 경보 ==========
+
+@app.route('/api/alerts', methods=['GET'])
+def get_alerts():
+    """
+    이상값으로 표시된 측정값 (?hours=24&device_id=&limit=200)
+    active: 마지막 측정값이 아직 의심 상태인 장치/항목
+    """
+    try:
+        hours = request.args.get('hours', 24, type=int)
+        limit = min(request.args.get('limit', 200, type=int), 1000)
+        device_id = request.args.get('device_id')
+
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT * FROM (
+                SELECT 'soil' AS source, device_id, suspect, soil_moisture AS value,
+                       NULL::float AS humidity, received_at
+                FROM soil_moisture_data
+                WHERE suspect IS NOT NULL AND received_at >= LOCALTIMESTAMP - %s * INTERVAL '1 hour'
+                UNION ALL
+                SELECT 'weather', device_id, suspect, temperature, humidity, received_at
+                FROM weather_data
+                WHERE suspect IS NOT NULL AND received_at >= LOCALTIMESTAMP - %s * INTERVAL '1 hour'
+            ) alerts
+            WHERE %s IS NULL OR device_id = %s
+            ORDER BY received_at DESC
+            LIMIT %s
+        ''', (hours, hours, device_id, device_id, limit))
+        rows = cursor.fetchall()
+        conn.close()
+
+        alerts = []
+        for source, row_device, suspect, value, humidity, received_at in rows:
+            alert = {
+                'source': source,
+                'device_id': row_device,
+                'flags': suspect.split(','),
+                'received_at': received_at.isoformat()
+            }
+            if source == 'soil':
+                alert['soil_moisture'] = value
+            else:
+                alert['temperature'] = value
+                alert['humidity'] = humidity
+            alerts.append(alert)
+
+        active = [s for s in detector.current_state()
+                  if s['flags'] and (device_id is None or s['device_id'] == device_id)]
+        return jsonify({'alerts': alerts, 'count': len(alerts), 'active': active, 'hours': hours})
+
+    except Exception as e:
+        logging.error(f"경보 조회 오류: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+# ========== 장치 목록 ==========
+
+@app.route('/api/devices', methods=['GET'])
+def get_devices():
+    """설정 파일의 반 구성과 장치 목록 (라즈베리파이/대시보드가 같은 목록을 쓰는지 확인용)"""
+    config = get_config()
+    return jsonify({
+        'classes': {str(class_num): info for class_num, info in config.classes.items()},
+        'devices': config.devices,
+        'weather_stations': config.weather_stations
+    })
+
+
+@app.route('/api/heartbeats', methods=['GET'])
+def get_heartbeats():
+    """
+    장치별 마지막 수신 시각, 다음 보고 예정 시각과 상태 (ok/late/silent/never)
+    ?class= 또는 ?devices= 가 없으면 설정 파일의 장치와 날씨 장치, 그리고 보고한 적 있는 모든 장치
+    """
+    try:
+        try:
+            devices = get_device_filter()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if not devices:
+            config = get_config()
+            known = [d['device_id'] for d in config.devices] + list(config.weather_stations.values())
+            seen = [status['device_id'] for status in heartbeats.status()]
+            devices = list(dict.fromkeys(known + seen))
+
+        statuses = heartbeats.status(list(devices))
+        counts = {}
+        for status in statuses:
+            counts[status['state']] = counts.get(status['state'], 0) + 1
+        return jsonify({'devices': statuses, 'counts': counts, 'timestamp': datetime.now().isoformat()})
+
+    except Exception as e:
+        logging.error(f"heartbeat 조회 오류: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
 # ========== API 목록 ==========
 
 @app.route('/api', methods=['GET'])
@@ -474,12 +1172,31 @@ def api_list():
             '/api/weather/rain': '강우 상태만'
         },
         'soil_apis': {
-            '/api/soil/all': '모든 토양수분 센서 데이터',
+            '/api/soil/all': '모든 토양수분 센서 데이터 (?class=1 또는 ?devices=smartfarm_01,smartfarm_02)',
             '/api/soil/<device_id>': '특정 토양수분 센서',
             '/api/soil/list': '토양수분 센서 목록'
         },
+        'irrigation_apis': {
+            '/api/irrigation/events': '관수 이벤트 저장(POST) / 조회(GET, ?device_id=&days=)',
+            '/api/irrigation/daily': '장치별 하루 물준 시간 (?device_id=&days=)'
+        },
+        'analytics_apis': {
+            '/api/analytics': '장치별/반별 통계, 마르는 속도, 강우 상관 (?hours=168&class=1)'
+        },
+        'forecast_apis': {
+            '/api/forecast/<device_id>': '임계값까지 남은 시간 예측 (?threshold=40)',
+            '/api/forecast': '여러 장치 건조 예측 (?class=1 또는 ?devices=, &threshold=40)'
+        },
+        'alert_apis': {
+            '/api/alerts': '이상값으로 표시된 측정값과 현재 의심 상태 (?hours=24&device_id=)'
+        },
+        'device_apis': {
+            '/api/devices': '반 구성과 장치 목록 (config/smartfarm.json)',
+            '/api/heartbeats': '장치별 다음 보고 예정 시각과 상태 ok/late/silent/never (?class=1)'
+        },
         'summary_apis': {
             '/api/summary': '전체 농장 센서 요약',
+            '/api/dashboard/<class>': '대시보드 통합 데이터 (날씨, 반별 토양수분, 장치, 상태)',
             '/health': '서버 상태'
         }
     })
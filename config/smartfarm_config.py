@@ -0,0 +1,116 @@
+"""
+스마트팜 설정/장치 목록 모듈
+
+서버 주소, DB 접속 정보, 반 구성, 아두이노 장치 목록을 smartfarm.json 한 곳에서 읽습니다.
+(다른 파일을 쓰려면 환경변수 SMARTFARM_CONFIG 에 경로를 줍니다)
+
+- 한 번 읽은 설정은 캐시해서 다시 파싱하지 않습니다
+- 상주 프로세스(API 서버, 대시보드, 물주기 웹)는 get_config()를 부를 때마다
+  RELOAD_CHECK_SECONDS 에 한 번씩 파일 수정 시각만 확인하고, 바뀌었으면 다시 읽습니다.
+  장치를 추가해도 프로그램을 고치거나 재시작할 필요가 없습니다
+- 고친 파일이 잘못되었으면 경고만 남기고 이전 설정을 계속 씁니다
+
+aws/, raspberrypi/ 의 스크립트는 이 폴더를 sys.path 에 넣고 import 합니다.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+CONFIG_PATH = os.environ.get(
+    'SMARTFARM_CONFIG', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'smartfarm.json'))
+# 파일 수정 여부를 확인하는 최소 간격 (초)
+RELOAD_CHECK_SECONDS = 5
+
+_config = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+class SmartFarmConfig:
+    """
+    smartfarm.json 을 읽어 둔 값. 장치 목록은 파일에 적힌 순서를 지킵니다.
+    """
+
+    def __init__(self, data, mtime=None):
+        self.data = data
+        self.mtime = mtime
+        self.public_api_url = data['api']['public_url'].rstrip('/')
+        self.local_api_url = data['api']['local_url'].rstrip('/')
+        self.database = dict(data['database'])
+        self.weather_stations = dict(data.get('weather_stations', {}))
+        # 라즈베리파이 센서 백엔드 (raspberrypi/sensors.py)
+        self.sensors = dict(data.get('sensors') or {})
+        # 변화량 기준 보고와 heartbeat 간격 (raspberrypi/deadband.py, aws/heartbeat.py)
+        self.reporting = dict(data.get('reporting') or {})
+        # 릴레이 명령을 모아서 보내는 물주기 서버 주소 (aws/water_flask.py, 아두이노와 같은 망에서 실행)
+        self.relay = dict(data.get('relay') or {})
+        # 지난 달 기록 보관 폴더 (aws/archive.py)
+        self.archive = dict(data.get('archive') or {})
+        self.devices = [d for d in data['devices'] if d.get('enabled', True)]
+
+        ids = [d['device_id'] for d in self.devices]
+        if len(set(ids)) != len(ids):
+            raise ValueError("device_id 가 중복되었습니다")
+
+        # {반 번호: {'name', 'emoji', 'devices': [device_id, ...]}}
+        self.classes = {}
+        for key, info in data['classes'].items():
+            class_num = int(key)
+            self.classes[class_num] = {
+                **info,
+                'devices': [d['device_id'] for d in self.devices if d.get('class') == class_num]
+            }
+
+    def api_url(self, path=''):
+        """라즈베리파이 등 외부에서 쓰는 API 주소"""
+        return self.public_api_url + path
+
+    def class_devices(self, class_num):
+        """반의 장치 ID 목록. 없는 반이면 KeyError"""
+        return self.classes[class_num]['devices']
+
+    def ip_map(self):
+        """{아두이노 IP: device_id}"""
+        return {d['ip']: d['device_id'] for d in self.devices if d.get('ip')}
+
+    def relay_groups(self):
+        """{물주기 조 번호: 장치 정보} (조 번호 순)"""
+        groups = {d['relay_group']: d for d in self.devices if d.get('relay_group') is not None}
+        return dict(sorted(groups.items()))
+
+
+def load_config(path=None):
+    """
+    설정 파일을 읽습니다. (캐시하지 않습니다)
+    """
+    path = path or CONFIG_PATH
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    return SmartFarmConfig(data, os.path.getmtime(path))
+
+
+def get_config():
+    """
+    캐시된 설정. 파일이 바뀌었으면 다시 읽습니다.
+    """
+    global _config, _checked_at
+    with _lock:
+        now = time.monotonic()
+        if _config is not None and now - _checked_at < RELOAD_CHECK_SECONDS:
+            return _config
+        _checked_at = now
+
+        try:
+            mtime = os.path.getmtime(CONFIG_PATH)
+            if _config is None or mtime != _config.mtime:
+                reloaded = _config is not None
+                _config = load_config()
+                if reloaded:
+                    logging.info(f"설정 다시 읽음: {CONFIG_PATH} (장치 {len(_config.devices)}대)")
+        except Exception as e:
+            if _config is None:
+                raise
+            logging.warning(f"설정 파일을 읽지 못해 이전 설정을 계속 씁니다: {e}")
+        return _config
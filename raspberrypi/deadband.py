@@ -0,0 +1,58 @@
+"""
+데드밴드(변화량 기준) 보고 모듈
+
+값이 마지막으로 보낸 값에서 정한 변화량(delta) 넘게 바뀌면 바로 보내고,
+그렇지 않으면 heartbeat 간격이 지났을 때만 보냅니다.
+값이 안정된 동안(밤, 흐린 날 등) 전송과 DB 저장이 크게 줄어듭니다.
+
+보낼 데이터에 next_report_seconds(= heartbeat)를 넣어서, 서버가 언제까지 다음 보고를
+기다려야 하는지 알 수 있게 합니다 (aws/heartbeat.py).
+"""
+import time
+
+
+class Deadband:
+    """
+    deltas: {항목: 변화량}. 숫자가 아닌 항목(예: rain_detected)은 0으로 두면 값이 다를 때 보냅니다.
+    heartbeat: 값이 안 바뀌어도 이 간격(초)마다 한 번은 보냅니다.
+    """
+
+    def __init__(self, deltas, heartbeat, clock=time.monotonic):
+        self.deltas = dict(deltas)
+        self.heartbeat = heartbeat
+        self._clock = clock
+        self.last_sent = None
+        self.last_sent_at = None
+        self.sent = 0
+        self.suppressed = 0
+
+    def _changed(self, key, value):
+        previous = self.last_sent.get(key)
+        if value is None or previous is None:
+            # 읽기 실패(None)로 바뀐 것은 변화로 보지 않고, 처음 읽힌 값은 변화로 봅니다
+            return value is not None and previous is None
+        delta = self.deltas[key]
+        if isinstance(value, (int, float)) and isinstance(previous, (int, float)):
+            return abs(value - previous) > delta
+        return value != previous
+
+    def check(self, values):
+        """
+        보낼 이유를 돌려줍니다: 'first', 'change', 'heartbeat', 보내지 않아도 되면 None
+        """
+        if self.last_sent is None:
+            return 'first'
+        if any(self._changed(key, values.get(key)) for key in self.deltas):
+            return 'change'
+        if self._clock() - self.last_sent_at >= self.heartbeat:
+            return 'heartbeat'
+        return None
+
+    def mark_sent(self, values):
+        """전송에 성공했거나 보관함에 넣은 값을 기준값으로 삼습니다"""
+        self.last_sent = {key: values.get(key) for key in self.deltas}
+        self.last_sent_at = self._clock()
+        self.sent += 1
+
+    def mark_suppressed(self):
+        self.suppressed += 1
@@ -0,0 +1,126 @@
+"""
+DHT11 온습도 샘플링 모듈
+
+DHT11은 읽기 실패가 잦아서 한 번만 읽으면 None이 자주 나옵니다.
+여기서는 여러 번 읽고(실패하면 간격을 늘려 재시도), 중앙값/MAD로 튀는 값을 버린 뒤
+전송 주기마다 평균/최소/최대/샘플 수 하나로 묶어서 돌려줍니다.
+"""
+import logging
+import statistics
+import time
+
+# 수정 z-점수(0.6745 * |x - 중앙값| / MAD)가 이 값보다 크면 이상값으로 봅니다
+OUTLIER_THRESHOLD = 3.5
+# DHT11 분해능(1도, 1%)보다 작은 MAD는 분해능으로 올려서, 1단위 흔들림을 이상값으로 보지 않습니다
+MIN_MAD = 1.0
+
+
+def filter_outliers(values, threshold=OUTLIER_THRESHOLD, min_mad=MIN_MAD):
+    """
+    중앙값 절대 편차(MAD) 기준으로 튀는 값을 뺀 목록을 돌려줍니다.
+    """
+    if len(values) < 3:
+        return list(values)
+
+    median = statistics.median(values)
+    mad = max(statistics.median(abs(v - median) for v in values), min_mad)
+    return [v for v in values if 0.6745 * abs(v - median) / mad <= threshold]
+
+
+def summarize(values):
+    """
+    값 목록의 평균/최소/최대/개수 (값이 없으면 모두 None, 개수 0)
+    """
+    if not values:
+        return {'mean': None, 'min': None, 'max': None, 'count': 0}
+    return {
+        'mean': round(statistics.fmean(values), 1),
+        'min': round(min(values), 1),
+        'max': round(max(values), 1),
+        'count': len(values)
+    }
+
+
+class DhtSampler:
+    """
+    sample()을 여러 번 불러 값을 모으고, report()로 한 전송 주기의 요약을 꺼냅니다.
+    """
+
+    def __init__(self, device, reads=3, read_interval=2.0, max_retries=3, backoff=2.0, sleep=time.sleep):
+        self.device = device
+        self.reads = reads                  # sample() 한 번에 성공시킬 읽기 횟수
+        self.read_interval = read_interval  # DHT11은 1초 이상 간격을 둬야 합니다
+        self.max_retries = max_retries      # 읽기 한 번당 재시도 횟수
+        self.backoff = backoff              # 재시도 대기 시간 배수
+        self._sleep = sleep
+        self.temperatures = []
+        self.humidities = []
+        self.failures = 0
+
+    def _read_once(self):
+        """
+        재시도하면서 한 번 읽습니다. 끝내 실패하면 (None, None)
+        """
+        delay = self.read_interval
+        for attempt in range(self.max_retries + 1):
+            try:
+                temperature = self.device.temperature
+                humidity = self.device.humidity
+                if temperature is not None and humidity is not None:
+                    return temperature, humidity
+            except RuntimeError as e:
+                # 체크섬 오류 등 DHT에서 흔한 일시적 오류
+                logging.debug(f"온습도 센서 읽기 재시도 ({attempt + 1}): {e}")
+            except Exception as e:
+                logging.error(f"온습도 센서 오류: {e}")
+                break
+
+            self.failures += 1
+            if attempt < self.max_retries:
+                self._sleep(delay)
+                delay *= self.backoff
+        return None, None
+
+    def sample(self):
+        """
+        reads번 읽어서 창(window)에 쌓습니다. 성공한 읽기 수를 돌려줍니다.
+        """
+        success = 0
+        for i in range(self.reads):
+            if i:
+                self._sleep(self.read_interval)
+            temperature, humidity = self._read_once()
+            if temperature is None:
+                continue
+            self.temperatures.append(temperature)
+            self.humidities.append(humidity)
+            success += 1
+
+        if not success:
+            logging.warning("온습도 센서 읽기 실패")
+        return success
+
+    def report(self):
+        """
+        지금까지 모은 값을 이상값 제거 후 요약하고 창을 비웁니다.
+        """
+        temperature = summarize(filter_outliers(self.temperatures))
+        humidity = summarize(filter_outliers(self.humidities))
+        raw_count = len(self.temperatures)
+        failures = self.failures
+
+        self.temperatures = []
+        self.humidities = []
+        self.failures = 0
+
+        return {
+            'temperature': temperature['mean'],
+            'temperature_min': temperature['min'],
+            'temperature_max': temperature['max'],
+            'humidity': humidity['mean'],
+            'humidity_min': humidity['min'],
+            'humidity_max': humidity['max'],
+            'sample_count': min(temperature['count'], humidity['count']),
+            'raw_sample_count': raw_count,
+            'read_failures': failures
+        }
@@ -0,0 +1,449 @@
+"""
+관수 스케줄러
+
+장치마다 토양수분 부족분(THRESHOLD - 현재값)으로 물주기 시간을 정하고,
+우선순위 큐(heap)에 ON/OFF 이벤트를 넣어 시각 순서대로 실행합니다.
+같은 시각의 같은 명령은 relay_client.fan_out 으로 한 번에 보냅니다.
+같은 장치의 예약이 겹치거나 맞닿으면 하나로 합치고, 떨어진 예약은 구간마다 따로 켜고 끕니다.
+
+dry_run=True 와 SimulatedClock 을 쓰면 실제 릴레이나 대기 없이 전체 흐름을 확인할 수 있습니다.
+python irrigation.py 로 실행하면 가상 시계로 예약 합치기를 확인합니다 (dry_run_check).
+"""
+import heapq
+import itertools
+import json
+import time
+import urllib.parse
+import urllib.request
+
+from relay_client import fan_out, make_events, read_statuses, report, sent_to
+
+# 물주기 시간 계산 기본값 (초)
+BASE_SECONDS = 60         # 임계값 바로 아래일 때 물주는 시간
+SECONDS_PER_POINT = 10    # 부족한 토양수분 1%당 추가 시간
+MAX_SECONDS = 300         # 한 번에 최대로 물주는 시간
+
+
+def watering_duration(moisture, threshold, base=BASE_SECONDS, per_point=SECONDS_PER_POINT, maximum=MAX_SECONDS):
+    """
+    토양수분이 임계값 이하이면 부족분에 비례한 물주기 시간(초)을, 아니면 0을 돌려줍니다.
+    """
+    if moisture is None or moisture > threshold:
+        return 0
+    return min(base + (threshold - moisture) * per_point, maximum)
+
+
+# 피드백 제어 기본값
+TARGET_BAND = 15          # 임계값보다 이만큼 높아지면 물주기를 멈춥니다 (히스테리시스 폭, %)
+POLL_INTERVAL = 5         # 물주는 동안 /status 를 확인하는 간격 (초)
+MAX_STATUS_FAILURES = 3   # /status 연속 실패가 이만큼이면 안전을 위해 끕니다
+
+
+class SoilStateCache:
+    """
+    모든 장치의 최신 토양수분을 /api/soil/all?devices=... 한 번으로 받아서 보관합니다.
+    - 받은 지 cache_ttl초가 지나면 다음 조회 때 다시 받습니다
+    - 서버가 알려준 측정 경과 시간(age_seconds)이 max_age초보다 오래된 값은 돌려주지 않습니다
+    """
+
+    def __init__(self, api_url, farm_ids, max_age=1800, cache_ttl=30, timeout=10, clock=time.monotonic):
+        self.api_url = api_url
+        self.farm_ids = list(farm_ids)
+        self.max_age = max_age
+        self.cache_ttl = cache_ttl
+        self.timeout = timeout
+        self._clock = clock
+        self._fetched_at = None
+        # {farm_id: (토양수분, 받을 때의 측정 경과 초)}
+        self._states = {}
+
+    def refresh(self):
+        query = urllib.parse.urlencode({'devices': ','.join(self.farm_ids)})
+        with urllib.request.urlopen(f"{self.api_url}/all?{query}", timeout=self.timeout) as response:
+            data = json.loads(response.read().decode('utf-8'))
+        self._states = {
+            sensor['device_id']: (sensor['soil_moisture'], sensor.get('age_seconds'))
+            for sensor in data.get('sensors', [])
+        }
+        self._fetched_at = self._clock()
+
+    def get(self, farm_id):
+        """
+        (토양수분, 측정 경과 초, 상태) 를 돌려줍니다. 상태는 'ok', 'stale', 'missing', 'error' 중 하나이고
+        'ok'가 아니면 토양수분은 None 입니다.
+        """
+        if self._fetched_at is None or self._clock() - self._fetched_at > self.cache_ttl:
+            try:
+                self.refresh()
+            except Exception:
+                if self._fetched_at is None:
+                    return None, None, 'error'
+
+        if farm_id not in self._states:
+            return None, None, 'missing'
+
+        moisture, age = self._states[farm_id]
+        if age is not None:
+            # 캐시에 들고 있던 시간만큼 더 오래된 값입니다
+            age += self._clock() - self._fetched_at
+        if age is None or age > self.max_age:
+            return None, age, 'stale'
+        return moisture, age, 'ok'
+
+
+def fetch_forecasts(api_url, farm_ids, threshold, timeout=10):
+    """
+    서버의 건조 예측(/api/forecast?devices=...)을 한 번에 받아서
+    {farm_id: (임계값까지 남은 시간(시간), 예측에 쓴 마지막 측정의 경과 초)} 으로 돌려줍니다.
+    남은 시간은 마지막 측정 시각부터 센 값이라 지금부터는 경과 초만큼 빼야 합니다.
+    예측할 수 없는 장치는 (None, 경과 초), 요청이 실패하면 빈 dict
+    """
+    query = urllib.parse.urlencode({'devices': ','.join(farm_ids), 'threshold': threshold})
+    try:
+        with urllib.request.urlopen(f"{api_url}?{query}", timeout=timeout) as response:
+            data = json.loads(response.read().decode('utf-8'))
+    except Exception:
+        return {}
+    return {f['device_id']: (f.get('hours_to_threshold'), f.get('age_seconds'))
+            for f in data.get('forecasts', [])}
+
+
+class RealClock:
+    def now(self):
+        return time.monotonic()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+
+class SimulatedClock:
+    """
+    sleep하면 시간만 앞으로 넘어가는 시계 (테스트/dry-run용)
+    """
+
+    def __init__(self, start=0.0):
+        self._now = start
+
+    def now(self):
+        return self._now
+
+    def sleep(self, seconds):
+        self._now += max(0.0, seconds)
+
+
+def dry_run_relay(ips, cmd, **kwargs):
+    """
+    실제로 보내지 않고 모두 성공한 것처럼 결과를 만듭니다.
+    """
+    return [{'ip': ip, 'cmd': cmd, 'ok': True, 'attempts': 0, 'started': 0.0, 'finished': 0.0,
+             'elapsed': 0.0, 'response': 'DRY-RUN', 'error': None} for ip in ips]
+
+
+class IrrigationScheduler:
+    """
+    event_sink: 릴레이 명령 묶음마다 관수 이벤트 목록을 받는 함수 (예: relay_client.post_events)
+    """
+
+    def __init__(self, clock=None, relay=fan_out, log=print, names=None, dry_run=False, event_sink=None):
+        self.clock = clock or (SimulatedClock() if dry_run else RealClock())
+        self.relay = dry_run_relay if dry_run else relay
+        self.log = log
+        self.names = names or {}
+        self.event_sink = event_sink
+        # {ip: 켜진 시각} — OFF 때 물준 시간을 계산합니다
+        self._on_at = {}
+        self._queue = []
+        self._seq = itertools.count()
+        # {ip: {구간 번호: (시작 시각, 종료 시각)}} — 장치마다 겹치지 않는 예약 구간들
+        # 합쳐져서 없어진 구간의 ON/OFF 이벤트는 실행할 때 건너뜁니다
+        self._windows = {}
+        self._window_ids = itertools.count()
+        # {구간 번호: 확인 함수} — ON 직전에 check(ip)가 거짓이면 그 구간은 켜지 않고 버립니다
+        self._checks = {}
+        # 지금 릴레이가 켜져 있는 장치
+        self._running = set()
+        # 실행 기록: [(시각, ip, 명령, 성공 여부)]
+        self.history = []
+
+    def _push(self, at, cmd, ip, window_id):
+        heapq.heappush(self._queue, (at, next(self._seq), cmd, ip, window_id))
+
+    def schedule(self, ip, duration, start_in=0.0, check=None):
+        """
+        start_in초 뒤부터 duration초 동안 물을 줍니다.
+        같은 장치의 예약 중 겹치거나 맞닿은 구간은 하나로 합치고, 떨어진 구간은 따로 켜고 끕니다.
+        check: 켜기 직전에 부를 함수 check(ip). 거짓이면 켜지 않습니다 (미리 잡은 예약을 그때 다시 확인할 때).
+        확인 없는 예약과 합쳐진 구간은 확인 없이 켭니다.
+        """
+        if duration <= 0:
+            return
+        start = self.clock.now() + start_in
+        end = start + duration
+
+        windows = self._windows.setdefault(ip, {})
+        merged = [window_id for window_id, (s, e) in windows.items() if start <= e and end >= s]
+        for window_id in merged:
+            s, e = windows.pop(window_id)
+            start, end = min(start, s), max(end, e)
+            if window_id not in self._checks:
+                check = None
+            self._checks.pop(window_id, None)
+
+        window_id = next(self._window_ids)
+        windows[window_id] = (start, end)
+        if check is not None:
+            self._checks[window_id] = check
+        # 지금 켜져 있는 구간과 합쳐졌으면 이미 켜져 있으므로 OFF만 새 종료 시각으로 넣습니다
+        if not (merged and ip in self._running and start <= self.clock.now()):
+            self._push(start, 'on', ip, window_id)
+        self._push(end, 'off', ip, window_id)
+
+    def _due_batch(self):
+        """
+        가장 이른 이벤트와 같은 시각, 같은 명령인 이벤트들을 한 묶음으로 꺼냅니다.
+        {ip: 구간 번호} 로 돌려줍니다.
+        """
+        at, _, cmd, _, _ = self._queue[0]
+        batch = {}
+        while self._queue and self._queue[0][0] == at and self._queue[0][2] == cmd:
+            _, _, _, ip, window_id = heapq.heappop(self._queue)
+            # 합쳐지면서 무효가 된 이벤트는 건너뜁니다
+            if window_id in self._windows.get(ip, {}):
+                batch[ip] = window_id
+        return at, cmd, batch
+
+    def _checked(self, batch):
+        """
+        ON 직전 확인에 통과한 장치만 남깁니다. 통과하지 못한 구간은 OFF 와 함께 버립니다.
+        """
+        passed = {}
+        for ip, window_id in batch.items():
+            check = self._checks.pop(window_id, None)
+            if check is None or check(ip):
+                passed[ip] = window_id
+            else:
+                self._windows[ip].pop(window_id, None)
+                self.log(f"⏭️ {self.names.get(ip, ip)}: 켜기 전 확인에서 제외되어 예약을 취소합니다")
+        return passed
+
+    def run(self, until=None):
+        """
+        모든 예약이 끝날 때까지 이벤트를 시각 순서대로 실행합니다.
+        until(시계 시각)을 주면 그 시각까지만 실행하고 돌아옵니다 (그 사이에 예약을 더 넣을 수 있습니다).
+        """
+        while self._queue:
+            if until is not None and self._queue[0][0] > until:
+                break
+            at, cmd, batch = self._due_batch()
+            if not batch:
+                continue
+            wait = at - self.clock.now()
+            if wait > 0:
+                self.clock.sleep(wait)
+            if cmd == 'on':
+                batch = self._checked(batch)
+                if not batch:
+                    continue
+
+            ips = list(batch)
+            results = self.relay(ips, cmd)
+            report(results, self.log, self.names)
+            now = self.clock.now()
+            durations = {ip: now - self._on_at.pop(ip) for ip in ips if cmd == 'off' and ip in self._on_at}
+            if cmd == 'on':
+                self._on_at.update({r['ip']: now for r in results if r['ok']})
+            if self.event_sink:
+                self.event_sink(make_events(results, 'auto', self.names, durations, reason='scheduled'))
+            for result in results:
+                self.history.append((now, result['ip'], cmd, result['ok']))
+            if cmd == 'on':
+                # ON이 실패해도 OFF 예약은 남겨 두어, 혹시 켜졌더라도 꺼지게 합니다
+                self._running.update(sent_to(results))
+            else:
+                for ip in sent_to(results):
+                    self._running.discard(ip)
+                    self._windows.get(ip, {}).pop(batch[ip], None)
+
+        if until is not None and until > self.clock.now():
+            self.clock.sleep(until - self.clock.now())
+
+
+class ClosedLoopController:
+    """
+    물을 주는 동안 각 아두이노의 /status 토양수분을 주기적으로 읽어서,
+    목표값(임계값 + TARGET_BAND)에 닿은 장치부터 끕니다.
+    - 임계값 이하에서만 켜고 목표값에서 끄므로 경계에서 켜졌다 꺼졌다 하지 않습니다 (히스테리시스)
+    - max_on초가 지나거나 /status 를 연속으로 못 읽으면 안전을 위해 끕니다
+    - ON 응답이 실패한 장치도 실제로는 켜졌을 수 있으므로 똑같이 지켜보다가 끕니다
+    - 매 확인 루프에 걸린 시간을 기록합니다
+    """
+
+    def __init__(self, threshold, target=None, max_on=MAX_SECONDS, poll_interval=POLL_INTERVAL,
+                 clock=None, relay=fan_out, status_reader=read_statuses, log=print, names=None, dry_run=False,
+                 event_sink=None):
+        self.threshold = threshold
+        self.target = target if target is not None else threshold + TARGET_BAND
+        self.max_on = max_on
+        self.poll_interval = poll_interval
+        self.clock = clock or (SimulatedClock() if dry_run else RealClock())
+        self.relay = dry_run_relay if dry_run else relay
+        self.status_reader = status_reader
+        self.log = log
+        self.names = names or {}
+        self.event_sink = event_sink
+        # 루프 한 번(상태 읽기 + 끄기)에 걸린 시간 목록 (초)
+        self.loop_times = []
+        # {ip: (물준 시간, 멈춘 이유, 마지막 토양수분)}
+        self.results = {}
+
+    def _stop(self, ips, started, switched, reasons, moistures):
+        results = self.relay(ips, 'off')
+        report(results, self.log, self.names)
+        now = self.clock.now()
+        for ip in ips:
+            # 켜졌는지 확인하지 못한 장치는 물준 시간을 0으로 둡니다
+            self.results[ip] = (now - started[ip] if ip in switched else 0.0, reasons[ip], moistures.get(ip))
+
+        if self.event_sink:
+            events = make_events(results, 'closed_loop', self.names,
+                                 {ip: self.results[ip][0] for ip in ips if ip in switched})
+            for event, result in zip(events, results):
+                if result['ok']:
+                    event['reason'] = reasons[result['ip']]
+            self.event_sink(events)
+
+    def run(self, moistures):
+        """
+        moistures: {ip: 현재 토양수분}. 임계값 이하인 장치만 켜고 목표값까지 물을 줍니다.
+        """
+        dry = [ip for ip, moisture in moistures.items() if moisture is not None and moisture <= self.threshold]
+        if not dry:
+            return self.results
+
+        results = self.relay(dry, 'on')
+        report(results, self.log, self.names)
+        if self.event_sink:
+            self.event_sink(make_events(results, 'closed_loop', self.names, reason='below_threshold'))
+        # ON 응답과 상관없이 명령을 보낸 장치는 모두 지켜보다가 끕니다 (max_on 도 똑같이 적용)
+        started = {ip: self.clock.now() for ip in sent_to(results)}
+        # 켜진 것이 확인된 장치 (ON 성공 응답, 또는 /status 에서 릴레이 ON)
+        switched = {r['ip'] for r in results if r['ok']}
+        active = set(started)
+        failures = {ip: 0 for ip in active}
+        last = dict(moistures)
+        next_poll = self.clock.now() + self.poll_interval
+
+        while active:
+            wait = next_poll - self.clock.now()
+            if wait > 0:
+                self.clock.sleep(wait)
+            next_poll += self.poll_interval
+
+            loop_started = self.clock.now()
+            statuses = self.status_reader(sorted(active))
+            stop, reasons = [], {}
+            for ip in sorted(active):
+                moisture, relay_on = statuses.get(ip, (None, None))
+                if moisture is None:
+                    failures[ip] += 1
+                else:
+                    failures[ip] = 0
+                    last[ip] = moisture
+                if relay_on:
+                    switched.add(ip)
+
+                if moisture is not None and moisture >= self.target:
+                    reasons[ip] = 'target'
+                elif self.clock.now() - started[ip] >= self.max_on:
+                    reasons[ip] = 'max_on'
+                elif failures[ip] >= MAX_STATUS_FAILURES:
+                    reasons[ip] = 'status_failed'
+                elif relay_on is False:
+                    # 다른 경로(버튼 등)로 이미 꺼졌습니다
+                    reasons[ip] = 'external_off'
+                else:
+                    continue
+                stop.append(ip)
+
+            if stop:
+                for ip in stop:
+                    self.log(f"🛑 {self.names.get(ip, ip)}: {last.get(ip)}% → 정지 ({reasons[ip]})")
+                self._stop(stop, started, switched, reasons, last)
+                active.difference_update(stop)
+            self.loop_times.append(self.clock.now() - loop_started)
+
+        if self.loop_times:
+            self.log(f"⏱️ 피드백 루프 {len(self.loop_times)}회, 평균 {sum(self.loop_times) / len(self.loop_times):.2f}s, "
+                     f"최대 {max(self.loop_times):.2f}s")
+        return self.results
+
+
+class SimulatedSoil:
+    """
+    dry-run용 토양 모델: 릴레이가 켜져 있는 동안 초당 rate%씩 토양수분이 오릅니다.
+    ClosedLoopController의 relay와 status_reader로 씁니다.
+    """
+
+    def __init__(self, clock, moistures, rate=0.2):
+        self.clock = clock
+        self.moistures = dict(moistures)
+        self.rate = rate
+        self._on_since = {}
+
+    def _current(self, ip):
+        moisture = self.moistures[ip]
+        if ip in self._on_since:
+            moisture += (self.clock.now() - self._on_since[ip]) * self.rate
+        return min(int(moisture), 100)
+
+    def relay(self, ips, cmd, **kwargs):
+        for ip in ips:
+            if cmd == 'on':
+                self._on_since.setdefault(ip, self.clock.now())
+            elif ip in self._on_since:
+                self.moistures[ip] = self._current(ip)
+                del self._on_since[ip]
+        return dry_run_relay(ips, cmd)
+
+    def read_statuses(self, ips, **kwargs):
+        return {ip: (self._current(ip), ip in self._on_since) for ip in ips}
+
+
+def dry_run_check(log=lambda msg: None):
+    """
+    가상 시계로 예약이 겹치거나, 맞닿거나, 떨어진 경우와 켜기 전 확인(check)의 ON/OFF 순서를 확인합니다.
+    장치 한 대의 [(시각, 명령), ...] 가 기대와 다르면 AssertionError 를 냅니다.
+    """
+    def timeline(bookings, book_later=(), pause_at=None, check=None):
+        scheduler = IrrigationScheduler(log=log, dry_run=True)
+        for start, end in bookings:
+            scheduler.schedule('pot', end - start, start_in=start, check=check)
+        if pause_at is not None:
+            # 물주는 도중에 예약이 더 들어오는 경우
+            scheduler.run(until=pause_at)
+            for start, end in book_later:
+                scheduler.schedule('pot', end - start, start_in=start - scheduler.clock.now())
+        scheduler.run()
+        return [(at, cmd) for at, _, cmd, _ in scheduler.history]
+
+    cases = {
+        '떨어진 예약': (timeline([(0, 100), (200, 300)]),
+                    [(0, 'on'), (100, 'off'), (200, 'on'), (300, 'off')]),
+        '물주는 중 떨어진 예약': (timeline([(0, 100)], [(200, 300)], pause_at=50),
+                          [(0, 'on'), (100, 'off'), (200, 'on'), (300, 'off')]),
+        '겹치는 예약': (timeline([(0, 100), (50, 150)]), [(0, 'on'), (150, 'off')]),
+        '물주는 중 겹치는 예약': (timeline([(0, 100)], [(80, 180)], pause_at=50), [(0, 'on'), (180, 'off')]),
+        '맞닿은 예약': (timeline([(0, 100), (100, 200)]), [(0, 'on'), (200, 'off')]),
+        '물주는 중 맞닿은 예약': (timeline([(0, 100)], [(100, 200)], pause_at=50), [(0, 'on'), (200, 'off')]),
+        '세 구간 중 가운데가 양쪽과 겹침': (timeline([(0, 100), (200, 300), (90, 210)]), [(0, 'on'), (300, 'off')]),
+        '켜기 전 확인에서 빠진 예약': (timeline([(0, 100), (200, 300)], check=lambda ip, answers=iter([True, False]): next(answers)),
+                              [(0, 'on'), (100, 'off')]),
+    }
+    for name, (actual, expected) in cases.items():
+        assert actual == expected, f"{name}: {actual} != {expected}"
+    return list(cases)
+
+
+if __name__ == '__main__':
+    for name in dry_run_check():
+        print(f"✅ {name}")
@@ -0,0 +1,115 @@
+"""
+센서 측정값 로컬 보관함 (store-and-forward)
+
+네트워크가 끊겨도 측정값을 SQLite 파일에 먼저 저장해 두었다가,
+연결이 돌아오면 오래된 것부터 묶어서 전송합니다.
+저장 개수에 상한이 있어서 가득 차면 가장 오래된 측정값부터 지웁니다.
+서버가 받지 않는 측정값은 rejected 테이블로 옮겨서 뒤의 측정값 전송을 막지 않게 합니다.
+"""
+import json
+import sqlite3
+
+
+class LocalBuffer:
+    def __init__(self, path, max_rows=20000):
+        self.max_rows = max_rows
+        self.conn = sqlite3.connect(path)
+        # SD카드 쓰기를 줄이면서도 전원이 꺼졌을 때 파일이 깨지지 않도록 WAL을 씁니다
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS readings (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                payload TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        # 예전 보관함 파일에는 attempts 컬럼이 없습니다
+        columns = [row[1] for row in self.conn.execute('PRAGMA table_info(readings)')]
+        if 'attempts' not in columns:
+            self.conn.execute('ALTER TABLE readings ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS rejected (
+                id INTEGER PRIMARY KEY,
+                payload TEXT NOT NULL,
+                reason TEXT,
+                rejected_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        self.conn.commit()
+
+    def push(self, reading):
+        """
+        측정값 하나를 저장하고, 상한을 넘으면 가장 오래된 것부터 지웁니다.
+        """
+        with self.conn:
+            self.conn.execute('INSERT INTO readings (payload) VALUES (?)', (json.dumps(reading),))
+            self.conn.execute('''
+                DELETE FROM readings
+                WHERE id <= (SELECT MAX(id) FROM readings) - ?
+            ''', (self.max_rows,))
+
+    def peek(self, limit):
+        """
+        가장 오래된 측정값부터 limit개를 (id, 측정값) 목록으로 돌려줍니다. 지우지는 않습니다.
+        """
+        rows = self.conn.execute(
+            'SELECT id, payload FROM readings ORDER BY id LIMIT ?', (limit,)
+        ).fetchall()
+        return [(row_id, json.loads(payload)) for row_id, payload in rows]
+
+    def remove(self, ids):
+        """
+        전송이 끝난 측정값을 지웁니다.
+        """
+        if not ids:
+            return
+        marks = ','.join('?' * len(ids))
+        with self.conn:
+            self.conn.execute(f'DELETE FROM readings WHERE id IN ({marks})', list(ids))
+
+    def mark_failed(self, ids):
+        """
+        서버 오류로 전송하지 못한 측정값의 시도 횟수를 늘리고, 그중 가장 큰 횟수를 돌려줍니다.
+        """
+        if not ids:
+            return 0
+        marks = ','.join('?' * len(ids))
+        with self.conn:
+            self.conn.execute(f'UPDATE readings SET attempts = attempts + 1 WHERE id IN ({marks})', list(ids))
+            return self.conn.execute(
+                f'SELECT MAX(attempts) FROM readings WHERE id IN ({marks})', list(ids)).fetchone()[0] or 0
+
+    def quarantine(self, ids, reason):
+        """
+        서버가 받지 않는 측정값을 rejected 테이블로 옮깁니다. (지우지 않으므로 나중에 requeue 할 수 있습니다)
+        """
+        if not ids:
+            return
+        marks = ','.join('?' * len(ids))
+        with self.conn:
+            self.conn.execute(f'''
+                INSERT OR REPLACE INTO rejected (id, payload, reason)
+                SELECT id, payload, ? FROM readings WHERE id IN ({marks})
+            ''', [reason] + list(ids))
+            self.conn.execute(f'DELETE FROM readings WHERE id IN ({marks})', list(ids))
+
+    def requeue_rejected(self):
+        """
+        rejected 로 옮긴 측정값을 다시 전송 대기열에 넣습니다 (서버를 고친 뒤 씁니다). 옮긴 수를 돌려줍니다.
+        """
+        with self.conn:
+            moved = self.conn.execute('''
+                INSERT OR IGNORE INTO readings (id, payload) SELECT id, payload FROM rejected
+            ''').rowcount
+            self.conn.execute('DELETE FROM rejected')
+        return moved
+
+    def rejected_count(self):
+        return self.conn.execute('SELECT COUNT(*) FROM rejected').fetchone()[0]
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM readings').fetchone()[0]
+
+    def close(self):
+        self.conn.close()
@@ -1,35 +1,149 @@
 import requests
 import json
-from gpiozero import DigitalInputDevice
+import os
+import sys
 from datetime import datetime
+import threading
 import time
 import logging
+import sensors
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config'))
+from smartfarm_config import get_config
 
 logging.basicConfig(level=logging.INFO)
 
 # 설정
 RAIN_SENSOR_PIN = 17
-EC2_ENDPOINT = "http://34.229.121.126:5000/rainfall"
-DEVICE_ID = "raspberry_rain"
+config = get_config()
+EC2_ENDPOINT = config.api_url("/rainfall")
+DEVICE_ID = config.weather_stations.get("rain", "raspberry_rain")
+# 상태가 바뀌면 바로 보내고, 바뀌지 않으면 이 간격마다 전송 (설정 파일 reporting.rain.heartbeat)
+HEARTBEAT_INTERVAL = config.reporting.get("rain", {}).get("heartbeat", 300)
+BOUNCE_TIME = 2.0  # 빗방울로 신호가 떨리는 것을 무시할 시간 (초)
+
+
+def get_rain_sensor():
+    """
+    강우 센서 (설정된 백엔드에서 처음 쓸 때 만듭니다). 비가 오면 비활성(LOW)이 됩니다
+    """
+    return sensors.rain_sensor(RAIN_SENSOR_PIN, bounce_time=BOUNCE_TIME)
+
+
+class RainMonitor:
+    """
+    강우 센서의 상태 변화(엣지)를 콜백으로 받아서 비 시작/종료 시각과
+    전송 구간 동안 비가 온 시간을 기록합니다.
+    """
+
+    def __init__(self, sensor):
+        self.sensor = sensor
+        self.changed = threading.Event()
+        self._lock = threading.Lock()
+
+        now = datetime.now()
+        self.raining = not sensor.is_active
+        self.rain_since = now if self.raining else None
+        self.interval_start = now
+        self.rain_seconds = 0.0
+        self.started_at = None  # 이번 구간에서 마지막으로 비가 시작된 시각
+        self.stopped_at = None  # 이번 구간에서 마지막으로 비가 그친 시각
+        self.edges = 0
+
+        sensor.when_deactivated = self._on_rain_start
+        sensor.when_activated = self._on_rain_stop
+
+    def _on_rain_start(self):
+        with self._lock:
+            if self.raining:
+                return
+            now = datetime.now()
+            self.raining = True
+            self.rain_since = now
+            self.started_at = now
+            self.edges += 1
+        self.changed.set()
+
+    def _on_rain_stop(self):
+        with self._lock:
+            if not self.raining:
+                return
+            now = datetime.now()
+            self.rain_seconds += (now - max(self.rain_since, self.interval_start)).total_seconds()
+            self.raining = False
+            self.rain_since = None
+            self.stopped_at = now
+            self.edges += 1
+        self.changed.set()
+
+    def snapshot(self):
+        """
+        지난 전송 이후 구간의 요약을 만들고 새 구간을 시작합니다.
+        """
+        with self._lock:
+            now = datetime.now()
+            rain_seconds = self.rain_seconds
+            if self.raining:
+                rain_seconds += (now - max(self.rain_since, self.interval_start)).total_seconds()
+
+            data = {
+                "device_id": DEVICE_ID,
+                "timestamp": now.isoformat(),
+                "rain_detected": "rain" if self.raining else "no_rain",
+                "rain_started_at": self.started_at.isoformat() if self.started_at else None,
+                "rain_stopped_at": self.stopped_at.isoformat() if self.stopped_at else None,
+                "rain_duration_seconds": round(rain_seconds, 1),
+                "interval_seconds": round((now - self.interval_start).total_seconds(), 1),
+                "state_changes": self.edges
+            }
+
+            self.interval_start = now
+            self.rain_seconds = 0.0
+            self.started_at = None
+            self.stopped_at = None
+            self.edges = 0
+            self.changed.clear()
+        return data
 
-rain_sensor = DigitalInputDevice(RAIN_SENSOR_PIN)
+    def run(self, session=requests, heartbeat=HEARTBEAT_INTERVAL):
+        """
+        상태가 바뀌면 바로, 바뀌지 않으면 heartbeat 간격마다 전송합니다.
+        """
+        next_heartbeat = time.monotonic() + heartbeat
+        send_data(session, self, "start", heartbeat)
+        while True:
+            changed = self.changed.wait(timeout=max(0, next_heartbeat - time.monotonic()))
+            if changed:
+                send_data(session, self, "change", heartbeat)
+            else:
+                send_data(session, self, "heartbeat", heartbeat)
+                next_heartbeat += heartbeat
+                if next_heartbeat <= time.monotonic():
+                    next_heartbeat = time.monotonic() + heartbeat
 
 
-def send_data():
-    if not rain_sensor.is_active:
-        is_raining = "rain"
+def send_data(session=requests, monitor=None, reason="heartbeat", heartbeat=HEARTBEAT_INTERVAL):
+    """
+    강우 상태를 전송합니다. monitor가 없으면 (예전 방식처럼) 현재 상태만 읽어서 보냅니다.
+    heartbeat는 다음 보고까지 서버가 기다릴 최대 시간(초)으로 함께 보냅니다.
+    """
+    if monitor is not None:
+        data = monitor.snapshot()
     else:
-        is_raining = "no_rain"
-    data = {
-        "device_id": DEVICE_ID,
-        "timestamp": datetime.now().isoformat(),
-        "rain_detected": is_raining
-    }
+        data = {
+            "device_id": DEVICE_ID,
+            "timestamp": datetime.now().isoformat(),
+            "rain_detected": "rain" if not get_rain_sensor().is_active else "no_rain"
+        }
+    data["report_reason"] = reason
+    data["next_report_seconds"] = heartbeat
+    is_raining = data["rain_detected"] == "rain"
 
     try:
-        response = requests.post(EC2_ENDPOINT, json=data, timeout=10)
+        response = session.post(EC2_ENDPOINT, json=data, timeout=10)
         if response.status_code == 200:
-            logging.info(f"전송 성공: {'비' if is_raining else '맑음'}")
+            logging.info(f"전송 성공({reason}): {'비' if is_raining else '맑음'}, "
+                         f"구간 강우 {data.get('rain_duration_seconds', 0)}초")
         else:
             logging.error(f"전송 실패: {response.status_code}")
     except Exception as e:
@@ -37,6 +151,5 @@ def send_data():
 
 
 if __name__ == "__main__":
-    while True:
-        send_data()
-        time.sleep(300)  # 5분 대기
\ No newline at end of file
+    # 연결을 재사용하고, 센서 상태가 바뀔 때와 heartbeat 때만 전송합니다
+    RainMonitor(get_rain_sensor()).run(requests.Session())
@@ -1,41 +1,41 @@
 #!/usr/bin/env python3
-import urllib.request
+import os
+import sys
 import time
 from datetime import datetime
 
-# 아두이노 IP 주소들
-devices = [
-    "192.168.0.101",
-    "192.168.0.102",
-    "192.168.0.103",
-    "192.168.0.104",
-    "192.168.0.106",
-    "192.168.0.107",
-    "192.168.0.108",
-    "192.168.0.109", 
-]
+from relay_client import make_events, make_relay, post_events, report
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config'))
+from smartfarm_config import get_config
+
+# 아두이노 IP 주소와 장치 ID (config/smartfarm.json)
+config = get_config()
+DEVICES = config.ip_map()
+devices = list(DEVICES)
+EVENTS_URL = config.api_url("/api/irrigation/events")
+# 물주기 서버(water_flask.py)를 거쳐 보냅니다 (서버에 닿지 않으면 아두이노로 직접)
+relay = make_relay(config.relay.get("control_url"))
 
 print(f"🌅 {datetime.now()} - 시작")
 
-# ON 신호
+# ON 신호 (모든 장치에 동시에 전송)
 print("📡 릴레이 ON...")
-for ip in devices:
-    try:
-        urllib.request.urlopen(f"http://{ip}/relay/on", timeout=20)
-        print(f"✅ {ip} ON 성공")
-    except:
-        print(f"❌ {ip} ON 실패")
+on_results = relay(devices, "on", timeout=20, retries=1)
+report(on_results, names=DEVICES)
+post_events(EVENTS_URL, make_events(on_results, "cron", DEVICES, reason="timer"))
+on_at = time.monotonic()
 
 print("⏳ 3분 대기...")
 time.sleep(180)  # 3분
 
-# OFF 신호  
+# OFF 신호 (ON에 실패한 장치도 안전하게 끄도록 전체에 전송)
 print("📡 릴레이 OFF...")
-for ip in devices:
-    try:
-        urllib.request.urlopen(f"http://{ip}/relay/off", timeout=20)
-        print(f"✅ {ip} OFF 성공")
-    except:
-        print(f"❌ {ip} OFF 실패")
+off_results = relay(devices, "off", timeout=20, retries=2)
+report(off_results, names=DEVICES)
+watered = time.monotonic() - on_at
+# 물준 시간은 ON에 성공한 장치에만 남깁니다 (나머지 OFF는 안전을 위해 보낸 것)
+post_events(EVENTS_URL, make_events(off_results, "cron", DEVICES,
+                                    {r['ip']: watered for r in on_results if r['ok']}, reason="timer"))
 
 print(f"🏁 {datetime.now()} - 완료!")
@@ -1,72 +1,181 @@
 #!/usr/bin/env python3
-import urllib.request
-import json
+import argparse
+import os
+import sys
 import time
 from datetime import datetime
 
-# 장치 매핑
-DEVICES = {
-    "192.168.0.101": "smartfarm_01",
-    "192.168.0.102": "smartfarm_02",
-    "192.168.0.103": "smartfarm_03",
-    "192.168.0.104": "smartfarm_04",
-    "192.168.0.106": "smartfarm_06",
-    "192.168.0.107": "smartfarm_07",
-    "192.168.0.108": "smartfarm_08",
-    "192.168.0.109": "smartfarm_09",
+from relay_client import make_relay, post_events
+from irrigation import (ClosedLoopController, IrrigationScheduler, SimulatedClock, SimulatedSoil,
+                        SoilStateCache, fetch_forecasts, watering_duration)
 
-}
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config'))
+from smartfarm_config import get_config
 
-API_URL = "http://34.229.121.126:5000/api/soil"
+# 장치 매핑 {아두이노 IP: device_id}과 서버 주소 (config/smartfarm.json)
+config = get_config()
+DEVICES = config.ip_map()
+
+API_URL = config.api_url("/api/soil")
+EVENTS_URL = config.api_url("/api/irrigation/events")
+# 릴레이 명령은 물주기 서버(water_flask.py)를 거쳐 보냅니다 (서버에 닿지 않으면 아두이노로 직접)
+RELAY = make_relay(config.relay.get("control_url"))
+FORECAST_URL = config.api_url("/api/forecast")
 THRESHOLD = 40  # 토양습도 임계값
+# 이보다 오래된 측정값으로는 물을 주지 않습니다 (초, reporting.soil.max_reading_age)
+# 아두이노는 값이 안 바뀌면 heartbeat 간격으로만 보내므로, 서버가 정상으로 보는 heartbeat x 1.25
+# (aws/heartbeat.py 의 LATE_FACTOR) 보다 짧게 잡으면 멀쩡한 장치에 물을 주지 않게 됩니다
+SOIL_REPORTING = config.reporting.get("soil", {})
+MAX_READING_AGE = max(SOIL_REPORTING.get("max_reading_age", 0), SOIL_REPORTING.get("heartbeat", 3600) * 1.25)
+CRON_PERIOD = 60 * 60  # 이 스크립트를 cron 으로 돌리는 간격 (초)
+# planned 모드: 이 시간 안에 임계값에 닿을 장치는 미리 예약합니다 (초)
+# 예약한 물주기가 다음 cron 실행과 겹치지 않도록 시작 대기(60초)와 최대 물주기 시간만큼 cron 간격보다 짧게 둡니다
+PLAN_HORIZON = CRON_PERIOD - 10 * 60
+# 예약한 물주기를 켜기 직전 확인할 때 임계값보다 이만큼까지는 높아도 줍니다
+# (아두이노는 이만큼 바뀌어야 보고하므로 서버의 마지막 값이 실제보다 그만큼 높을 수 있습니다, %p)
+PLAN_MARGIN = SOIL_REPORTING.get("delta", 2)
 
 
 def log(msg):
     print(f"{datetime.now().strftime('%H:%M:%S')} - {msg}")
 
 
-def get_soil_moisture(farm_id):
-    try:
-        response = urllib.request.urlopen(f"{API_URL}/{farm_id}", timeout=5)
-        data = json.loads(response.read().decode('utf-8'))
-        return data.get('soil_moisture')
-    except:
-        return None
+def record_events(events):
+    """
+    릴레이 이벤트를 서버의 관수 기록에 남깁니다.
+    """
+    post_events(EVENTS_URL, events)
 
 
-def relay_control(ip, cmd):
-    try:
-        urllib.request.urlopen(f"http://{ip}/relay/{cmd}", timeout=5)
+def read_moistures(soil):
+    """
+    API에서 받은 토양수분을 {ip: 토양수분} 으로 모읍니다. 믿을 수 없는 값은 빼고 이유를 기록합니다.
+    """
+    moistures = {}
+    for ip, farm_id in DEVICES.items():
+        moisture, age, status = soil.get(farm_id)
+        if status != 'ok':
+            reason = {'stale': f"측정값이 너무 오래됨 ({age:.0f}초 전)" if age is not None else "측정 시각 알 수 없음",
+                      'missing': "측정값 없음",
+                      'error': "API 연결 실패"}[status]
+            log(f"⚠️ {farm_id}: {reason} → 물주기 건너뜀")
+            continue
+        moistures[ip] = moisture
+    return moistures
+
+
+def run_scheduled(moistures, dry_run):
+    """
+    부족한 만큼 장치별로 물주기 시간을 정하고, 시간이 끝나면 장치마다 따로 끕니다.
+    """
+    scheduler = IrrigationScheduler(relay=RELAY, log=log, names=DEVICES, dry_run=dry_run,
+                                    event_sink=None if dry_run else record_events)
+    for ip, moisture in moistures.items():
+        duration = watering_duration(moisture, THRESHOLD)
+        log(f"{DEVICES[ip]}: {moisture}%" + (f" → 💧 {duration:.0f}초 물주기 예약" if duration else ""))
+        scheduler.schedule(ip, duration)
+    scheduler.run()
+
+
+def still_dry(soil):
+    """
+    미리 잡은 물주기를 켜기 직전에 다시 확인하는 함수를 만듭니다.
+    그때의 측정값이 믿을 만하고(오래되지 않음) 임계값 근처까지 말랐을 때만 켭니다 (그 사이 비가 왔으면 건너뜀).
+    """
+    def check(ip):
+        moisture, age, status = soil.get(DEVICES[ip])
+        if status != 'ok':
+            log(f"⚠️ {DEVICES[ip]}: 예약한 물주기 직전 측정값을 쓸 수 없음 ({status})")
+            return False
+        if moisture > THRESHOLD + PLAN_MARGIN:
+            log(f"{DEVICES[ip]}: 예약한 물주기 직전 {moisture}% → 아직 충분히 젖어 있음")
+            return False
         return True
-    except:
-        return False
+    return check
+
+
+def run_planned(moistures, soil, dry_run, horizon=PLAN_HORIZON):
+    """
+    지금 부족한 장치는 바로 물을 주고, 서버의 건조 예측상 horizon초 안에 임계값에 닿을 장치는
+    그 시각에 물을 주도록 미리 예약합니다. 다음 실행까지 기다렸다가 너무 마른 뒤에 주지 않습니다.
+    예측은 마지막 측정 시각부터 센 것이므로 그 측정의 경과 시간만큼 당겨서 예약하고,
+    켜기 직전에 soil(SoilStateCache)로 토양수분과 측정 시각을 다시 확인합니다.
+    """
+    if horizon > PLAN_HORIZON:
+        log(f"⚠️ 다음 cron 실행과 겹치지 않도록 예약 범위를 {PLAN_HORIZON:.0f}초로 줄입니다")
+        horizon = PLAN_HORIZON
+    forecasts = fetch_forecasts(FORECAST_URL, list(DEVICES.values()), THRESHOLD)
+    if not forecasts:
+        log("⚠️ 건조 예측을 받지 못해 지금 부족한 장치만 물을 줍니다")
+
+    scheduler = IrrigationScheduler(relay=RELAY, log=log, names=DEVICES, dry_run=dry_run,
+                                    event_sink=None if dry_run else record_events)
+    check = None if dry_run else still_dry(soil)
+    for ip, moisture in moistures.items():
+        duration = watering_duration(moisture, THRESHOLD)
+        if duration:
+            log(f"{DEVICES[ip]}: {moisture}% → 💧 {duration:.0f}초 물주기 예약")
+            scheduler.schedule(ip, duration)
+            continue
+
+        hours, age = forecasts.get(DEVICES[ip], (None, None))
+        start_in = hours * 3600 - (age or 0) if hours is not None else None
+        duration = watering_duration(THRESHOLD, THRESHOLD)
+        if start_in is not None and max(start_in, 0) + duration <= horizon:
+            start_in = max(start_in, 0)
+            log(f"{DEVICES[ip]}: {moisture}% → ⏰ {start_in / 60:.0f}분 뒤 임계값 도달 예상, {duration:.0f}초 물주기 예약")
+            scheduler.schedule(ip, duration, start_in=start_in, check=check)
+        else:
+            log(f"{DEVICES[ip]}: {moisture}%" + (f" (임계값까지 약 {hours:.1f}시간)" if hours is not None else ""))
+    scheduler.run()
+
+
+def run_closed_loop(moistures, dry_run):
+    """
+    물주는 동안 아두이노 /status 로 토양수분을 확인하면서 목표값에 닿으면 끕니다.
+    """
+    for ip, moisture in moistures.items():
+        log(f"{DEVICES[ip]}: {moisture}%")
+
+    if dry_run:
+        clock = SimulatedClock()
+        simulated = SimulatedSoil(clock, moistures)
+        controller = ClosedLoopController(THRESHOLD, clock=clock, relay=simulated.relay,
+                                          status_reader=simulated.read_statuses, log=log, names=DEVICES)
+    else:
+        controller = ClosedLoopController(THRESHOLD, relay=RELAY, log=log, names=DEVICES, event_sink=record_events)
+
+    for ip, (seconds, reason, moisture) in controller.run(moistures).items():
+        log(f"💧 {DEVICES[ip]}: {seconds:.0f}초 물주기, 종료 {moisture}% ({reason})")
 
 
 def main():
-    log("🚀 스마트팜 자동관수 시작")
+    parser = argparse.ArgumentParser(description='스마트팜 자동관수')
+    parser.add_argument('--mode', choices=['scheduled', 'closed-loop', 'planned'], default='scheduled',
+                        help='scheduled: 부족분으로 시간 계산 / closed-loop: 실시간 토양수분으로 정지 / '
+                             'planned: 건조 예측으로 미리 예약')
+    parser.add_argument('--horizon', type=float, default=PLAN_HORIZON,
+                        help='planned 모드에서 미리 예약할 범위 (초)')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='릴레이를 실제로 움직이지 않고 가상 시계로 일정만 확인')
+    args = parser.parse_args()
+
+    log(f"🚀 스마트팜 자동관수 시작 ({args.mode})" + (" (dry-run)" if args.dry_run else ""))
 
     # 네트워크 대기
-    time.sleep(60)
-
-    # 토양습도 체크 및 릴레이 제어
-    active_devices = []
-
-    for ip, farm_id in DEVICES.items():
-        moisture = get_soil_moisture(farm_id)
-        log(f"{farm_id}: {moisture}%")
-
-        if moisture and moisture <= THRESHOLD:
-            if relay_control(ip, "on"):
-                active_devices.append(ip)
-                log(f"💧 {farm_id} 물주기 시작")
-
-    if active_devices:
-        log("⏰ 3분 대기...")
-        time.sleep(180)
-
-        for ip in active_devices:
-            relay_control(ip, "off")
-            log("🔄 물주기 종료")
+    if not args.dry_run:
+        time.sleep(60)
+
+    # 모든 장치의 토양수분을 한 번의 요청으로 받아옵니다
+    soil = SoilStateCache(API_URL, DEVICES.values(), max_age=MAX_READING_AGE)
+    moistures = read_moistures(soil)
+
+    if args.mode == 'closed-loop':
+        run_closed_loop(moistures, args.dry_run)
+    elif args.mode == 'planned':
+        run_planned(moistures, soil, args.dry_run, args.horizon)
+    else:
+        run_scheduled(moistures, args.dry_run)
 
     log("✅ 완료")
 
@@ -1,68 +1,203 @@
 import requests
 import json
-from gpiozero import DigitalInputDevice
+import os
+import sys
 from datetime import datetime
-import board
 import time
 import logging
-import adafruit_dht
+import sensors
+from local_buffer import LocalBuffer
+from dht_sampler import DhtSampler
+from deadband import Deadband
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config'))
+from smartfarm_config import get_config
 
 logging.basicConfig(level=logging.INFO)
 
 # 설정
 RAIN_SENSOR_PIN = 17
-EC2_ENDPOINT = "http://34.229.121.126:5000/rainfall"
-DEVICE_ID = "raspberry_sf"
+DHT_PIN = "D2"
+config = get_config()
+EC2_BATCH_ENDPOINT = config.api_url("/rainfall/batch")
+DEVICE_ID = config.weather_stations.get("weather", "raspberry_sf")
+REPORT_INTERVAL = 300  # 데드밴드 없이 cron/에이전트로 보낼 때의 기본 전송 간격 (초)
+
+# 전송 못한 측정값 보관 설정
+BUFFER_PATH = "/home/pi/weather_buffer.db"
+BUFFER_MAX_ROWS = 20000  # 5분 간격 기준 약 70일치
+BATCH_SIZE = 100
+MAX_SERVER_ERRORS = 5  # 같은 측정값이 서버 오류(5xx)로 이만큼 실패하면 나눠 보내서 문제 측정값을 찾습니다
+
+# 센서는 처음 쓸 때 설정된 백엔드(sensors.py)에서 만듭니다
+_dht_sampler = None
+
+
+def get_rain_sensor():
+    return sensors.rain_sensor(RAIN_SENSOR_PIN)
+
+
+def get_dht_sampler():
+    """
+    온습도 샘플러 (여러 번 읽고 이상값을 걸러서 전송 주기마다 요약합니다)
+    """
+    global _dht_sampler
+    if _dht_sampler is None:
+        backend = sensors.get_backend()
+        _dht_sampler = DhtSampler(backend.dht_device(DHT_PIN), reads=3,
+                                  read_interval=backend.min_read_interval)
+    return _dht_sampler
 
-# 센서 초기화
-rain_sensor = DigitalInputDevice(RAIN_SENSOR_PIN)
-dhtDevice = adafruit_dht.DHT11(board.D2) # 센서 타입
+
+def make_deadband():
+    """
+    변화량 기준 보고 설정 (config/smartfarm.json 의 reporting.weather)
+    상주 에이전트에서만 씁니다 (cron 은 실행마다 마지막 전송값을 잊기 때문입니다)
+    """
+    reporting = get_config().reporting.get("weather", {})
+    return Deadband(reporting.get("deltas", {"temperature": 1.0, "humidity": 3.0, "rain_detected": 0}),
+                    reporting.get("heartbeat", 1800))
 
 
 def read_temp_humidity():
-    """온습도 센서 값 읽기"""
+    """
+    온습도 센서 요약값 읽기
+    상주 에이전트가 sample()을 미리 불러 두었으면 그 값들을, 아니면 지금 한 번 샘플링해서 요약합니다.
+    """
+    dht_sampler = get_dht_sampler()
+    if not dht_sampler.temperatures:
+        dht_sampler.sample()
+    return dht_sampler.report()
+
+
+def _post_batch(session, batch):
+    return session.post(EC2_BATCH_ENDPOINT, json={"readings": [reading for _, reading in batch]}, timeout=30)
+
+
+def _server_accepts_next(buffer, session):
+    """
+    맨 앞 측정값 다음의 측정값 하나를 보내 봐서 서버가 살아 있는지 확인합니다 (받아 주면 보관함에서 지웁니다).
+    맨 앞 측정값만 서버 오류를 내는지, 서버 자체가 고장인지 구분할 때 씁니다.
+    """
+    probe = buffer.peek(2)[1:]
+    if not probe:
+        return False
     try:
-        temperature = dhtDevice.temperature
-        humidity = dhtDevice.humidity
-        if humidity is not None and temperature is not None:
-            return round(humidity, 1), round(temperature, 1)
-        else:
-            logging.warning("온습도 센서 읽기 실패")
-            return None, None
-    except Exception as e:
-        logging.error(f"온습도 센서 오류: {e}")
-        return None, None
-
-def send_data():
+        response = _post_batch(session, probe)
+    except Exception:
+        return False
+    if response.status_code != 200:
+        return False
+    buffer.remove([probe[0][0]])
+    return True
+
+
+def flush_buffer(buffer, session=requests):
+    """
+    보관함에 쌓인 측정값을 오래된 것부터 묶어서 전송합니다.
+    - 연결 오류: 남은 것은 다음 실행 때 다시 보냅니다
+    - 4xx: 서버가 받을 수 없는 측정값이므로 묶음을 반씩 나눠 보내서 문제 측정값만 rejected 로 옮깁니다
+    - 5xx: 다음 실행 때 다시 보내되, 같은 측정값이 MAX_SERVER_ERRORS 번 실패하면 4xx 처럼 나눠 보내서
+      문제 측정값을 찾습니다. 서버가 다른 측정값은 받아 줄 때만 옮기므로, 서버 고장으로는 옮겨지지 않습니다
+    session: 연결을 재사용할 requests.Session (없으면 매번 새 연결)
+    """
+    sent = 0
+    size = BATCH_SIZE
+    while True:
+        batch = buffer.peek(size)
+        if not batch:
+            break
+        ids = [row_id for row_id, _ in batch]
+
+        try:
+            response = _post_batch(session, batch)
+        except Exception as e:
+            logging.error(f"오류: {e} (미전송 {len(buffer)}건 보관 중)")
+            break
+
+        if response.status_code == 200:
+            buffer.remove(ids)
+            sent += len(batch)
+            size = BATCH_SIZE
+            continue
+
+        logging.error(f"전송 실패: {response.status_code} ({len(batch)}건, 미전송 {len(buffer)}건 보관 중)")
+        logging.error(f"응답 내용: {response.text[:500]}")
+        # 408(시간 초과), 429(요청 과다)는 잠깐 뒤 다시 보내면 되는 4xx 입니다
+        rejected = 400 <= response.status_code < 500 and response.status_code not in (408, 429)
+        if not rejected and buffer.mark_failed(ids) < MAX_SERVER_ERRORS:
+            break
+
+        if len(batch) > 1:
+            # 반으로 나눠서 받아 주는 쪽은 보내고, 문제 측정값을 좁혀 갑니다
+            size = (len(batch) + 1) // 2
+            continue
+
+        if not rejected and not sent and not _server_accepts_next(buffer, session):
+            break
+        buffer.quarantine(ids, f"{response.status_code} {response.text[:200]}")
+        logging.warning(f"서버가 받지 않는 측정값을 따로 보관합니다: {batch[0][1]} "
+                        f"(보관 {buffer.rejected_count()}건)")
+
+    return sent
+
+
+def send_data(session=requests, buffer=None, deadband=None, interval=REPORT_INTERVAL):
+    """
+    센서를 읽어서 보관함에 저장하고 전송합니다.
+    상주 에이전트(sensor_agent.py)는 session과 buffer를 한 번 만들어서 계속 넘겨줍니다.
+    deadband를 주면 값이 크게 바뀌었거나 heartbeat 간격이 지났을 때만 보내고,
+    아니면 보관함에 남은 것만 전송합니다. interval은 데드밴드 없이 보낼 때의 전송 간격입니다.
+    """
     # 강우 센서 읽기
-    if not rain_sensor.is_active:
+    if not get_rain_sensor().is_active:
         is_raining = "rain"
         rain_status = "비"
     else:
         is_raining = "no_rain"
         rain_status = "맑음"
     
-    # 온습도 센서 읽기
-    humidity, temperature = read_temp_humidity()
+    # 온습도 센서 읽기 (평균/최소/최대/샘플 수)
+    dht_summary = read_temp_humidity()
+    humidity = dht_summary['humidity']
+    temperature = dht_summary['temperature']
     
     # 전송할 데이터 구성
     data = {
         "device_id": DEVICE_ID,
         "timestamp": datetime.now().isoformat(),
         "rain_detected": is_raining,
-        "humidity": humidity,
-        "temperature": temperature
+        **dht_summary
     }
-    
+
+    # 서버가 다음 보고를 언제까지 기다릴지 알 수 있게 간격을 함께 보냅니다
+    if deadband is not None:
+        reason = deadband.check(data)
+        data["report_reason"] = reason
+        data["next_report_seconds"] = deadband.heartbeat
+    else:
+        reason = "interval"
+        data["next_report_seconds"] = interval
+
+    # 먼저 로컬에 저장한 다음 보관함 전체를 전송합니다
+    own_buffer = buffer is None
+    if own_buffer:
+        buffer = LocalBuffer(BUFFER_PATH, BUFFER_MAX_ROWS)
     try:
-        response = requests.post(EC2_ENDPOINT, json=data, timeout=30)
-        if response.status_code == 200:
-            logging.info(f"전송 성공: {rain_status}, 온도: {temperature}°C, 습도: {humidity}%, {datetime.now().isoformat()}")
-        else:
-            logging.error(f"전송 실패: {response.status_code}")
-            logging.error(f"응답 내용: {response.text}")
-    except Exception as e:
-        logging.error(f"오류: {e}")
+        if reason is None:
+            deadband.mark_suppressed()
+            if len(buffer):
+                flush_buffer(buffer, session)
+            return
+        buffer.push(data)
+        if deadband is not None:
+            deadband.mark_sent(data)
+        sent = flush_buffer(buffer, session)
+        if sent:
+            logging.info(f"전송 성공({reason}): {rain_status}, 온도: {temperature}°C, 습도: {humidity}%, {datetime.now().isoformat()} ({sent}건)")
+    finally:
+        if own_buffer:
+            buffer.close()
 
 if __name__ == "__main__":
     send_data()
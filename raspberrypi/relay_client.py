@@ -0,0 +1,209 @@
+"""
+아두이노 릴레이 명령 모듈
+
+여러 아두이노에 /relay/on, /relay/off 명령을 스레드 풀로 동시에 보냅니다.
+장치마다 타임아웃과 재시도를 따로 적용하므로, 응답 없는 보드 하나가
+다른 화분의 물주기 시작/종료를 늦추지 않습니다.
+
+물주기 서버(aws/water_flask.py)도 이 모듈의 send_relay_command 로 아두이노에 보내고,
+cron 스크립트는 make_relay() 로 그 서버의 /api/relay/batch 를 거쳐 보냅니다.
+그래서 버튼, cron, 대시보드의 명령이 모두 한 곳에서 나가고 릴레이 상태도 한 곳에 남습니다.
+"""
+import json
+import re
+import time
+import urllib.request
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+
+def send_relay_command(ip, cmd, timeout=5, retries=1, backoff=0.5):
+    """
+    릴레이 명령 하나를 보내고 결과를 dict로 돌려줍니다.
+    실패하면 backoff 초씩 늘려가며 retries번 더 시도합니다.
+    """
+    started = time.monotonic()
+    error = None
+    body = None
+    attempts = 0
+
+    for attempt in range(retries + 1):
+        attempts += 1
+        try:
+            with urllib.request.urlopen(f"http://{ip}/relay/{cmd}", timeout=timeout) as response:
+                body = response.read().decode('utf-8', errors='replace').strip()
+            error = None
+            break
+        except Exception as e:
+            error = str(e)
+            if attempt < retries:
+                time.sleep(backoff * (attempt + 1))
+
+    finished = time.monotonic()
+    return {
+        'ip': ip,
+        'cmd': cmd,
+        'ok': error is None,
+        'attempts': attempts,
+        'started': started,
+        'finished': finished,
+        'elapsed': finished - started,
+        'response': body,
+        'error': error
+    }
+
+
+# 아두이노 handleWeb()의 /status 응답: "Soil:%d%%, Relay:%s"
+STATUS_PATTERN = re.compile(r'Soil:(\d+)%\s*,\s*Relay:(ON|OFF)')
+
+
+def read_status(ip, timeout=5):
+    """
+    아두이노 /status 를 읽어서 (토양수분, 릴레이 켜짐 여부)를 돌려줍니다. 실패하면 (None, None)
+    """
+    try:
+        with urllib.request.urlopen(f"http://{ip}/status", timeout=timeout) as response:
+            body = response.read().decode('utf-8', errors='replace')
+    except Exception:
+        return None, None
+
+    match = STATUS_PATTERN.search(body)
+    if not match:
+        return None, None
+    return int(match.group(1)), match.group(2) == 'ON'
+
+
+def read_statuses(ips, timeout=5):
+    """
+    여러 장치의 /status 를 동시에 읽어서 {ip: (토양수분, 릴레이 켜짐 여부)} 로 돌려줍니다.
+    """
+    ips = list(ips)
+    if not ips:
+        return {}
+
+    with ThreadPoolExecutor(max_workers=len(ips)) as executor:
+        return dict(zip(ips, executor.map(lambda ip: read_status(ip, timeout), ips)))
+
+
+def fan_out(ips, cmd, timeout=5, retries=1, max_workers=None):
+    """
+    여러 장치에 같은 명령을 동시에 보내고, ips 순서대로 결과 목록을 돌려줍니다.
+    """
+    ips = list(ips)
+    if not ips:
+        return []
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(ips)) as executor:
+        return list(executor.map(lambda ip: send_relay_command(ip, cmd, timeout, retries), ips))
+
+
+def api_fan_out(control_url, ips, cmd, timeout=5, retries=1):
+    """
+    물주기 서버의 /api/relay/batch/<cmd> 로 여러 장치에 명령을 보내고, fan_out 과 같은 결과 목록을 돌려줍니다.
+    서버가 장치별 타임아웃/재시도로 동시에 보내므로, 요청 대기 시간은 그만큼 넉넉히 잡습니다.
+    """
+    ips = list(ips)
+    if not ips:
+        return []
+    request = urllib.request.Request(
+        f"{control_url.rstrip('/')}/api/relay/batch/{cmd}",
+        data=json.dumps({'ips': ips, 'timeout': timeout, 'retries': retries}).encode('utf-8'),
+        headers={'Content-Type': 'application/json'},
+        method='POST'
+    )
+    wait = timeout * (retries + 1) + 0.5 * retries * (retries + 1) + 10
+    with urllib.request.urlopen(request, timeout=wait) as response:
+        results = json.loads(response.read().decode('utf-8'))['results']
+    by_ip = {r['ip']: r for r in results}
+    return [by_ip[ip] for ip in ips]
+
+
+def make_relay(control_url=None, log=print):
+    """
+    fan_out 과 같은 모양의 릴레이 명령 함수를 돌려줍니다.
+    control_url(물주기 서버 주소)이 있으면 서버를 거쳐 보내고, 서버에 닿지 않으면
+    물주기가 멈추지 않도록 아두이노에 직접 보냅니다 (on/off 는 두 번 보내도 결과가 같습니다).
+    """
+    if not control_url:
+        return fan_out
+
+    def relay(ips, cmd, timeout=5, retries=1, **kwargs):
+        try:
+            return api_fan_out(control_url, ips, cmd, timeout, retries)
+        except Exception as e:
+            log(f"⚠️ 물주기 서버({control_url})에 보내지 못해 아두이노로 직접 보냅니다: {e}")
+            return fan_out(ips, cmd, timeout, retries)
+
+    return relay
+
+
+def sent_to(results):
+    """
+    명령을 보낸 장치 목록 (성공 여부와 상관없이).
+    ON이 시간 초과로 실패해도 아두이노에서는 릴레이가 켜졌을 수 있으므로, OFF는 이 목록 전체에 보냅니다.
+    """
+    return [r['ip'] for r in results]
+
+
+def report(results, log=print, names=None):
+    """
+    장치별 결과와 시간, 전체 명령이 도착한 시간 폭을 출력합니다.
+    names: {ip: 표시 이름} (없으면 ip를 그대로 씁니다)
+    """
+    if not results:
+        return
+
+    names = names or {}
+    for result in results:
+        name = names.get(result['ip'], result['ip'])
+        cmd = result['cmd'].upper()
+        if result['ok']:
+            log(f"✅ {name} {cmd} 성공 ({result['elapsed']:.2f}s, {result['attempts']}회)")
+        else:
+            log(f"❌ {name} {cmd} 실패 ({result['elapsed']:.2f}s, {result['attempts']}회): {result['error']}")
+
+    ok = [r for r in results if r['ok']]
+    if ok:
+        spread = max(r['finished'] for r in ok) - min(r['finished'] for r in ok)
+        log(f"⏱️ {results[0]['cmd'].upper()} {len(ok)}/{len(results)}대 성공, "
+            f"완료 시각 편차 {spread:.2f}s, 가장 느린 장치 {max(r['elapsed'] for r in ok):.2f}s")
+
+
+def make_events(results, source, names=None, durations=None, reason=None):
+    """
+    릴레이 명령 결과를 관수 이벤트 목록으로 바꿉니다.
+    names: {ip: device_id}, durations: {ip: 켜져 있던 초} (off 이벤트용)
+    """
+    names = names or {}
+    durations = durations or {}
+    now = datetime.now().isoformat()
+    return [{
+        'device_id': names.get(r['ip'], r['ip']),
+        'action': r['cmd'],
+        'source': source,
+        'ok': r['ok'],
+        'duration_seconds': durations.get(r['ip']) if r['cmd'] == 'off' else None,
+        'reason': reason if r['ok'] else (r['error'] or '')[:50],
+        'event_time': now
+    } for r in results]
+
+
+def post_events(api_url, events, timeout=10):
+    """
+    관수 이벤트를 서버(/api/irrigation/events)에 저장합니다. 실패해도 물주기는 계속합니다.
+    """
+    if not events:
+        return True
+    request = urllib.request.Request(
+        api_url,
+        data=json.dumps({'events': events}).encode('utf-8'),
+        headers={'Content-Type': 'application/json'},
+        method='POST'
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+        return True
+    except Exception as e:
+        print(f"⚠️ 관수 이벤트 기록 실패: {e}")
+        return False
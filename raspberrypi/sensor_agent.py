@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+라즈베리파이 상주 센서 에이전트
+
+cron으로 매번 스크립트를 새로 띄우는 대신 한 프로세스가 계속 떠 있으면서
+- 센서는 처음에 한 번만 초기화하고
+- HTTP 연결은 Session으로 재사용하고
+- 작업마다 정해진 간격으로 (실행 시간만큼 밀리지 않게) 실행하고
+- 자기 자신의 루프 지연을 주기적으로 기록합니다.
+
+사용 예:
+    python3 sensor_agent.py --task weather=300
+    python3 sensor_agent.py --task weather=300 --task dht=60
+    python3 sensor_agent.py --task rain=300 --stats-interval 600
+    python3 sensor_agent.py --task weather=60 --task dht=20 --deadband  # 크게 바뀔 때만 + heartbeat
+    python3 sensor_agent.py --task weather=300 --sensors mock          # 하드웨어 없이
+    python3 sensor_agent.py --task weather=300 --sensors replay --sensor-trace traces.jsonl
+"""
+import argparse
+import heapq
+import logging
+import threading
+import time
+
+import requests
+
+import sensors
+
+logging.basicConfig(level=logging.INFO)
+
+# 작업별 기본 실행 간격 (초)
+DEFAULT_INTERVALS = {
+    'weather': 300,  # rasp_weather.py: 강우 + 온습도 (모은 온습도 샘플 요약 전송)
+    'dht': 60,       # rasp_weather.py: 온습도 샘플만 모으기 (weather와 함께 사용)
+    'rain': None,    # rain_data_raspberry.py: 강우 상태 변화 즉시 + heartbeat 간격 (기본: 설정 파일)
+}
+# 루프 지연 통계를 로그로 남기는 간격 (초)
+STATS_INTERVAL = 3600
+
+
+class Scheduler:
+    """
+    작업을 다음 실행 시각 순서로 힙에 넣고 차례로 실행합니다.
+    다음 실행 시각은 '이전 예정 시각 + 간격'이라 실행 시간이 쌓여도 밀리지 않습니다.
+    실행이 간격보다 오래 걸려 놓친 회차는 건너뜁니다.
+    """
+
+    def __init__(self, clock=time.monotonic, sleep=time.sleep):
+        self._clock = clock
+        self._sleep = sleep
+        self._queue = []
+        # {작업 이름: {'runs', 'late_total', 'late_max', 'run_total', 'run_max', 'skipped'}}
+        self.stats = {}
+
+    def add(self, name, interval, func, delay=0):
+        heapq.heappush(self._queue, (self._clock() + delay, name, interval, func))
+        self.stats[name] = {'runs': 0, 'late_total': 0.0, 'late_max': 0.0,
+                            'run_total': 0.0, 'run_max': 0.0, 'skipped': 0}
+
+    def run_once(self):
+        """
+        가장 먼저 예정된 작업 하나를 시각에 맞춰 실행합니다.
+        """
+        deadline, name, interval, func = heapq.heappop(self._queue)
+        wait = deadline - self._clock()
+        if wait > 0:
+            self._sleep(wait)
+
+        started = self._clock()
+        try:
+            func()
+        except Exception as e:
+            logging.error(f"[{name}] 작업 오류: {e}")
+        finished = self._clock()
+
+        stat = self.stats[name]
+        late = max(0.0, started - deadline)
+        stat['runs'] += 1
+        stat['late_total'] += late
+        stat['late_max'] = max(stat['late_max'], late)
+        stat['run_total'] += finished - started
+        stat['run_max'] = max(stat['run_max'], finished - started)
+
+        next_deadline = deadline + interval
+        if next_deadline <= finished:
+            missed = int((finished - next_deadline) // interval) + 1
+            stat['skipped'] += missed
+            next_deadline += missed * interval
+        heapq.heappush(self._queue, (next_deadline, name, interval, func))
+
+    def run_forever(self):
+        while self._queue:
+            self.run_once()
+
+    def log_stats(self):
+        for name, stat in self.stats.items():
+            if name == 'stats' or not stat['runs']:
+                continue
+            runs = stat['runs']
+            logging.info(
+                f"[{name}] {runs}회 실행, 시작 지연 평균 {stat['late_total'] / runs * 1000:.1f}ms"
+                f" / 최대 {stat['late_max'] * 1000:.1f}ms, 실행 시간 평균 {stat['run_total'] / runs:.2f}s"
+                f" / 최대 {stat['run_max']:.2f}s, 건너뜀 {stat['skipped']}회")
+
+
+def make_task(name, interval, session, deadband=False):
+    """
+    작업 이름에 맞는 실행 함수를 만듭니다.
+    센서 모듈은 여기서 처음 import 되므로, 쓰지 않는 센서는 초기화하지 않습니다.
+    스스로 이벤트를 기다리는 작업은 별도 스레드로 띄우고 None을 돌려줍니다.
+    deadband=True 면 weather 작업은 interval마다 읽기만 하고, 크게 바뀌었거나 heartbeat 때만 보냅니다.
+    """
+    if name == 'weather':
+        import rasp_weather
+        from local_buffer import LocalBuffer
+        buffer = LocalBuffer(rasp_weather.BUFFER_PATH, rasp_weather.BUFFER_MAX_ROWS)
+        if deadband:
+            band = rasp_weather.make_deadband()
+            return lambda: rasp_weather.send_data(session, buffer, band)
+        return lambda: rasp_weather.send_data(session, buffer, interval=interval)
+
+    if name == 'dht':
+        import rasp_weather
+        return rasp_weather.get_dht_sampler().sample
+
+    if name == 'rain':
+        import rain_data_raspberry
+        monitor = rain_data_raspberry.RainMonitor(rain_data_raspberry.get_rain_sensor())
+        # 강우는 엣지 콜백으로 움직이므로 스케줄러 대신 자체 스레드에서 기다립니다
+        threading.Thread(target=monitor.run,
+                         args=(requests.Session(), interval or rain_data_raspberry.HEARTBEAT_INTERVAL),
+                         name='rain', daemon=True).start()
+        return None
+
+    raise ValueError(f"알 수 없는 작업입니다: {name}")
+
+
+def parse_task(value):
+    """
+    'weather=300' 또는 'weather' 형식을 (이름, 간격)으로 바꿉니다. 간격은 0보다 커야 합니다.
+    """
+    name, _, interval = value.partition('=')
+    if name not in DEFAULT_INTERVALS:
+        raise argparse.ArgumentTypeError(f"작업은 {', '.join(DEFAULT_INTERVALS)} 중 하나여야 합니다")
+    if not interval:
+        return name, DEFAULT_INTERVALS[name]
+    try:
+        seconds = float(interval)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"간격은 초 단위 숫자여야 합니다: {interval}")
+    if not seconds > 0:
+        raise argparse.ArgumentTypeError(f"간격은 0보다 커야 합니다: {value}")
+    return name, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description='스마트팜 상주 센서 에이전트')
+    parser.add_argument('--task', type=parse_task, action='append', required=True,
+                        help='실행할 작업과 간격(초), 예: weather=300')
+    parser.add_argument('--stats-interval', type=float, default=STATS_INTERVAL,
+                        help='루프 지연 통계 기록 간격(초)')
+    parser.add_argument('--deadband', action='store_true',
+                        help='weather 작업을 변화량 기준으로 보고 (config/smartfarm.json 의 reporting.weather)')
+    parser.add_argument('--sensors', choices=sensors.BACKENDS,
+                        help='센서 백엔드 (기본: 환경변수 SMARTFARM_SENSORS, 없으면 config/smartfarm.json)')
+    parser.add_argument('--sensor-trace', help='replay 백엔드가 재생할 export_traces.py 기록 파일')
+    parser.add_argument('--sensor-speed', type=float, default=1.0, help='replay 재생 배속')
+    args = parser.parse_args()
+
+    # 같은 작업을 두 번 등록하면 통계가 섞이고, 힙에서 같은 순서값끼리 함수를 비교하게 됩니다
+    names = [name for name, _ in args.task]
+    duplicated = sorted({name for name in names if names.count(name) > 1})
+    if duplicated:
+        parser.error(f"--task 에 같은 작업이 여러 번 있습니다: {', '.join(duplicated)}")
+    if args.stats_interval <= 0:
+        parser.error("--stats-interval 은 0보다 커야 합니다")
+
+    if args.sensors == 'replay':
+        sensors.configure('replay', path=args.sensor_trace, speed=args.sensor_speed)
+    elif args.sensors:
+        sensors.configure(args.sensors)
+
+    # 모든 작업이 HTTP keep-alive 연결을 함께 씁니다
+    session = requests.Session()
+    scheduler = Scheduler()
+
+    for name, interval in args.task:
+        task = make_task(name, interval, session, args.deadband)
+        if task is not None:
+            scheduler.add(name, interval, task)
+        logging.info(f"작업 등록: {name} ({f'{interval:.0f}초' if interval else '설정 파일'} 간격)")
+    scheduler.add('stats', args.stats_interval, scheduler.log_stats, delay=args.stats_interval)
+
+    logging.info("🚀 센서 에이전트 시작")
+    scheduler.run_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""
+센서 백엔드 모듈
+
+센서 객체를 import 할 때 만들지 않고, 설정한 백엔드에서 처음 쓸 때 만듭니다.
+- real:   gpiozero / adafruit_dht 실제 센서 (라즈베리파이)
+- mock:   하드웨어 없이 값을 흉내 내는 가짜 센서 (CI, 개발 PC)
+- replay: export_traces.py 로 뽑은 JSON Lines 기록을 시간 순서대로 다시 재생
+
+백엔드는 config/smartfarm.json 의 sensors.backend / sensors.trace 로 고르고,
+환경변수 SMARTFARM_SENSORS(real/mock/replay), SMARTFARM_SENSOR_TRACE 가 있으면 그쪽을 씁니다.
+configure()로 직접 정할 수도 있습니다.
+
+어느 백엔드든 gpiozero / adafruit_dht 와 같은 모양으로 씁니다.
+- 강우 센서: is_active, when_activated, when_deactivated (비가 오면 비활성)
+- 온습도 센서: temperature, humidity (읽기 실패는 RuntimeError)
+"""
+import bisect
+import json
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config'))
+from smartfarm_config import get_config
+
+BACKENDS = ('real', 'mock', 'replay')
+
+_backend = None
+_lock = threading.Lock()
+
+
+class RealBackend:
+    """
+    라즈베리파이 실제 센서. 하드웨어 라이브러리는 여기서 처음 import 합니다.
+    """
+    # DHT11은 1초 이상 간격을 둬야 합니다
+    min_read_interval = 2.0
+
+    def rain_sensor(self, pin, bounce_time=None):
+        from gpiozero import DigitalInputDevice
+        return DigitalInputDevice(pin, bounce_time=bounce_time)
+
+    def dht_device(self, pin='D2'):
+        import board
+        import adafruit_dht
+        return adafruit_dht.DHT11(getattr(board, pin))
+
+
+class MockRainSensor:
+    """
+    가짜 강우 센서. set_raining()으로 상태를 바꾸면 gpiozero처럼 콜백이 불립니다.
+    """
+
+    def __init__(self, raining=False):
+        self.is_active = not raining
+        self.when_activated = None
+        self.when_deactivated = None
+
+    def set_raining(self, raining):
+        if self.is_active != raining:
+            return
+        self.is_active = not raining
+        callback = self.when_deactivated if raining else self.when_activated
+        if callback:
+            callback()
+
+
+class MockDht:
+    """
+    가짜 DHT11. 기준값에 잡음을 더하고, failure_rate 확률로 체크섬 오류(RuntimeError)를 냅니다.
+    """
+
+    def __init__(self, temperature=22.0, humidity=60.0, noise=0.5, failure_rate=0.0, rng=None):
+        self.base_temperature = temperature
+        self.base_humidity = humidity
+        self.noise = noise
+        self.failure_rate = failure_rate
+        self.rng = rng or random.Random()
+
+    def _value(self, base):
+        if self.rng.random() < self.failure_rate:
+            raise RuntimeError("Checksum did not validate. Try again.")
+        return round(base + self.rng.gauss(0, self.noise))
+
+    @property
+    def temperature(self):
+        return self._value(self.base_temperature)
+
+    @property
+    def humidity(self):
+        return self._value(self.base_humidity)
+
+
+class MockBackend:
+    min_read_interval = 0.0
+
+    def __init__(self, raining=False, temperature=22.0, humidity=60.0, failure_rate=0.0, seed=None):
+        self.raining = raining
+        self.temperature = temperature
+        self.humidity = humidity
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+
+    def rain_sensor(self, pin, bounce_time=None):
+        return MockRainSensor(self.raining)
+
+    def dht_device(self, pin='D2'):
+        return MockDht(self.temperature, self.humidity, failure_rate=self.failure_rate, rng=self.rng)
+
+
+class WeatherTrace:
+    """
+    export_traces.py 기록의 weather 행을 speed배 빠르게 다시 재생합니다.
+    loop=True 면 끝까지 재생한 뒤 처음부터 다시 시작합니다.
+    """
+
+    def __init__(self, path, speed=1.0, loop=True, clock=time.monotonic):
+        self.times = []
+        self.rows = []
+        with open(path) as f:
+            for line in f:
+                record = json.loads(line)
+                if record.get('type') != 'weather':
+                    continue
+                self.times.append(datetime.fromisoformat(record['received_at']).timestamp())
+                self.rows.append(record)
+        if not self.rows:
+            raise ValueError(f"강우/온습도 기록이 없습니다: {path}")
+
+        self.speed = speed
+        self.loop = loop
+        self._clock = clock
+        self._start = clock()
+
+    def current(self):
+        """지금 재생 위치의 (가장 최근) 기록"""
+        span = self.times[-1] - self.times[0]
+        elapsed = (self._clock() - self._start) * self.speed
+        if self.loop and span > 0:
+            elapsed %= span
+        index = bisect.bisect_right(self.times, self.times[0] + elapsed) - 1
+        return self.rows[max(0, index)]
+
+
+class ReplayRainSensor(MockRainSensor):
+    """
+    기록의 rain_status 를 따라가는 강우 센서. 백그라운드 스레드가 상태 변화를 확인해서 콜백을 부릅니다.
+    """
+
+    def __init__(self, trace, poll_interval=1.0):
+        super().__init__(trace.current().get('rain_status') == 'rain')
+        self.trace = trace
+        thread = threading.Thread(target=self._poll, args=(poll_interval,), name='replay-rain', daemon=True)
+        thread.start()
+
+    def _poll(self, poll_interval):
+        while True:
+            time.sleep(poll_interval)
+            self.set_raining(self.trace.current().get('rain_status') == 'rain')
+
+
+class ReplayDht:
+    """
+    기록의 온습도를 돌려줍니다. 기록에 값이 없으면 실제 DHT11처럼 읽기 실패로 처리합니다.
+    """
+
+    def __init__(self, trace):
+        self.trace = trace
+
+    def _value(self, key):
+        value = self.trace.current().get(key)
+        if value is None:
+            raise RuntimeError(f"{key} 기록 없음")
+        return value
+
+    @property
+    def temperature(self):
+        return self._value('temperature')
+
+    @property
+    def humidity(self):
+        return self._value('humidity')
+
+
+class ReplayBackend:
+    min_read_interval = 0.0
+
+    def __init__(self, path, speed=1.0, loop=True):
+        self.trace = WeatherTrace(path, speed, loop)
+
+    def rain_sensor(self, pin, bounce_time=None):
+        return ReplayRainSensor(self.trace)
+
+    def dht_device(self, pin='D2'):
+        return ReplayDht(self.trace)
+
+
+class SensorHub:
+    """
+    고른 백엔드와, 거기서 만든 센서들. 같은 핀의 센서는 한 번만 만듭니다.
+    (rasp_weather.py 와 rain_data_raspberry.py 가 한 에이전트에서 GPIO 17을 함께 써도 충돌하지 않습니다)
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._sensors = {}
+        self._lock = threading.Lock()
+
+    def _get(self, key, factory):
+        with self._lock:
+            if key not in self._sensors:
+                self._sensors[key] = factory()
+            return self._sensors[key]
+
+    def rain_sensor(self, pin, bounce_time=None):
+        return self._get(('rain', pin), lambda: self.backend.rain_sensor(pin, bounce_time))
+
+    def dht_device(self, pin='D2'):
+        return self._get(('dht', pin), lambda: self.backend.dht_device(pin))
+
+    @property
+    def min_read_interval(self):
+        return self.backend.min_read_interval
+
+
+def make_backend(name, **options):
+    if name == 'real':
+        return RealBackend()
+    if name == 'mock':
+        return MockBackend(**options)
+    if name == 'replay':
+        path = (options.pop('path', None) or os.environ.get('SMARTFARM_SENSOR_TRACE')
+                or get_config().sensors.get('trace'))
+        if not path:
+            raise ValueError("replay 백엔드에는 기록 파일(SMARTFARM_SENSOR_TRACE)이 필요합니다")
+        return ReplayBackend(path, **options)
+    raise ValueError(f"센서 백엔드는 {', '.join(BACKENDS)} 중 하나여야 합니다: {name}")
+
+
+def configure(name, **options):
+    """
+    센서 백엔드를 정합니다. 센서를 처음 쓰기 전에 불러야 합니다.
+    """
+    global _backend
+    with _lock:
+        _backend = SensorHub(make_backend(name, **options))
+    return _backend
+
+
+def get_backend():
+    """
+    설정된 백엔드 (처음 부를 때 환경변수나 설정 파일로 정합니다)
+    """
+    global _backend
+    with _lock:
+        if _backend is None:
+            name = os.environ.get('SMARTFARM_SENSORS') or get_config().sensors.get('backend', 'real')
+            _backend = SensorHub(make_backend(name))
+        return _backend
+
+
+def rain_sensor(pin, bounce_time=None):
+    return get_backend().rain_sensor(pin, bounce_time)
+
+
+def dht_device(pin='D2'):
+    return get_backend().dht_device(pin)
@@ -0,0 +1,17 @@
+"""
+스마트팜 장치 시뮬레이터
+
+실제 아두이노/라즈베리파이 없이 제어 스크립트와 API 서버를 시험하기 위한 가상 장치들입니다.
+- VirtualArduino: /relay/on, /relay/off, /status 에 아두이노와 같은 형식으로 응답하고
+  펌웨어처럼 값이 크게 바뀌었거나 heartbeat 때만 /soil 로 토양수분을 보냅니다
+- VirtualWeatherStation: /rainfall 로 강우/온습도를 주기적으로 보냅니다
+- run_fleet: 한 이벤트 루프에서 수백 대를 함께 띄웁니다
+- config_overlay: 가상 장치로 바꾼 설정 (SMARTFARM_CONFIG 로 제어 스크립트에 넘깁니다)
+
+    python -m simulator.fleet --arduinos 200 --base-port 9100 --server http://127.0.0.1:5000
+"""
+from .devices import NetworkProfile, SoilModel, VirtualArduino, VirtualWeatherStation
+from .fleet import build_fleet, config_overlay, run_fleet
+
+__all__ = ['NetworkProfile', 'SoilModel', 'VirtualArduino', 'VirtualWeatherStation',
+           'build_fleet', 'config_overlay', 'run_fleet']
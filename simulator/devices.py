@@ -0,0 +1,332 @@
+"""
+가상 장치 모듈
+
+아두이노(sf_arduino.ino)와 라즈베리파이 기상 스크립트(rasp_weather.py)가 네트워크에서
+보이는 모습만 흉내 냅니다. 모든 장치가 한 asyncio 이벤트 루프에서 돌기 때문에
+장치 수백 대도 스레드 없이 한 프로세스로 띄울 수 있습니다.
+"""
+import asyncio
+import json
+import logging
+import math
+import random
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
+# 손실된 요청은 응답 없이 이 시간 동안 붙잡고 있다가 닫습니다 (클라이언트는 타임아웃을 겪습니다)
+LOSS_HOLD_SECONDS = 30
+# 요청 헤더를 기다리는 최대 시간 (초)
+READ_TIMEOUT = 10
+# 아두이노 sendSimpleResponse()와 같은 응답 머리
+RESPONSE_HEADER = b"HTTP/1.1 200 OK\r\nConnection: close\r\n\r\n"
+
+
+class SimClock:
+    """
+    시뮬레이션 시각. time_scale배 빠르게 흐르므로 10분 주기 전송도 짧은 시험 안에 볼 수 있습니다.
+    """
+
+    def __init__(self, time_scale=1.0, clock=time.monotonic):
+        self.time_scale = time_scale
+        self._clock = clock
+        self._start = clock()
+        self._start_wall = datetime.now()
+
+    def seconds(self):
+        """시작 후 흐른 시뮬레이션 시간 (초)"""
+        return (self._clock() - self._start) * self.time_scale
+
+    def now(self):
+        return self._start_wall + timedelta(seconds=self.seconds())
+
+    def sleep(self, sim_seconds):
+        """시뮬레이션 시간 sim_seconds 만큼 기다립니다"""
+        return asyncio.sleep(max(0.0, sim_seconds) / self.time_scale)
+
+
+class NetworkProfile:
+    """
+    ESP-01 와이파이 구간의 지연과 손실
+    latency: 평균 지연(초), jitter: 지연 표준편차(초), loss: 요청이 사라질 확률(0~1)
+    """
+
+    def __init__(self, latency=0.05, jitter=0.02, loss=0.0, rng=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.rng = rng or random.Random()
+
+    def delay(self):
+        return max(0.0, self.rng.gauss(self.latency, self.jitter))
+
+    def dropped(self):
+        return self.rng.random() < self.loss
+
+
+class SoilModel:
+    """
+    화분 하나의 토양수분
+    - 릴레이가 꺼져 있으면 drying_rate(%p/시간)로 마르고, 켜져 있으면 watering_rate(%p/분)로 젖습니다
+    - 센서 값에는 noise(표준편차)와 시간에 따라 쌓이는 sensor_drift(%p/시간) 오차가 붙습니다
+    아두이노처럼 0~100 정수로 읽힙니다.
+    """
+
+    def __init__(self, clock, moisture=60.0, drying_rate=1.5, watering_rate=3.0,
+                 noise=1.0, sensor_drift=0.0, rng=None):
+        self.clock = clock
+        self.moisture = moisture
+        self.drying_rate = drying_rate
+        self.watering_rate = watering_rate
+        self.noise = noise
+        self.sensor_drift = sensor_drift
+        self.rng = rng or random.Random()
+        self.relay_on = False
+        self._updated = clock.seconds()
+
+    def _advance(self):
+        now = self.clock.seconds()
+        elapsed = now - self._updated
+        self._updated = now
+        if self.relay_on:
+            self.moisture += self.watering_rate * elapsed / 60
+        else:
+            self.moisture -= self.drying_rate * elapsed / 3600
+        self.moisture = min(100.0, max(0.0, self.moisture))
+
+    def set_relay(self, on):
+        self._advance()
+        self.relay_on = on
+
+    def read(self):
+        self._advance()
+        drift = self.sensor_drift * self.clock.seconds() / 3600
+        value = self.moisture + drift + self.rng.gauss(0, self.noise)
+        return int(min(100, max(0, round(value))))
+
+
+async def http_post(url, payload, timeout=10):
+    """
+    아두이노처럼 Connection: close 로 JSON 하나를 POST 하고 상태 코드를 돌려줍니다.
+    (추가 패키지 없이 asyncio 소켓만 씁니다)
+    """
+    parts = urlsplit(url)
+    body = json.dumps(payload).encode('utf-8')
+    request = (
+        f"POST {parts.path or '/'} HTTP/1.1\r\n"
+        f"Host: {parts.hostname}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: close\r\n\r\n"
+    ).encode('ascii') + body
+
+    async def exchange():
+        reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+        try:
+            writer.write(request)
+            await writer.drain()
+            status_line = await reader.readline()
+            await reader.read()
+        finally:
+            writer.close()
+        return int(status_line.split()[1])
+
+    return await asyncio.wait_for(exchange(), timeout)
+
+
+class PostStats:
+    def __init__(self):
+        self.posts_ok = 0
+        self.posts_failed = 0
+        self.posts_dropped = 0
+
+
+class VirtualArduino(PostStats):
+    """
+    아두이노 한 대
+    - host:port 에서 GET /relay/on, /relay/off, /status 에 sf_arduino.ino 와 같은 본문으로 응답합니다
+    - server_url 이 있으면 펌웨어처럼 sample_interval(시뮬레이션 초)마다 토양수분을 읽고,
+      마지막으로 보낸 값에서 soil_delta 넘게 바뀌었거나 heartbeat 가 지났을 때만 {server_url}/soil 로 보냅니다
+      (next_report_seconds 를 함께 보내고, 전송에 성공했을 때만 기준값을 바꿉니다)
+    clock_drift: 보드 millis()가 빠르거나 느린 비율 (0.01 이면 전송 간격이 1% 짧아집니다)
+    """
+
+    def __init__(self, device_id, port, soil, network=None, host='127.0.0.1',
+                 server_url=None, sample_interval=60, soil_delta=2, heartbeat=3600,
+                 clock_drift=0.0, rng=None):
+        super().__init__()
+        self.device_id = device_id
+        self.host = host
+        self.port = port
+        self.soil = soil
+        self.network = network or NetworkProfile()
+        self.server_url = server_url
+        self.sample_interval = sample_interval
+        self.soil_delta = soil_delta
+        self.heartbeat = heartbeat
+        self.clock_drift = clock_drift
+        self.rng = rng or random.Random()
+        self.requests = 0
+        self.dropped = 0
+        self.switches = 0
+        # 데드밴드로 보내지 않은 측정 수
+        self.suppressed = 0
+        self._last_sent = None
+        self._last_sent_at = None
+        self._server = None
+
+    @property
+    def address(self):
+        """relay_client 에 그대로 넘길 수 있는 'host:port'"""
+        return f"{self.host}:{self.port}"
+
+    def status_text(self):
+        return f"Soil:{self.soil.read()}%, Relay:{'ON' if self.soil.relay_on else 'OFF'}"
+
+    async def start(self, backlog=32):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port, backlog=backlog)
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), READ_TIMEOUT)
+            # 아두이노는 줄마다 경로만 찾으므로 나머지 헤더는 읽고 버립니다
+            while True:
+                line = await asyncio.wait_for(reader.readline(), READ_TIMEOUT)
+                if line in (b'\r\n', b'\n', b''):
+                    break
+            self.requests += 1
+
+            if self.network.dropped():
+                self.dropped += 1
+                await asyncio.wait_for(reader.read(), LOSS_HOLD_SECONDS)
+                return
+
+            await asyncio.sleep(self.network.delay())
+            message = self._respond(request_line.decode('latin-1'))
+            # 모르는 경로에는 아두이노도 아무것도 보내지 않습니다
+            if message is not None:
+                writer.write(RESPONSE_HEADER + message.encode('ascii'))
+                await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def _respond(self, request_line):
+        if 'GET /relay/on' in request_line:
+            if not self.soil.relay_on:
+                self.switches += 1
+            self.soil.set_relay(True)
+            return "ON"
+        if 'GET /relay/off' in request_line:
+            if self.soil.relay_on:
+                self.switches += 1
+            self.soil.set_relay(False)
+            return "OFF"
+        if 'GET /status' in request_line:
+            return self.status_text()
+        return None
+
+    def should_send(self, moisture):
+        """펌웨어 loop()와 같은 전송 조건: 처음이거나, soil_delta 넘게 바뀌었거나, heartbeat 가 지남"""
+        return (self._last_sent is None or abs(moisture - self._last_sent) > self.soil_delta
+                or self.soil.clock.seconds() - self._last_sent_at >= self.heartbeat)
+
+    async def post_loop(self):
+        """
+        sample_interval 마다 읽고 필요할 때만 /soil 로 전송합니다. 부팅 시각이 제각각인 것처럼 첫 측정 시점을 흩어 둡니다.
+        """
+        interval = self.sample_interval * (1 - self.clock_drift)
+        await self.soil.clock.sleep(self.rng.uniform(0, interval))
+        while True:
+            moisture = self.soil.read()
+            if self.should_send(moisture):
+                payload = {"device_id": self.device_id, "soil_moisture": str(moisture),
+                           "next_report_seconds": self.heartbeat}
+                if await post_with_network(self, f"{self.server_url}/soil", payload):
+                    self._last_sent = moisture
+                    self._last_sent_at = self.soil.clock.seconds()
+            else:
+                self.suppressed += 1
+            await self.soil.clock.sleep(interval)
+
+
+class VirtualWeatherStation(PostStats):
+    """
+    라즈베리파이 기상 장치 한 대 (rasp_weather.py 와 같은 필드를 /rainfall 로 보냅니다)
+    - 기온/습도는 하루 주기 사인파에 잡음을 더하고
+    - 비는 전송 구간마다 rain_start/rain_stop 확률로 시작하고 그칩니다
+    """
+
+    def __init__(self, device_id, server_url, clock, network=None, interval=300,
+                 clock_drift=0.0, rain_start=0.02, rain_stop=0.2, rng=None):
+        super().__init__()
+        self.device_id = device_id
+        self.server_url = server_url
+        self.clock = clock
+        self.network = network or NetworkProfile()
+        self.interval = interval
+        self.clock_drift = clock_drift
+        self.rain_start = rain_start
+        self.rain_stop = rain_stop
+        self.rng = rng or random.Random()
+        self.raining = False
+
+    def reading(self):
+        now = self.clock.now()
+        # 오후 3시에 가장 덥고 건조합니다
+        phase = math.cos((now.hour + now.minute / 60 - 15) / 24 * 2 * math.pi)
+        if self.rng.random() < (self.rain_stop if self.raining else self.rain_start):
+            self.raining = not self.raining
+
+        temperatures = [22 + 6 * phase + self.rng.gauss(0, 0.5) for _ in range(3)]
+        humidities = [min(100, 60 - 20 * phase + (25 if self.raining else 0) + self.rng.gauss(0, 2))
+                      for _ in range(3)]
+        return {
+            "device_id": self.device_id,
+            "timestamp": now.isoformat(),
+            "rain_detected": "rain" if self.raining else "no_rain",
+            "temperature": round(sum(temperatures) / 3, 1),
+            "temperature_min": round(min(temperatures), 1),
+            "temperature_max": round(max(temperatures), 1),
+            "humidity": round(sum(humidities) / 3, 1),
+            "humidity_min": round(min(humidities), 1),
+            "humidity_max": round(max(humidities), 1),
+            "sample_count": 3,
+            # rasp_weather.py 를 데드밴드 없이 보낼 때처럼 전송 간격을 알려 줍니다
+            "next_report_seconds": self.interval
+        }
+
+    async def post_loop(self):
+        interval = self.interval * (1 - self.clock_drift)
+        await self.clock.sleep(self.rng.uniform(0, interval))
+        while True:
+            await post_with_network(self, f"{self.server_url}/rainfall", self.reading())
+            await self.clock.sleep(interval)
+
+
+async def post_with_network(device, url, payload):
+    """
+    장치의 네트워크 조건(손실/지연)을 거쳐 전송하고 결과를 장치 통계에 더합니다. 성공하면 True
+    """
+    if device.network.dropped():
+        device.posts_dropped += 1
+        return False
+    await asyncio.sleep(device.network.delay())
+    try:
+        status = await http_post(url, payload)
+    except Exception as e:
+        device.posts_failed += 1
+        logging.debug(f"[{device.device_id}] 전송 오류: {e}")
+        return False
+    if status == 200:
+        device.posts_ok += 1
+        return True
+    device.posts_failed += 1
+    logging.debug(f"[{device.device_id}] 전송 실패: {status}")
+    return False
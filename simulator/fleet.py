@@ -0,0 +1,199 @@
+"""
+가상 장치 여러 대를 한 프로세스로 띄웁니다.
+
+사용 예:
+    # 아두이노 8대만 (제어 스크립트 시험용)
+    python -m simulator.fleet --arduinos 8 --config-out /tmp/sim_config.json
+    SMARTFARM_CONFIG=/tmp/sim_config.json python raspberrypi/rasp_control_arduino_v2.py --mode closed-loop
+
+    # 아두이노 300대 + 기상 장치 4대가 로컬 API 서버로 60배속 전송 (부하 시험용)
+    python -m simulator.fleet --arduinos 300 --weather-stations 4 \\
+        --server http://127.0.0.1:5000 --time-scale 60 --latency 0.2 --loss 0.05
+
+--config-out 파일은 config/smartfarm.json 에서 장치 목록만 가상 장치("host:port")로 바꾼 설정입니다.
+SMARTFARM_CONFIG 로 주면 제어 스크립트(config.ip_map())와 API 서버가 그대로 가상 장치를 씁니다.
+--server 를 주면 API 주소도 그 서버로 바꿉니다. (--registry 는 {device_id: "host:port"} 만 저장합니다)
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import resource
+import sys
+
+from .devices import NetworkProfile, SimClock, SoilModel, VirtualArduino, VirtualWeatherStation
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config'))
+from smartfarm_config import get_config
+
+logging.basicConfig(level=logging.INFO)
+
+# 통계를 로그로 남기는 간격 (실제 초)
+STATS_INTERVAL = 30
+
+
+def raise_file_limit():
+    """
+    장치마다 리슨 소켓 하나와 요청 소켓들을 쓰므로 열 수 있는 파일 수를 최대로 올립니다.
+    """
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return hard
+
+
+def build_fleet(arduinos=8, weather_stations=0, host='127.0.0.1', base_port=9100,
+                server_url=None, time_scale=1.0, latency=0.05, jitter=0.02, loss=0.0,
+                drying_rate=1.5, sensor_drift=0.0, clock_drift=0.0, sample_interval=60,
+                soil_delta=None, heartbeat=None, weather_interval=300, seed=None):
+    """
+    장치 목록을 만듭니다. seed를 주면 장치마다 (seed, 번호)로 난수를 고정해서 같은 시험을 되풀이할 수 있습니다.
+    drying_rate/sensor_drift/clock_drift는 장치마다 ±50% 범위에서 흩어 둡니다.
+    soil_delta/heartbeat 를 주지 않으면 config/smartfarm.json 의 reporting.soil 을 씁니다 (펌웨어와 같게).
+    """
+    reporting = get_config().reporting.get('soil', {})
+    soil_delta = reporting.get('delta', 2) if soil_delta is None else soil_delta
+    heartbeat = reporting.get('heartbeat', 3600) if heartbeat is None else heartbeat
+    clock = SimClock(time_scale)
+    master = random.Random(seed)
+
+    def spread(value, rng):
+        return value * rng.uniform(0.5, 1.5)
+
+    devices = []
+    for i in range(1, arduinos + 1):
+        rng = random.Random(master.random())
+        soil = SoilModel(clock, moisture=rng.uniform(30, 80), drying_rate=spread(drying_rate, rng),
+                         sensor_drift=spread(sensor_drift, rng), rng=rng)
+        devices.append(VirtualArduino(
+            f"smartfarm_{i:02d}", base_port + i, soil,
+            network=NetworkProfile(latency, jitter, loss, rng), host=host, server_url=server_url,
+            sample_interval=sample_interval, soil_delta=soil_delta, heartbeat=heartbeat,
+            clock_drift=spread(clock_drift, rng), rng=rng))
+
+    stations = []
+    for i in range(1, weather_stations + 1):
+        rng = random.Random(master.random())
+        stations.append(VirtualWeatherStation(
+            f"raspberry_sim_{i:02d}", server_url, clock,
+            network=NetworkProfile(latency, jitter, loss, rng), interval=weather_interval,
+            clock_drift=spread(clock_drift, rng), rng=rng))
+    return devices, stations
+
+
+def config_overlay(devices, server_url=None, config=None):
+    """
+    설정 파일 내용에서 장치 목록을 가상 아두이노로 바꾼 dict 를 돌려줍니다.
+    같은 device_id 가 설정에 있으면 반/물주기 조를 그대로 쓰고, 없으면 반은 돌아가며, 조는 번호 순으로 붙입니다.
+    """
+    data = json.loads(json.dumps((config or get_config()).data))
+    known = {d['device_id']: d for d in data['devices']}
+    classes = sorted(int(key) for key in data['classes'])
+    entries = []
+    for i, device in enumerate(devices):
+        entry = dict(known.get(device.device_id) or {'class': classes[i % len(classes)]})
+        entry.update(device_id=device.device_id, ip=device.address, relay_group=i + 1)
+        entries.append(entry)
+    data['devices'] = entries
+    if server_url:
+        data['api'] = {'public_url': server_url, 'local_url': server_url}
+    return data
+
+
+def write_outputs(devices, registry_path=None, config_path=None, server_url=None):
+    write_outputs(devices, registry_path, config_path, server_url)
+    if config_path:
+        with open(config_path, 'w', encoding='utf-8') as f:
+            json.dump(config_overlay(devices, server_url), f, ensure_ascii=False, indent=2)
+        logging.info(f"가상 장치 설정 저장: {config_path} (SMARTFARM_CONFIG={config_path} 로 씁니다)")
+
+
+def log_stats(devices, stations):
+    requests = sum(d.requests for d in devices)
+    dropped = sum(d.dropped for d in devices)
+    relay_on = sum(d.soil.relay_on for d in devices)
+    switches = sum(d.switches for d in devices)
+    senders = devices + stations
+    posts_ok = sum(d.posts_ok for d in senders)
+    posts_failed = sum(d.posts_failed for d in senders)
+    posts_dropped = sum(d.posts_dropped for d in senders)
+    suppressed = sum(d.suppressed for d in devices)
+    logging.info(f"📊 요청 {requests}건 (손실 {dropped}), 릴레이 ON {relay_on}/{len(devices)}대, "
+                 f"전환 {switches}회 | 전송 성공 {posts_ok}, 실패 {posts_failed}, 손실 {posts_dropped}, "
+                 f"변화 없어 안 보냄 {suppressed}")
+
+
+async def run_fleet(devices, stations=(), registry_path=None, stats_interval=STATS_INTERVAL,
+                    config_path=None, server_url=None):
+    """
+    모든 장치의 서버와 전송 루프를 띄우고 취소될 때까지 돕니다.
+    """
+    stations = list(stations)
+    for device in devices:
+        await device.start()
+    logging.info(f"🚀 가상 아두이노 {len(devices)}대 시작 "
+                 f"({devices[0].address} ~ {devices[-1].address})" if devices else "🚀 가상 아두이노 없음")
+
+    write_outputs(devices, registry_path, config_path, server_url)
+
+    tasks = [asyncio.create_task(d.post_loop()) for d in devices if d.server_url]
+    tasks += [asyncio.create_task(s.post_loop()) for s in stations]
+    try:
+        while True:
+            await asyncio.sleep(stats_interval)
+            log_stats(devices, stations)
+    finally:
+        for task in tasks:
+            task.cancel()
+        for device in devices:
+            await device.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='스마트팜 가상 장치 시뮬레이터')
+    parser.add_argument('--arduinos', type=int, default=8, help='가상 아두이노 수')
+    parser.add_argument('--weather-stations', type=int, default=0, help='가상 기상 장치 수 (--server 필요)')
+    parser.add_argument('--host', default='127.0.0.1', help='아두이노 웹서버 주소')
+    parser.add_argument('--base-port', type=int, default=9100, help='n번 장치는 base-port + n 포트를 씁니다')
+    parser.add_argument('--server', help='API 서버 주소, 예: http://127.0.0.1:5000 (없으면 전송하지 않음)')
+    parser.add_argument('--time-scale', type=float, default=1.0, help='시뮬레이션 시간 배속')
+    parser.add_argument('--latency', type=float, default=0.05, help='평균 지연 (초)')
+    parser.add_argument('--jitter', type=float, default=0.02, help='지연 표준편차 (초)')
+    parser.add_argument('--loss', type=float, default=0.0, help='요청/전송 손실 확률 (0~1)')
+    parser.add_argument('--drying-rate', type=float, default=1.5, help='흙이 마르는 속도 (%%p/시간)')
+    parser.add_argument('--sensor-drift', type=float, default=0.0, help='센서 오차 누적 속도 (%%p/시간)')
+    parser.add_argument('--clock-drift', type=float, default=0.0, help='보드 시계 오차 비율, 예: 0.01')
+    parser.add_argument('--sample-interval', type=float, default=60, help='아두이노 토양수분 측정 간격 (시뮬레이션 초)')
+    parser.add_argument('--soil-delta', type=float, help='이만큼 넘게 바뀌면 바로 전송 (%%p, 기본: 설정 파일)')
+    parser.add_argument('--heartbeat', type=float, help='변화가 없어도 전송하는 간격 (시뮬레이션 초, 기본: 설정 파일)')
+    parser.add_argument('--weather-interval', type=float, default=300, help='기상 장치 전송 간격 (시뮬레이션 초)')
+    parser.add_argument('--seed', type=int, help='난수 시드 (같은 시험 되풀이)')
+    parser.add_argument('--registry', help='{device_id: host:port} 를 저장할 JSON 파일')
+    parser.add_argument('--config-out', help='가상 장치로 바꾼 설정 파일 (SMARTFARM_CONFIG 로 씁니다)')
+    parser.add_argument('--stats-interval', type=float, default=STATS_INTERVAL, help='통계 기록 간격 (초)')
+    args = parser.parse_args()
+
+    if args.weather_stations and not args.server:
+        parser.error('--weather-stations 는 --server 와 함께 써야 합니다')
+
+    limit = raise_file_limit()
+    if args.arduinos * 2 > limit:
+        logging.warning(f"열 수 있는 파일 수({limit})가 장치 수에 비해 적습니다")
+
+    devices, stations = build_fleet(
+        args.arduinos, args.weather_stations, args.host, args.base_port, args.server,
+        args.time_scale, args.latency, args.jitter, args.loss, args.drying_rate,
+        args.sensor_drift, args.clock_drift, args.sample_interval, args.soil_delta, args.heartbeat,
+        args.weather_interval, args.seed)
+    try:
+        asyncio.run(run_fleet(devices, stations, args.registry, args.stats_interval,
+                              args.config_out, args.server))
+    except KeyboardInterrupt:
+        log_stats(devices, stations)
+        logging.info("시뮬레이터 종료")
+
+
+if __name__ == "__main__":
+    main()